@@ -0,0 +1 @@
+"""The administration module: internal metrics and diagnostics, not meant to be exposed publicly."""
@@ -0,0 +1,32 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from app.core import metrics
+from app.core.profiler import slow_query_log
+
+admin = APIRouter(
+    prefix="/admin",
+    tags=["admin"],
+    include_in_schema=False,
+)
+
+
+@admin.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Expose the process metrics in the Prometheus text format."""
+    return PlainTextResponse(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@admin.get("/slow-queries")
+async def get_slow_queries():
+    """List the most recent slow (or failed) database queries, with their query plan."""
+    if slow_query_log is None:
+        return {"enabled": False, "data": []}
+    return {"enabled": True, "threshold_ms": slow_query_log.threshold * 1000, "data": slow_query_log.entries()}
+
+
+@admin.delete("/slow-queries")
+async def clear_slow_queries():
+    if slow_query_log is not None:
+        slow_query_log.clear()
+    return {"status": "ok"}
@@ -1,12 +1,36 @@
+import asyncio
+import csv
+import hashlib
+import io
+import json
+from collections.abc import AsyncIterator
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Path, Query, Response
+from fastapi import APIRouter, Depends, Path, Query, Request, Response, WebSocket
 from fastapi.exceptions import HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from starlette.datastructures import UploadFile
 
-from app.api.schemas.response import AutocompleteResponse, BaseResponse, FilmListResponse, FilmResponse
-from app.core import film
-from app.core.film import MAX_AUTOCOMPLETE_RESULTS, MAX_RESULTS
-from app.core.schemas.query import SearchFilmQuery
+from app.api.schemas.response import (
+    AutocompleteResponse,
+    BaseResponse,
+    FacetsResponse,
+    FilmListResponse,
+    FilmResponse,
+    ManufacturerListResponse,
+    ManufacturerResponse,
+    ScannedBarcode,
+    ScannedImage,
+    ScanResponse,
+)
+from app.config import settings
+from app.core import database, film, hot_queries, scanner
+from app.core.autocomplete_channel import AutocompleteChannel, autocomplete_channel_queries
+from app.core.film import MANUFACTURER_PAGE_SIZE, MAX_AUTOCOMPLETE_RESULTS, MAX_RESULTS
+from app.core.schemas.query import AutocompleteMessage, ExportFilmQuery, SearchFilmQuery
+from app.utils.dx import dx_barcode_to_search_criteria
+from app.utils.http_headers import etag_matches
 
 api = APIRouter(
     prefix="/api",
@@ -22,28 +46,54 @@ AUTOCOMPLETE_CACHE_CONTROL = "public, max-age=86400, stale-while-revalidate=2592
 # edge hits the origin at most ~once per 10 min per query/film), with a long stale window so the
 # cache keeps serving instantly. The rate limiter remains the backstop against cache-busting abuse.
 SEARCH_FILM_CACHE_CONTROL = "public, max-age=600, stale-while-revalidate=2592000"
+# Full exports only change with the database build: their ETag lets mirrors revalidate for free.
+EXPORT_CACHE_CONTROL = "public, max-age=3600"
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+# Multipart boundaries and headers, on top of the images themselves
+SCAN_FORM_OVERHEAD = 64 * 1024
+# The scan form is parsed manually (to check its size first): document it for OpenAPI
+SCAN_OPENAPI_EXTRA = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["images"],
+                    "properties": {"images": {"type": "array", "items": {"type": "string", "format": "binary"}}},
+                }
+            }
+        },
+    }
+}
 
 
 # Also allow HEAD: uptime monitors (UptimeRobot...) probe with HEAD, and FastAPI — unlike plain
 # Starlette — does not auto-add HEAD to GET routes (see fastapi/fastapi#1773), so a bare @api.get
 # would answer HEAD with 405.
 @api.api_route("/health", methods=["GET", "HEAD"])
-async def healthcheck():
+async def healthcheck(response: Response):
+    # Not ready until the caches are warmed up with the hot queries (see app.core.hot_queries)
+    if not hot_queries.is_warmed_up():
+        response.status_code = 503
+        return BaseResponse(status="starting")
     return BaseResponse()
 
 
 @api.get("/search", response_model=FilmListResponse, response_model_exclude_none=True)
 async def search(response: Response, query: Annotated[SearchFilmQuery, Depends(SearchFilmQuery)]):
     response.headers["Cache-Control"] = SEARCH_FILM_CACHE_CONTROL
-    films = film.search(
-        dx_extract=query.dx_extract,
-        dx_full=query.dx_full,
-        name=query.name,
-        manufacturer=query.manufacturer,
-        limit=query.limit,
-    )
+    films, did_you_mean = await film.coalesced_fuzzy_search(**query.search_criteria())
 
-    return FilmListResponse(data=films)
+    return FilmListResponse(data=films, did_you_mean=did_you_mean)
+
+
+@api.get("/facets", response_model=FacetsResponse)
+async def facets(response: Response, query: Annotated[SearchFilmQuery, Depends(SearchFilmQuery)]):
+    """Count the films matching the search query (all films if none), per manufacturer, country,
+    availability, reliability and decade of production."""
+    response.headers["Cache-Control"] = SEARCH_FILM_CACHE_CONTROL
+    return FacetsResponse(data=film.facet_counts(**query.filter_criteria()))
 
 
 @api.get("/random", response_model=FilmListResponse, response_model_exclude_none=True)
@@ -63,7 +113,7 @@ async def autocomplete_name(
     ] = MAX_AUTOCOMPLETE_RESULTS,
 ):
     response.headers["Cache-Control"] = AUTOCOMPLETE_CACHE_CONTROL
-    suggestions = film.autocomplete(column="name", text=q, limit=limit)
+    suggestions = await film.coalesced_autocomplete(column="name", text=q, limit=limit)
     return AutocompleteResponse(data=suggestions)
 
 
@@ -76,17 +126,183 @@ async def autocomplete_manufacturer(
     ] = MAX_AUTOCOMPLETE_RESULTS,
 ):
     response.headers["Cache-Control"] = AUTOCOMPLETE_CACHE_CONTROL
-    suggestions = film.autocomplete(column="manufacturer", text=q, limit=limit)
+    suggestions = await film.coalesced_autocomplete(column="manufacturer", text=q, limit=limit)
     return AutocompleteResponse(data=suggestions)
 
 
+@api.websocket("/autocomplete/ws")
+async def autocomplete_websocket(websocket: WebSocket):
+    """Autocomplete the name and manufacturer inputs over a single connection, keystroke by keystroke.
+
+    The client sends JSON queries like {"id": 1, "column": "name", "q": "kodak p", "limit": 11}, and gets
+    {"id": 1, "column": "name", "data": ["portra", ...]} back. Only the latest query of each column is
+    answered: superseded queries get no answer (see app.core.autocomplete_channel).
+    """
+    await websocket.accept()
+    channel = AutocompleteChannel(websocket.send_json)
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(websocket.receive(), settings.AUTOCOMPLETE_WEBSOCKET_IDLE_TIMEOUT)
+            except TimeoutError:
+                await websocket.close(code=1001, reason="Idle timeout")
+                break
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                # Binary messages are invalid too
+                query = AutocompleteMessage.model_validate_json(message.get("text") or "")
+            except ValidationError as e:
+                autocomplete_channel_queries.inc("invalid")
+                await websocket.send_json(
+                    {"error": e.errors(include_url=False, include_input=False, include_context=False)}
+                )
+                continue
+            channel.submit(query.id, query.column, query.q, query.limit)
+    finally:
+        await channel.close()
+
+
 @api.get("/film/{url_name}", response_model=FilmResponse, response_model_exclude_none=True)
 async def get_by_url_name(
     response: Response,
     url_name: Annotated[str, Path(description="Unique URL-safe name of the film", max_length=255)],
 ):
     response.headers["Cache-Control"] = SEARCH_FILM_CACHE_CONTROL
-    result = film.get_by_url(url_name)
+    result = await film.coalesced_get_by_url(url_name)
     if not result:
         raise HTTPException(status_code=404, detail="Film not found")
     return FilmResponse(data=result)
+
+
+@api.get("/film/{url_name}/related", response_model=FilmListResponse, response_model_exclude_none=True)
+async def get_related_films(
+    response: Response,
+    url_name: Annotated[str, Path(description="Unique URL-safe name of the film", max_length=255)],
+):
+    """List the films related to a film: same emulsion, same DX product code or same manufacturer, closest DX
+    codes first."""
+    response.headers["Cache-Control"] = SEARCH_FILM_CACHE_CONTROL
+    films = film.get_related(url_name)
+    if films is None:
+        raise HTTPException(status_code=404, detail="Film not found")
+    return FilmListResponse(data=films)
+
+
+@api.get("/manufacturers", response_model=ManufacturerListResponse)
+async def get_manufacturers(response: Response):
+    """List all the manufacturers, with their number of films, the most films first."""
+    response.headers["Cache-Control"] = SEARCH_FILM_CACHE_CONTROL
+    return ManufacturerListResponse(data=film.get_manufacturers())
+
+
+@api.get("/manufacturer/{slug}", response_model=ManufacturerResponse, response_model_exclude_none=True)
+async def get_manufacturer(
+    response: Response,
+    slug: Annotated[str, Path(description="Unique URL-safe name of the manufacturer", max_length=255)],
+    page: Annotated[int, Query(ge=1, description="Page number")] = 1,
+    limit: Annotated[
+        int, Query(ge=1, le=MANUFACTURER_PAGE_SIZE, description="Films per page")
+    ] = MANUFACTURER_PAGE_SIZE,
+):
+    """List the films of a manufacturer, sorted by name, page by page. Films made by several manufacturers
+    are listed by each of them."""
+    response.headers["Cache-Control"] = SEARCH_FILM_CACHE_CONTROL
+    result = film.get_manufacturer_films(slug, page=page, page_size=limit)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Manufacturer not found")
+    # Like the HTML page, pages beyond the last one don't exist
+    if page > result.page_count:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return ManufacturerResponse(data=result)
+
+
+@api.post("/scan", response_model=ScanResponse, response_model_exclude_none=True, openapi_extra=SCAN_OPENAPI_EXTRA)
+async def scan(request: Request):
+    """Decode the DX barcodes (film edge or cassette) of uploaded images, and return the matching films.
+
+    Images (JPEG, PNG...) are sent as the "images" field of a multipart form, repeated for several images.
+    """
+    # Reject oversized uploads before reading them
+    content_length = request.headers.get("content-length")
+    if content_length is None or not content_length.isdigit():
+        raise HTTPException(status_code=411, detail="Length Required")
+    if int(content_length) > settings.SCAN_MAX_IMAGES * settings.SCAN_MAX_IMAGE_SIZE + SCAN_FORM_OVERHEAD:
+        raise HTTPException(status_code=413, detail="Request too large")
+
+    images = []
+    async with request.form(max_files=settings.SCAN_MAX_IMAGES, max_fields=0) as form:
+        for upload in form.getlist("images"):
+            if not isinstance(upload, UploadFile):
+                continue
+            if upload.size is not None and upload.size > settings.SCAN_MAX_IMAGE_SIZE:
+                raise HTTPException(status_code=413, detail=f"Image too large: {upload.filename}")
+            images.append((upload.filename, await upload.read()))
+    if not images:
+        raise HTTPException(status_code=422, detail='No image provided (multipart form field "images")')
+
+    try:
+        with scanner.reserve(len(images)):
+            results = await asyncio.gather(*(scanner.scan_image(image) for _, image in images), return_exceptions=True)
+    except scanner.ScannerOverloadedError as e:
+        raise HTTPException(
+            status_code=503, detail="Too many images being scanned, retry later", headers={"Retry-After": "1"}
+        ) from e
+
+    data = []
+    for (filename, _), result in zip(images, results, strict=True):
+        if isinstance(result, ValueError):
+            data.append(ScannedImage(filename=filename, error=str(result)))
+            continue
+        if isinstance(result, BaseException):
+            raise result
+        barcodes = []
+        for barcode_format, text in result:
+            criteria = dx_barcode_to_search_criteria(barcode_format, text)
+            films = film.search(**criteria) if criteria else []
+            barcodes.append(ScannedBarcode(format=barcode_format, text=text, criteria=criteria, films=films))
+        data.append(ScannedImage(filename=filename, barcodes=barcodes))
+    return ScanResponse(data=data)
+
+
+async def _export_films(export_format: str, columns: list[str]) -> AsyncIterator[str]:
+    """Serialize all the films, batch by batch. Yields control to the event loop between batches."""
+    if export_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+        writer.writeheader()
+        yield buffer.getvalue()
+    for films in film.iter_films():
+        if export_format == "csv":
+            buffer = io.StringIO()
+            writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+            for model in films:
+                row = model.model_dump(mode="json", include=set(columns))
+                writer.writerow({k: ", ".join(v) if isinstance(v, list) else v for k, v in row.items()})
+            yield buffer.getvalue()
+        else:
+            yield "".join(
+                json.dumps(
+                    model.model_dump(mode="json", include=set(columns), exclude_none=True), separators=(",", ":")
+                )
+                + "\n"
+                for model in films
+            )
+        await asyncio.sleep(0)
+
+
+@api.get("/export", response_class=StreamingResponse)
+async def export(request: Request, query: Annotated[ExportFilmQuery, Depends(ExportFilmQuery)]):
+    """Stream every film of the database, as NDJSON (one JSON film per line) or CSV."""
+    columns = query.column_list
+    headers = {"Cache-Control": EXPORT_CACHE_CONTROL}
+    if database.db_build_id:
+        columns_hash = hashlib.sha256(",".join(columns).encode()).hexdigest()[:8]
+        etag = f'"{database.db_build_id}-{query.format}-{columns_hash}"'
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+        headers["Content-Disposition"] = f"attachment; filename=films-{database.db_build_id}.{query.format}"
+    return StreamingResponse(
+        _export_films(query.format, columns), media_type=EXPORT_MEDIA_TYPES[query.format], headers=headers
+    )
@@ -3,6 +3,7 @@ from typing import Any
 from pydantic import BaseModel
 
 from app.core.schemas.film import FilmInDB
+from app.core.schemas.manufacturer import Manufacturer, ManufacturerFilms
 
 
 class BaseResponse(BaseModel):
@@ -19,7 +20,48 @@ class FilmResponse(Response):
 
 class FilmListResponse(Response):
     data: list[FilmInDB] = None
+    # Corrected search texts (eg. {"name": "ektachrome"}), if the films were found thanks to them
+    did_you_mean: dict[str, str] | None = None
+
+
+class ManufacturerListResponse(Response):
+    data: list[Manufacturer] = []
+
+
+class ManufacturerResponse(Response):
+    data: ManufacturerFilms
 
 
 class AutocompleteResponse(Response):
     data: list[str] = []
+
+
+class Facets(BaseModel):
+    # Number of films matching the query
+    total: int
+    # Number of matching films per facet ("manufacturer", "country"...) and value, most frequent values first
+    facets: dict[str, dict[str, int]]
+
+
+class FacetsResponse(Response):
+    data: Facets
+
+
+class ScannedBarcode(BaseModel):
+    # Barcode format: "DX Film Edge" or "ITF" (cassette barcode)
+    format: str
+    text: str
+    # Film search criterias decoded from the barcode ("dx_extract" or "dx_full"), None if it isn't a DX code
+    criteria: dict[str, str] | None = None
+    films: list[FilmInDB] = []
+
+
+class ScannedImage(BaseModel):
+    filename: str | None = None
+    barcodes: list[ScannedBarcode] = []
+    # Why the image couldn't be decoded (unsupported format, resolution too high...)
+    error: str | None = None
+
+
+class ScanResponse(Response):
+    data: list[ScannedImage] = []
@@ -1,5 +1,6 @@
 import asyncio
 import contextlib
+import time
 
 from fastapi import FastAPI, Request
 from fastapi.concurrency import asynccontextmanager
@@ -8,11 +9,17 @@ from fastapi.staticfiles import StaticFiles
 from limits import RateLimitItemPerSecond
 from limits.storage import MemoryStorage
 from limits.strategies import SlidingWindowCounterRateLimiter
+from starlette.routing import Mount, Route
 
+from app.admin.routes import admin
 from app.api.routes import api
 from app.config import settings
 from app.constants import FILM_IMAGE_DIR_URL, STATIC_DIR, STATIC_DIR_URL
+from app.core import film, hot_queries, metrics
+from app.core.admission import AdmissionControlMiddleware
 from app.core.cdn import update_cdn_url
+from app.core.response_cache import ResponseCacheMiddleware
+from app.core.server_timing import ServerTimingMiddleware
 from app.website.routes import website
 
 
@@ -27,14 +34,22 @@ async def daily_cdn_update():
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    task = asyncio.create_task(daily_cdn_update())
+    film.load_films()
+    tasks = [
+        asyncio.create_task(daily_cdn_update()),
+        # Serve requests during the warm-up: /api/health reports the application as ready once it is over
+        asyncio.create_task(hot_queries.warm_up(film.HOT_QUERY_HANDLERS)),
+        asyncio.create_task(hot_queries.persist_periodically()),
+    ]
     try:
         yield
     finally:
-        task.cancel()
-        # Optionally wait for the task to finish cancelling
-        with contextlib.suppress(asyncio.CancelledError):
-            await task
+        for task in tasks:
+            task.cancel()
+        # Optionally wait for the tasks to finish cancelling
+        for task in tasks:
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
 
 
 app = FastAPI(title="The Big Film Database", lifespan=lifespan)
@@ -51,13 +66,45 @@ limiter = SlidingWindowCounterRateLimiter(storage)
 rate_limit = RateLimitItemPerSecond(settings.RATE_LIMITER_MAX_REQUESTS, settings.RATE_LIMITER_TIME_WINDOW)
 
 
+@app.middleware("http")
+async def metrics_middleware(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    metrics.observe_http_request(request.scope, response.status_code, time.perf_counter() - start)
+    return response
+
+
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
     client_ip = request.client.host
     if not limiter.hit(rate_limit, client_ip):
+        metrics.rate_limiter_rejections.inc()
         return JSONResponse(status_code=429, content={"detail": "Too Many Requests"})
     return await call_next(request)
 
 
+# Added last, so they run first: requests are shed before any other work, and cached responses are served
+# before that, like from a CDN
+if settings.ADMISSION_CONTROL_ENABLE:
+    app.add_middleware(AdmissionControlMiddleware)
+if settings.RESPONSE_CACHE_ENABLE:
+    app.add_middleware(ResponseCacheMiddleware)
+# Outermost: cached responses don't keep the timings of the request that filled the cache
+if settings.SERVER_TIMING_ENABLE:
+    app.add_middleware(ServerTimingMiddleware)
+
+
+@app.exception_handler(TimeoutError)
+async def timeout_error_handler(request: Request, exc: TimeoutError):
+    # A coalesced query took too long (see SINGLE_FLIGHT_TIMEOUT): the server is overloaded
+    return JSONResponse(status_code=503, content={"detail": "Service Unavailable"}, headers={"Retry-After": "1"})
+
+
 app.include_router(website)
 app.include_router(api)
+if settings.ADMIN_ENABLE:
+    app.include_router(admin)
+# Requests answered before the routing (eg. rejected by the admission control) are labelled by matching these
+# routes: the application's own routes and mounts, and those of the included routers (see metrics.route_label)
+metrics.register_routes(route for route in app.router.routes if isinstance(route, Route | Mount))
+metrics.register_routes(website.routes + api.routes + (admin.routes if settings.ADMIN_ENABLE else []))
@@ -6,7 +6,7 @@ All settings can be overridden by a .env file at runtime.
 
 import os
 
-from pydantic import Field, HttpUrl, NonNegativeFloat, NonNegativeInt
+from pydantic import Field, HttpUrl, NonNegativeFloat, NonNegativeInt, PositiveFloat, PositiveInt
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 from app.constants import PROJECT_DIR
@@ -33,11 +33,77 @@ class Settings(BaseSettings):
     # Location of the local database, created at application launch from the repo's data
     DB_SQLITE_FILEPATH: str = str(os.path.join(DATA_DIR, "film_database.db"))
 
+    # Location of the columnar snapshots (Parquet, Arrow) of the database, created by app.install
+    SNAPSHOT_DIR: str = str(os.path.join(DATA_DIR, "snapshots"))
+
+    # Validate every film read from the database with Pydantic. Disabled by default: rows built by app.install
+    # are already clean and checked, so films are built without per-field validation (much faster).
+    FILM_STRICT_VALIDATION: bool = False
+
+    # Admission control, per route class (health, admin, api, html, static): max requests processed at once, and max
+    # requests waiting for a slot, for at most ADMISSION_QUEUE_TIMEOUT seconds. Beyond, requests get a 503 at once.
+    ADMISSION_CONTROL_ENABLE: bool = True
+    ADMISSION_MAX_CONCURRENCY: dict[str, PositiveInt] = Field(
+        default={"health": 4, "admin": 2, "api": 32, "html": 16, "static": 64}
+    )
+    ADMISSION_MAX_QUEUE: dict[str, NonNegativeInt] = Field(
+        default={"health": 16, "admin": 4, "api": 64, "html": 32, "static": 128}
+    )
+    ADMISSION_QUEUE_TIMEOUT: PositiveFloat = Field(default=2)
+
+    # In-memory cache of the public responses (see their Cache-Control header), for deployments without a CDN.
+    # Bounded in bytes (least recently used first). Responses larger than RESPONSE_CACHE_MAX_ENTRY_BYTES are not cached.
+    RESPONSE_CACHE_ENABLE: bool = True
+    RESPONSE_CACHE_MAX_BYTES: PositiveInt = Field(default=64 * 1024 * 1024)
+    RESPONSE_CACHE_MAX_ENTRY_BYTES: PositiveInt = Field(default=1024 * 1024)
+    # Never cached, whatever their headers. The home page shows a random film.
+    RESPONSE_CACHE_EXCLUDED_PATHS: list[str] = Field(default=["/"])
+
+    # Public URL of the website, for the absolute URLs of the sitemaps (see robots.txt)
+    SITE_BASE_URL: HttpUrl = Field(default="https://thebigfilmdatabase.merinorus.com/")
+
     RATE_LIMITER_MAX_REQUESTS: NonNegativeInt = Field(default=30)
     RATE_LIMITER_TIME_WINDOW: NonNegativeFloat = Field(default=30)
 
     TRUSTED_PROXIES: str = Field(default="")
 
+    # Max time (seconds) a request waits for an identical in-flight search, film or autocomplete query
+    SINGLE_FLIGHT_TIMEOUT: PositiveFloat = Field(default=10)
+
+    # Server-side barcode scanning (POST /api/scan): max images per request, and max size of each image (bytes)
+    SCAN_MAX_IMAGES: PositiveInt = Field(default=10)
+    SCAN_MAX_IMAGE_SIZE: PositiveInt = Field(default=5 * 1024 * 1024)
+    # Max image resolution (pixels), checked before decoding the image (decompression bombs)
+    SCAN_MAX_IMAGE_PIXELS: PositiveInt = Field(default=24_000_000)
+    # Images decoded in parallel (worker threads), and max images waiting to be decoded. Beyond, scans get a 503.
+    SCAN_WORKERS: PositiveInt = Field(default=2)
+    SCAN_MAX_PENDING_IMAGES: PositiveInt = Field(default=20)
+
+    # Autocomplete over WebSocket (/api/autocomplete/ws): idle connections are closed after this time (seconds)
+    AUTOCOMPLETE_WEBSOCKET_IDLE_TIMEOUT: PositiveFloat = Field(default=60)
+
+    # Most frequent cached queries (autocompletions, search corrections), tracked in bounded memory, persisted to
+    # HOT_QUERIES_FILEPATH every HOT_QUERIES_PERSIST_INTERVAL seconds, and replayed at startup to warm the caches up.
+    # The application reports itself as ready after the warm-up, which is capped to HOT_QUERIES_WARMUP_TIMEOUT seconds.
+    HOT_QUERIES_ENABLE: bool = True
+    HOT_QUERIES_FILEPATH: str = str(os.path.join(DATA_DIR, "hot_queries.json"))
+    HOT_QUERIES_CAPACITY: PositiveInt = Field(default=1000)
+    HOT_QUERIES_PERSIST_INTERVAL: PositiveFloat = Field(default=300)
+    HOT_QUERIES_WARMUP_TIMEOUT: NonNegativeFloat = Field(default=10)
+
+    # Mount the /admin routes (metrics, diagnostics). Keep them reachable from the internal network only.
+    ADMIN_ENABLE: bool = False
+
+    # Keep the slowest (and failed) database queries with their query plan, visible on /admin/slow-queries
+    SLOW_QUERY_LOG_ENABLE: bool = False
+    SLOW_QUERY_THRESHOLD_MS: NonNegativeFloat = Field(default=20)
+    SLOW_QUERY_LOG_SIZE: PositiveInt = Field(default=100)
+
+    # Send the time spent per stage of each request (SQL, validation, sort, barcode, render) as a Server-Timing
+    # header, and log the breakdown of a fraction (0 to 1) of the requests
+    SERVER_TIMING_ENABLE: bool = False
+    SERVER_TIMING_LOG_SAMPLE_RATE: NonNegativeFloat = Field(default=0, le=1)
+
     model_config = SettingsConfigDict(extra="ignore", env_file=".env", case_sensitive=True)
 
 
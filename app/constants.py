@@ -12,3 +12,17 @@ TEMPLATE_DIR = str(os.path.join(PROJECT_DIR, "templates"))
 # URLS
 STATIC_DIR_URL = "/static/"
 FILM_IMAGE_DIR_URL = "/film-images/"
+
+# Columnar snapshots of the database, generated by app.install. Their file name is versioned by build ID.
+SNAPSHOT_DIR_URL = "/downloads/"
+SNAPSHOT_FORMATS = ("parquet", "arrow")
+
+
+def snapshot_filename(build_id: str, snapshot_format: str) -> str:
+    return f"films-{build_id}.{snapshot_format}"
+
+
+# DX code bundle of the barcode scanner (see app.utils.dx_bundle), served next to the snapshots. Its file
+# name is versioned by content hash.
+def dx_bundle_filename(content_hash: str) -> str:
+    return f"dx-{content_hash}.json"
@@ -0,0 +1,170 @@
+"""Admission control: bounded concurrency per route class, with load shedding.
+
+Every request belongs to a route class (health, admin, api, html or static, see `route_class`), and each class
+has its own budget: at most ADMISSION_MAX_CONCURRENCY requests processed at once, and at most
+ADMISSION_MAX_QUEUE requests waiting for a slot, in order of arrival, for ADMISSION_QUEUE_TIMEOUT seconds.
+Beyond, requests are rejected at once with a 503 and a Retry-After header: shedding early is cheaper than
+timing out late, once the client is gone. Budgets are independent, so a burst of expensive search pages
+can't starve the health checks (and get the container restarted under load), and neither can slow metric
+scrapes or query plan captures (the /admin routes). Rejected requests are recorded in the HTTP request
+metrics too, with their 503 status.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.config import settings
+from app.constants import FILM_IMAGE_DIR_URL, SNAPSHOT_DIR_URL, STATIC_DIR_URL
+from app.core import metrics
+
+ROUTE_CLASSES = ("health", "admin", "api", "html", "static")
+_HEALTH_PATHS = frozenset(("/api/health",))
+# Monitoring endpoints (metrics, slow query log...)
+_ADMIN_PREFIXES = ("/admin/",)
+# Files served as they are, without database access
+_STATIC_PATHS = frozenset(("/favicon.ico", "/robots.txt"))
+_STATIC_PREFIXES = (STATIC_DIR_URL, FILM_IMAGE_DIR_URL, SNAPSHOT_DIR_URL, "/sitemap")
+
+admission_in_flight = metrics.Gauge("admission_in_flight", "Requests being processed, by route class.", ("class",))
+admission_queue_depth = metrics.Gauge(
+    "admission_queue_depth", "Requests waiting for a processing slot, by route class.", ("class",)
+)
+admission_queue_wait = metrics.Histogram(
+    "admission_queue_wait_seconds", "Time spent waiting for a processing slot, by route class.", ("class",)
+)
+admission_rejections = metrics.Counter(
+    "admission_rejections_total",
+    "Requests shed by the admission control, by route class and reason.",
+    ("class", "reason"),
+)
+
+
+def route_class(path: str) -> str:
+    """Return the route class of a request path."""
+    if path in _HEALTH_PATHS:
+        return "health"
+    if path.startswith(_ADMIN_PREFIXES):
+        return "admin"
+    if path.startswith("/api/"):
+        return "api"
+    if path in _STATIC_PATHS or path.startswith(_STATIC_PREFIXES):
+        return "static"
+    return "html"
+
+
+class AdmissionBudget:
+    """Concurrency budget of a route class, with a bounded FIFO queue. Must be used from a single event loop.
+
+    Args:
+        name (str): Name of the route class, used as metric label.
+        max_concurrency (int): Max requests holding a slot at once.
+        max_queue (int): Max requests waiting for a slot. Beyond, `acquire` fails at once.
+        queue_timeout (float): Max time (seconds) a request waits for a slot.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        # Waiting requests, in order of arrival. Their future gets True when a slot is handed over to them,
+        # or False when their deadline expires.
+        self._waiters: deque[asyncio.Future] = deque()
+        self._update_metrics()
+
+    def _update_metrics(self) -> None:
+        admission_in_flight.set(self.active, self.name)
+        admission_queue_depth.set(len(self._waiters), self.name)
+
+    async def acquire(self) -> bool:
+        """Take a slot, waiting for one if needed. Return False if the request must be rejected.
+
+        A successful call must be followed by a call to `release`.
+        """
+        if self.active < self.max_concurrency and not self._waiters:
+            self.active += 1
+            self._update_metrics()
+            return True
+        if len(self._waiters) >= self.max_queue:
+            admission_rejections.inc(self.name, "queue_full")
+            return False
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        self._update_metrics()
+        timer = loop.call_later(self.queue_timeout, self._expire, waiter)
+        start = time.perf_counter()
+        try:
+            admitted = await waiter
+        except asyncio.CancelledError:
+            # Client gone while waiting: give the slot back if it was handed over in the meantime
+            if waiter.done() and not waiter.cancelled() and waiter.result():
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                self._update_metrics()
+            raise
+        finally:
+            timer.cancel()
+        admission_queue_wait.observe(time.perf_counter() - start, self.name)
+        if not admitted:
+            admission_rejections.inc(self.name, "queue_timeout")
+        return admitted
+
+    def _expire(self, waiter: asyncio.Future) -> None:
+        if not waiter.done():
+            self._waiters.remove(waiter)
+            self._update_metrics()
+            waiter.set_result(False)
+
+    def release(self) -> None:
+        """Give the slot back: hand it over to the oldest waiting request, if any."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)
+                self._update_metrics()
+                return
+        self.active -= 1
+        self._update_metrics()
+
+
+class AdmissionControlMiddleware:
+    """ASGI middleware applying the budget of each route class to the HTTP requests."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.budgets = {
+            name: AdmissionBudget(
+                name,
+                settings.ADMISSION_MAX_CONCURRENCY[name],
+                settings.ADMISSION_MAX_QUEUE[name],
+                settings.ADMISSION_QUEUE_TIMEOUT,
+            )
+            for name in ROUTE_CLASSES
+        }
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        budget = self.budgets[route_class(scope["path"])]
+        if not await budget.acquire():
+            response = JSONResponse(
+                status_code=503, content={"detail": "Service Unavailable"}, headers={"Retry-After": "1"}
+            )
+            await response(scope, receive, send)
+            # Answered before the metrics middleware
+            metrics.observe_http_request(scope, response.status_code, time.perf_counter() - start)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            budget.release()
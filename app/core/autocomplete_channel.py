@@ -0,0 +1,89 @@
+"""Autocomplete channel: the autocomplete queries of a WebSocket connection (see /api/autocomplete/ws).
+
+A client sends one query per keystroke, for the name and manufacturer inputs, over a single connection:
+no connection handling, rate limiting or response model per keystroke. Only the latest query of each
+column matters. So each column runs at most one query at a time: a query superseded by a newer keystroke
+before it starts is dropped, and the answer of a query superseded while it runs is not sent (the query
+itself completes in its worker thread, and fills the autocomplete cache). Typing bursts therefore cost
+at most one query per column and per connection at a time, whatever the typing speed.
+"""
+
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from starlette.websockets import WebSocketDisconnect
+
+from app.core import film, metrics
+
+logger = logging.getLogger(__name__)
+
+autocomplete_channel_connections = metrics.Gauge(
+    "autocomplete_channel_connections", "Open autocomplete WebSocket connections."
+)
+autocomplete_channel_queries = metrics.Counter(
+    "autocomplete_channel_queries_total",
+    "Autocomplete queries received over WebSocket, by result (answered, superseded, invalid).",
+    ("result",),
+)
+
+
+class AutocompleteChannel:
+    """Answer the autocomplete queries of a connection, latest query first. Single event loop only.
+
+    Args:
+        send (Callable): Coroutine function sending a JSON message to the client.
+    """
+
+    def __init__(self, send: Callable[[dict[str, Any]], Awaitable[None]]):
+        self._send = send
+        # Latest query of each column, waiting for the running one to finish
+        self._pending: dict[str, tuple[int, str, int]] = {}
+        # Task running the queries of each column, while there are queries to run
+        self._workers: dict[str, asyncio.Task] = {}
+        autocomplete_channel_connections.inc()
+
+    def submit(self, query_id: int, column: str, text: str, limit: int) -> None:
+        """Queue a query, superseding the previous query of the same column."""
+        if column in self._pending:
+            autocomplete_channel_queries.inc("superseded")
+        self._pending[column] = (query_id, text, limit)
+        if column not in self._workers:
+            self._workers[column] = asyncio.create_task(self._answer_latest(column))
+
+    async def _answer_latest(self, column: str) -> None:
+        try:
+            while (query := self._pending.pop(column, None)) is not None:
+                query_id, text, limit = query
+                try:
+                    message = {
+                        "id": query_id,
+                        "column": column,
+                        "data": await film.coalesced_autocomplete(column=column, text=text, limit=limit),
+                    }
+                except TimeoutError:
+                    # Overloaded server (see SINGLE_FLIGHT_TIMEOUT), like the 503 of the HTTP routes
+                    message = {"id": query_id, "column": column, "error": "Service Unavailable"}
+                if column in self._pending:
+                    # A newer keystroke arrived meanwhile: its answer will replace this one
+                    autocomplete_channel_queries.inc("superseded")
+                    continue
+                await self._send(message)
+                autocomplete_channel_queries.inc("answered")
+        except WebSocketDisconnect:
+            # The client left while its answer was being sent: the connection ends the channel (see close)
+            pass
+        except Exception as e:
+            logger.error(f"Autocomplete channel failed on the {column} column. Error detail:\n{e}")
+        finally:
+            self._workers.pop(column, None)
+
+    async def close(self) -> None:
+        """Drop the pending queries, and stop waiting for the running ones. Call once, when the connection ends."""
+        self._pending.clear()
+        workers = list(self._workers.values())
+        for worker in workers:
+            worker.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        autocomplete_channel_connections.inc(amount=-1)
@@ -1,26 +1,38 @@
 import logging
+from functools import lru_cache
 from urllib.parse import urljoin
 
-import httpx
-
 from app.config import settings
 from app.constants import FILM_IMAGE_DIR_URL
+from app.core import metrics
 
 logger = logging.getLogger(__name__)
 _image_cdn_base_url = settings.FILM_IMAGE_CDN_BASE_URLS[0]
 
+cdn_switches = metrics.Counter("cdn_switches_total", "Switches of the film image CDN base URL.")
+
 
 def image_cdn_base_url():
     return str(_image_cdn_base_url)
 
 
+# urljoin() is slow compared to building a film, and the same pictures are requested over and over.
+# Keyed by base URL too, so switching the CDN doesn't serve stale URLs.
+@lru_cache(maxsize=16384)
+def _join_image_url(base_url: str, image: str) -> str:
+    return str(urljoin(base_url, image))
+
+
 def get_film_image_url(image: str, *, cdn_enable=settings.FILM_IMAGE_CDN_ENABLE, base_url=None):
     base_url = base_url or image_cdn_base_url() if cdn_enable else str(FILM_IMAGE_DIR_URL)
-    return str(urljoin(base_url, image))
+    return _join_image_url(base_url, image)
 
 
 async def update_cdn_url():
     global _image_cdn_base_url
+    # Only needed if the CDN is enabled: not imported with the application
+    import httpx
+
     from app.core.database import db_ram_connection
 
     # Get a sample image path from the database
@@ -41,6 +53,7 @@ async def update_cdn_url():
                 if base_url != _image_cdn_base_url:
                     logger.warning(f"Switching CDN base URL from '{_image_cdn_base_url}' to '{base_url}'.")
                     _image_cdn_base_url = base_url
+                    cdn_switches.inc()
                 return
             except httpx.HTTPError as e:
                 logger.warning(f"Error with this CDN: {base_url}\n{e}")
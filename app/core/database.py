@@ -1,13 +1,61 @@
-"""Connection to the database."""
+"""Connection to the database.
+
+The database file is copied in RAM by `load_database`, called once at startup (see `app.app.lifespan`),
+not at import time: importing the application stays cheap, and doesn't need the database file.
+"""
 
 import sqlite3
 
 from app.config import settings
+from app.core import metrics
+from app.core.tables import DB_METADATA_TABLE
+
+# Cache the database in RAM for faster access. Empty until `load_database` is called.
+# Shared by the worker threads of coalesced queries (see app.core.singleflight): the database is read-only
+# after startup, every query uses its own cursor, and SQLite serializes the access to the connection.
+db_ram_connection = sqlite3.connect(":memory:", check_same_thread=False)
+
+# Set by `load_database`. Read them as module attributes (`database.total_count`), not imported names.
+total_count = 0
+# Build information (see app.core.tables.DB_METADATA_KEYS), empty if the database predates it
+db_metadata: dict[str, str] = {}
+db_build_id: str | None = None
+db_build_date: str | None = None
+
+
+def load_database() -> None:
+    """Copy the database file in RAM, and read its metadata."""
+    global total_count, db_metadata, db_build_id, db_build_date
+    db_file_connection = sqlite3.connect(settings.DB_SQLITE_FILEPATH)
+    db_file_connection.backup(db_ram_connection)
+    db_file_connection.close()
+
+    total_count = db_ram_connection.execute("SELECT COUNT(*) FROM films").fetchone()[0]
+    db_metadata = (
+        dict(db_ram_connection.execute(f"SELECT key, value FROM {DB_METADATA_TABLE}").fetchall())  # nosec B608
+        if table_exists(DB_METADATA_TABLE)
+        else {}
+    )
+    db_build_id = db_metadata.get("build_id")
+    db_build_date = db_metadata.get("build_date")
+
+
+def table_exists(table_name: str) -> bool:
+    """Return True if the table exists. Tables added over time may be missing from older databases."""
+    return (
+        db_ram_connection.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", [table_name]
+        ).fetchone()
+        is not None
+    )
+
+
+def db_ram_size() -> int:
+    """Return the size of the in-RAM database, in bytes."""
+    page_count = db_ram_connection.execute("PRAGMA page_count").fetchone()[0]
+    page_size = db_ram_connection.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
 
-# Cache the database in RAM for faster access
-db_file_connection = sqlite3.connect(settings.DB_SQLITE_FILEPATH)
-db_ram_connection = sqlite3.connect(":memory:")
-db_file_connection.backup(db_ram_connection)
-db_file_connection.close()
 
-total_count = len(db_ram_connection.cursor().execute("SELECT * FROM films").fetchall())
+metrics.Gauge("db_ram_size_bytes", "Size of the in-RAM database.", function=db_ram_size)
+metrics.Gauge("db_films", "Number of films in the database.", function=lambda: total_count)
@@ -0,0 +1,106 @@
+"""Facet counts of search results: number of films per manufacturer, country, availability, reliability
+and decade of production.
+
+At load time (see `app.core.film.load_films`), each facet value gets a bitmap of its films (a Python integer,
+one bit per film). The counts of any set of films are then the population counts of its bitmap intersected
+with each value bitmap: a few microseconds per value, whatever the number of films, instead of GROUP BY scans.
+"""
+
+import sqlite3
+from collections import defaultdict
+from collections.abc import Iterable
+from typing import Any
+
+from app.core import metrics
+from app.core.schemas.film import AvailabilityStatus
+from app.core.tables import SELECT_FACET_VALUES
+from app.utils.manufacturers import split_manufacturers
+
+FACETS = ("manufacturer", "country", "availability", "reliability", "decade")
+# Facets that are also exact search filters (see film.search): they can be resolved with the bitmaps alone
+FILTER_FACETS = ("country", "availability", "reliability", "decade")
+
+
+class FacetIndex:
+    """Bitmaps of the films of every facet value, and the bit of every film. Empty until loaded."""
+
+    def __init__(self):
+        self._index(())
+
+    def load(self, connection: sqlite3.Connection) -> None:
+        """Index all the films of the database. Only called at startup, before the index is shared."""
+        self._index(connection.execute(SELECT_FACET_VALUES))
+
+    def _index(self, rows: Iterable[tuple[Any, ...]]) -> None:
+        self._bits: dict[int, int] = {}
+        # Values are case insensitive, like the SQL filters (eg. country COLLATE NOCASE): they are keyed by their
+        # casefolded value, and counted under the first spelling met
+        positions: dict[str, dict[str, list[int]]] = {facet: defaultdict(list) for facet in FACETS}
+        self._labels: dict[str, dict[str, str]] = {facet: {} for facet in FACETS}
+
+        def add(facet: str, value: str, position: int) -> None:
+            key = value.casefold()
+            self._labels[facet].setdefault(key, value)
+            positions[facet][key].append(position)
+
+        for position, (film_id, manufacturer, country, availability, reliability, decade) in enumerate(rows):
+            self._bits[film_id] = position
+            for manufacturer_name in split_manufacturers(manufacturer):
+                add("manufacturer", manufacturer_name, position)
+            if country:
+                add("country", country, position)
+            status = AvailabilityStatus(availability) if availability is not None else None
+            add("availability", AvailabilityStatus.json_format(status), position)
+            if reliability is not None:
+                add("reliability", str(reliability), position)
+            if decade is not None:
+                add("decade", str(decade), position)
+
+        self.size = len(self._bits)
+        self.all_films = (1 << self.size) - 1
+        self._bitmaps = {
+            facet: {key: self._bitmap(key_positions) for key, key_positions in keys.items()}
+            for facet, keys in positions.items()
+        }
+
+    def _bitmap(self, positions: Iterable[int]) -> int:
+        # Set the bits in a byte array, then convert it once: OR-ing bits one by one into a Python integer
+        # would copy the whole integer for each film.
+        bits = bytearray((self.size + 7) // 8)
+        for position in positions:
+            bits[position >> 3] |= 1 << (position & 7)
+        return int.from_bytes(bits, "little")
+
+    def bitmap(self, film_ids: Iterable[int]) -> int:
+        """Return the bitmap of the given films. Unknown IDs are ignored."""
+        return self._bitmap(self._bits[film_id] for film_id in film_ids if film_id in self._bits)
+
+    def filter_bitmap(self, facet: str, value: str | int) -> int:
+        """Return the bitmap of the films matching a filter facet value (see FILTER_FACETS)."""
+        return self._bitmaps[facet].get(str(value).casefold(), 0)
+
+    def counts(self, bitmap: int) -> dict[str, dict[str, int]]:
+        """Return the number of films of the bitmap per facet value, most frequent values first.
+
+        Values without any film are omitted.
+        """
+        facet_counts = {}
+        for facet, keys in self._bitmaps.items():
+            labels = self._labels[facet]
+            value_counts = [(labels[key], (bitmap & key_bitmap).bit_count()) for key, key_bitmap in keys.items()]
+            value_counts.sort(key=lambda value_count: (-value_count[1], value_count[0]))
+            facet_counts[facet] = {value: count for value, count in value_counts if count}
+        return facet_counts
+
+    def size_bytes(self) -> int:
+        """Approximate memory footprint of the bitmaps."""
+        return sum(
+            value_bitmap.bit_length() // 8 + 28 for values in self._bitmaps.values() for value_bitmap in values.values()
+        )
+
+
+facet_index = FacetIndex()
+
+metrics.Gauge(
+    "facet_index_size_bytes", "Approximate memory footprint of the facet bitmaps.", function=facet_index.size_bytes
+)
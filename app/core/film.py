@@ -1,113 +1,161 @@
-import re
+import itertools
+import logging
 import sqlite3
+import time
 from collections import Counter
+from collections.abc import Iterable, Iterator, Sequence
+from difflib import SequenceMatcher
 from functools import lru_cache
-
-from pydantic import TypeAdapter
-
-from app.core.database import db_ram_connection
-from app.core.schemas.film import FilmInDB, HTMLFilmInDB
+from typing import Any
+
+from app.config import settings
+from app.core import hot_queries, metrics
+from app.core.database import db_ram_connection, load_database, table_exists
+from app.core.facets import FILTER_FACETS, facet_index
+from app.core.film_store import FilmRecord, film_store, load_film_records
+from app.core.profiler import slow_query_log
+from app.core.schemas.film import AVAILABILITY_STATUSES, AvailabilityStatus, FilmInDB, HTMLFilmInDB
+from app.core.schemas.manufacturer import Manufacturer, ManufacturerFilms
+from app.core.server_timing import span
+from app.core.singleflight import SingleFlight
+from app.core.sitemap import load_sitemaps
+from app.core.tables import AUTOCOMPLETE_PREFIXES_TABLE, MANUFACTURERS_TABLE, RELATED_FILMS_TABLE
+from app.utils.autocomplete import (
+    AUTOCOMPLETE_WORD_RE,
+    MAX_AUTOCOMPLETE_RESULTS,
+    MAX_PRECOMPUTED_AUTOCOMPLETE_PREFIX,
+    MIN_AUTOCOMPLETE_PREFIX,
+    completing_words,
+    rank_completions,
+)
+from app.utils.lru import MISSING, peekable_lru_cache
 from app.utils.sql import fulltext_search_param, sanitize_fulltext_string
 from app.utils.url import url_safe_str
 
+logger = logging.getLogger(__name__)
+
 # Max results allowed for a search request
 MAX_RESULTS = 101
+# Films fetched (and held in memory) at once when iterating over the whole database
+EXPORT_BATCH_SIZE = 500
 
 # Static, fully literal autocomplete queries per allowed column. Mapping to ready-made SQL strings
 # (instead of interpolating the column name) avoids any string-built SQL and keeps the column
 # strictly whitelisted.
 _AUTOCOMPLETE_QUERIES = {
-    "name": "SELECT name FROM films WHERE name MATCH ?",
-    "manufacturer": "SELECT manufacturer FROM films WHERE manufacturer MATCH ?",
+    "name": "SELECT name FROM films_fts WHERE name MATCH ?",
+    "manufacturer": "SELECT manufacturer FROM films_fts WHERE manufacturer MATCH ?",
 }
 AUTOCOMPLETE_COLUMNS = tuple(_AUTOCOMPLETE_QUERIES)
-# Max suggestions returned by an autocomplete request
-MAX_AUTOCOMPLETE_RESULTS = 11
-# Minimum length of the word being completed before we start suggesting
-MIN_AUTOCOMPLETE_PREFIX = 2
-# Match word tokens roughly like the FTS5 unicode61 tokenizer. \w is Unicode-aware in Python 3, so
-# this keeps Cyrillic, CJK, accented letters, etc. (a plain [^a-z0-9] split would drop them all).
-_AUTOCOMPLETE_WORD_RE = re.compile(r"\w+")
-# Generic words that carry little distinguishing value. They are still suggested, but their ranking
-# score is multiplied by AUTOCOMPLETE_STOPWORD_PENALTY so they fall below distinctive words (brands,
-# model names, ISO speeds...). Tweak this set freely; it is intentionally lowercase (any language).
-AUTOCOMPLETE_STOPWORDS = frozenset(
-    {
-        "and",
-        "asa",
-        "base",
-        "box",
-        "camera",
-        "code",
-        "color",
-        "colour",
-        "contrast",
-        "couleur",
-        "definition",
-        "din",
-        "direct",
-        "emulsion",
-        "film",
-        "films",
-        "for",
-        "foto",
-        "high",
-        "improved",
-        "iso",
-        "lab",
-        "line",
-        "motion",
-        "negative",
-        "new",
-        "no",
-        "photo",
-        "photography",
-        "picture",
-        "positive",
-        "print",
-        "prints",
-        "process",
-        "professional",
-        "roll",
-        "safety",
-        "sound",
-        "special",
-        "speed",
-        "super",
-        "type",
-        "ultra",
-        "version",
-        "тип",
-    }
+# Precomputed first-word suggestions (see MAX_PRECOMPUTED_AUTOCOMPLETE_PREFIX), missing from older databases
+_AUTOCOMPLETE_PREFIX_QUERY = (
+    "SELECT word FROM autocomplete_prefixes WHERE column_name = ? AND prefix = ? ORDER BY rank LIMIT ?"
+)
+_has_autocomplete_prefixes = False
+# Related films precomputed at install, missing from older databases
+_RELATED_FILMS_QUERY = "SELECT related_film_id FROM related_films WHERE film_id = ? ORDER BY rank"
+_has_related_films = False
+# Manufacturer dictionary built at install, missing from older databases. Films are paginated by their
+# position in the manufacturer (sorted by name), an index range instead of an OFFSET scan.
+MANUFACTURER_PAGE_SIZE = 100
+_MANUFACTURERS_QUERY = "SELECT slug, name, film_count FROM manufacturers ORDER BY film_count DESC, slug"
+_MANUFACTURER_QUERY = "SELECT id, slug, name, film_count FROM manufacturers WHERE slug = ?"
+_MANUFACTURER_FILMS_QUERY = (
+    "SELECT film_id FROM film_manufacturers WHERE manufacturer_id = ? AND position >= ? ORDER BY position LIMIT ?"
 )
-# Multiplier applied to a stopword's score so it ranks low without being removed entirely.
-AUTOCOMPLETE_STOPWORD_PENALTY = 0.05
+_has_manufacturers = False
+# Typo tolerance. Words are corrected from the fulltext vocabulary, indexed by trigrams: shorter words
+# can't be looked up by trigram, and are too short to be told apart from another word anyway.
+FUZZY_MIN_WORD_LENGTH = 4
+# Max vocabulary words (best trigram matches first) compared to a misspelled word
+FUZZY_MAX_CANDIDATES = 50
+# Min similarity ratio (0 to 1) between a misspelled word and its correction
+FUZZY_MIN_SIMILARITY = 0.75
+# Static word lookup queries per allowed column (see _AUTOCOMPLETE_QUERIES)
+_FUZZY_WORD_QUERIES = {
+    "name": "SELECT 1 FROM films_fts WHERE name MATCH ? LIMIT 1",
+    "manufacturer": "SELECT 1 FROM films_fts WHERE manufacturer MATCH ? LIMIT 1",
+}
+_FUZZY_COLUMNS = tuple(_FUZZY_WORD_QUERIES)
+
+_loaded = False
+
+
+def load_films() -> None:
+    """Load the database in RAM, and the in-memory indexes and sitemaps built from it. Idempotent.
 
-cursor = db_ram_connection.cursor()
+    Called once at startup (see `app.app.lifespan`), before serving any request.
+    """
+    global _loaded, _has_autocomplete_prefixes, _has_related_films, _has_manufacturers
+    if _loaded:
+        return
+    load_database()
+    film_store.replace(load_film_records(db_ram_connection))
+    facet_index.load(db_ram_connection)
+    load_sitemaps()
+    _has_autocomplete_prefixes = table_exists(AUTOCOMPLETE_PREFIXES_TABLE)
+    _has_related_films = table_exists(RELATED_FILMS_TABLE)
+    _has_manufacturers = table_exists(MANUFACTURERS_TABLE)
+    _loaded = True
+
+
+def _execute(query_name: str, db_query: str, params: Sequence = ()) -> tuple[list[tuple], list[str]]:
+    """Run a query on the in-RAM database and fetch all its rows, recording its latency.
+
+    If the slow query log is enabled, slow or failed queries are also recorded with their query plan.
+
+    Args:
+        query_name (str): Short, static name of the query, used as metric label (eg. "search").
+        db_query (str): The SQL query.
+        params (Sequence, optional): The SQL query parameters. Defaults to ().
+
+    Returns:
+        tuple[list[tuple], list[str]]: The fetched rows, and the column names.
+    """
+    rows = None
+    start = time.perf_counter()
+    try:
+        with span("sql"):
+            cursor = db_ram_connection.cursor()
+            cursor.execute(db_query, params)
+            rows = cursor.fetchall()
+        column_names = [description[0] for description in cursor.description]
+    except sqlite3.Error as e:
+        if slow_query_log is not None:
+            slow_query_log.record(
+                db_ram_connection, query_name, db_query, params, time.perf_counter() - start, None, error=e
+            )
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        metrics.db_query_duration.observe(duration, query_name)
+    if slow_query_log is not None and slow_query_log.is_slow(duration):
+        slow_query_log.record(db_ram_connection, query_name, db_query, params, duration, len(rows))
+    return rows, column_names
 
 
 def get_film_type(dx_extract: int) -> str | None:
     """Return the film type for the given DX extract code, None if not found."""
     dx_extract = int(dx_extract)
-    row = cursor.execute(
+    rows, column_names = _execute(
+        "get_film_type",
         "SELECT label FROM film_types WHERE ? >= dx_min and ? <= dx_max ORDER BY rowid DESC LIMIT 1",
         [dx_extract, dx_extract],
-    ).fetchone()
-    column_names = [description[0] for description in cursor.description]
-    film_type = dict(zip(column_names, row, strict=False)).get("label") if row else None
+    )
+    film_type = dict(zip(column_names, rows[0], strict=False)).get("label") if rows else None
     return film_type
 
 
+def _to_models(records: Iterable[FilmRecord], model: type[FilmInDB] = HTMLFilmInDB) -> list[FilmInDB]:
+    """Build the models of film records, timed as the "validation" stage (see app.core.server_timing)."""
+    with span("validation"):
+        return [record.to_model(model) for record in records]
+
+
 def get_by_id(rowid: int) -> FilmInDB | None:
     """Return a film in database by its SQLite row ID."""
-    query = "SELECT * FROM films WHERE rowid = ?"
-    cursor.execute(query, [rowid])
-    row = cursor.fetchone()
-    if not row:
-        return None
-    column_names = [description[0] for description in cursor.description]
-    film = dict(zip(column_names, row, strict=False))
-    return FilmInDB(**film)
+    record = film_store.get(rowid)
+    return record.to_model(FilmInDB) if record else None
 
 
 def get_by_url(url: str) -> FilmInDB | None:
@@ -116,15 +164,60 @@ def get_by_url(url: str) -> FilmInDB | None:
         # Silently refuse unsafe URLs (404 error). All films in DB have a valid url safe name.
         result = None
     else:
-        cursor = db_ram_connection.cursor()
-        db_query = "SELECT * FROM films WHERE url_name = ?"
-        cursor.execute(db_query, [url])
-        row = cursor.fetchone()
-        column_names = [description[0] for description in cursor.description]
-        result = HTMLFilmInDB(**dict(zip(column_names, row, strict=False))) if row else None
+        record = film_store.get_by_url(url)
+        result = _to_models([record])[0] if record else None
     return result
 
 
+def get_related(url: str) -> list[FilmInDB] | None:
+    """Return the related films of a film (see app.utils.related), most related first. None if the film is unknown."""
+    record = film_store.get_by_url(url) if url == url_safe_str(url) else None
+    if record is None:
+        return None
+    if not _has_related_films:
+        return []
+    rows, _ = _execute("related_films", _RELATED_FILMS_QUERY, [record.id])
+    return _to_models(film_store.get_many([row[0] for row in rows]))
+
+
+def get_manufacturers() -> list[Manufacturer]:
+    """Return all the manufacturers, with the most films first."""
+    if not _has_manufacturers:
+        return []
+    rows, _ = _execute("manufacturers", _MANUFACTURERS_QUERY)
+    return [Manufacturer(slug=slug, name=name, film_count=film_count) for slug, name, film_count in rows]
+
+
+def get_manufacturer_films(
+    slug: str, page: int = 1, page_size: int = MANUFACTURER_PAGE_SIZE
+) -> ManufacturerFilms | None:
+    """Return a manufacturer and a page of its films, sorted by name.
+
+    Args:
+        slug (str): URL slug of the manufacturer (see app.utils.manufacturers.manufacturer_slug).
+        page (int, optional): Page number, from 1. Pages beyond the last one are empty. Defaults to 1.
+        page_size (int, optional): Films per page. Defaults to MANUFACTURER_PAGE_SIZE.
+
+    Returns:
+        ManufacturerFilms | None: The manufacturer and its films, None if the manufacturer is unknown.
+    """
+    if not _has_manufacturers:
+        return None
+    rows, _ = _execute("manufacturer", _MANUFACTURER_QUERY, [slug])
+    if not rows:
+        return None
+    manufacturer_id, slug, name, film_count = rows[0]
+    rows, _ = _execute(
+        "manufacturer_films", _MANUFACTURER_FILMS_QUERY, [manufacturer_id, (page - 1) * page_size, page_size]
+    )
+    return ManufacturerFilms(
+        manufacturer=Manufacturer(slug=slug, name=name, film_count=film_count),
+        films=_to_models(film_store.get_many([row[0] for row in rows])),
+        page=page,
+        page_count=max(1, -(-film_count // page_size)),
+    )
+
+
 def get_random(limit: int = 1) -> list[FilmInDB]:
     """Return a list of random films from the database.
 
@@ -134,13 +227,23 @@ def get_random(limit: int = 1) -> list[FilmInDB]:
     Returns:
         list[FilmInDB]: The randomly selected films.
     """
-    cursor = db_ram_connection.cursor()
-    cursor.execute("SELECT * FROM films ORDER BY RANDOM() LIMIT ?", [limit])
-    rows = cursor.fetchall()
-    column_names = [description[0] for description in cursor.description]
-    films = [dict(zip(column_names, row, strict=False)) for row in rows]
-    ta = TypeAdapter(list[HTMLFilmInDB])
-    return ta.validate_python(films)
+    return _to_models(film_store.sample(limit))
+
+
+def iter_films(batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[list[FilmInDB]]:
+    """Iterate over all the films of the database, by batches, with a constant memory footprint.
+
+    Films are built from the film store lazily, so only one batch of models is held in memory at a time.
+
+    Args:
+        batch_size (int, optional): Number of films per batch. Defaults to EXPORT_BATCH_SIZE.
+
+    Yields:
+        list[FilmInDB]: The next batch of films, ordered by insertion in the database.
+    """
+    records = iter(film_store)
+    while batch := list(itertools.islice(records, batch_size)):
+        yield _to_models(batch, FilmInDB)
 
 
 def autocomplete(column: str, text: str, limit: int = MAX_AUTOCOMPLETE_RESULTS) -> list[str]:
@@ -177,7 +280,8 @@ def autocomplete(column: str, text: str, limit: int = MAX_AUTOCOMPLETE_RESULTS)
     return list(_autocomplete_cached(column, sanitize_fulltext_string(text), limit))
 
 
-@lru_cache(maxsize=2048)
+# Peekable: cached answers are returned at once, without a worker thread (see coalesced_autocomplete)
+@peekable_lru_cache(maxsize=2048)
 def _autocomplete_cached(column: str, sanitized: str, limit: int) -> tuple[str, ...]:
     """Cached core of :func:`autocomplete`. Operates on already-sanitized text, returns a tuple.
 
@@ -200,15 +304,26 @@ def _autocomplete_cached(column: str, sanitized: str, limit: int) -> tuple[str,
     if not context_words and len(prefix) < MIN_AUTOCOMPLETE_PREFIX:
         return ()
 
+    # First-word suggestions of short prefixes are precomputed at install
+    if (
+        not context_words
+        and len(prefix) <= MAX_PRECOMPUTED_AUTOCOMPLETE_PREFIX
+        and limit <= MAX_AUTOCOMPLETE_RESULTS
+        and AUTOCOMPLETE_WORD_RE.fullmatch(prefix)
+        and _has_autocomplete_prefixes
+    ):
+        rows, _ = _execute("autocomplete_prefix", _AUTOCOMPLETE_PREFIX_QUERY, [column, prefix, limit])
+        return tuple(word for (word,) in rows)
+
     # Already-typed words must match exactly; only the last word (if any) is a prefix query.
     match_param = " ".join([*context_words, prefix + "*"] if prefix else context_words)
 
-    cursor = db_ram_connection.cursor()
     try:
-        cursor.execute(_AUTOCOMPLETE_QUERIES[column], [match_param])
-        rows = cursor.fetchall()
+        rows, _ = _execute("autocomplete", _AUTOCOMPLETE_QUERIES[column], [match_param])
     except sqlite3.OperationalError as e:
-        print(f"SQL Error detected in autocomplete: query will silently fail and return no result. Error detail:\n{e}")
+        logger.error(
+            f"SQL Error detected in autocomplete: query will silently fail and return no result. Error detail:\n{e}"
+        )
         return ()
 
     # Count, per matching film, the distinct words that complete the prefix, skipping already-typed
@@ -216,26 +331,146 @@ def _autocomplete_cached(column: str, sanitized: str, limit: int) -> tuple[str,
     typed_words = set(context_words)
     counts: Counter[str] = Counter()
     for (value,) in rows:
-        if not value:
-            continue
-        completing_words = {
-            word
-            for word in _AUTOCOMPLETE_WORD_RE.findall(value.lower())
-            if word.startswith(prefix) and word not in typed_words
-        }
-        counts.update(completing_words)
+        counts.update(completing_words(value, prefix, typed_words))
 
     # Rank by contextual frequency, but demote generic stopwords so distinctive words surface first.
-    def _score(item: tuple[str, int]) -> float:
-        word, count = item
-        return count * (AUTOCOMPLETE_STOPWORD_PENALTY if word in AUTOCOMPLETE_STOPWORDS else 1.0)
+    return tuple(rank_completions(counts, limit))
+
+
+metrics.Counter(
+    "autocomplete_cache_hits_total",
+    "Autocomplete queries answered from the in-process cache.",
+    function=lambda: _autocomplete_cached.cache_info().hits,
+)
+metrics.Counter(
+    "autocomplete_cache_misses_total",
+    "Autocomplete queries computed from the database.",
+    function=lambda: _autocomplete_cached.cache_info().misses,
+)
+metrics.Gauge(
+    "autocomplete_cache_size",
+    "Number of entries in the autocomplete cache.",
+    function=lambda: _autocomplete_cached.cache_info().currsize,
+)
+
+
+def _search_filters(
+    dx_extract: str = None,
+    dx_full: str = None,
+    name: str = None,
+    manufacturer: str = None,
+    dx_product: int = None,
+    dx_extract_min: int = None,
+    dx_extract_max: int = None,
+    country: str = None,
+    availability: str = None,
+    reliability: int = None,
+    decade: int = None,
+    distributor: str = None,
+    begin_year_min: int = None,
+    begin_year_max: int = None,
+    end_year_min: int = None,
+    end_year_max: int = None,
+) -> tuple[str, list]:
+    """Return the SQL conditions (on the films table) matching the search criterias, and their parameters.
+
+    See :func:`search` for the criterias. The conditions are empty if no criteria is given.
+    """
+    db_filters = ""
+    params = []
 
-    ranked = sorted(counts.items(), key=_score, reverse=True)
-    return tuple(word for word, _ in ranked[:limit])
+    if dx_extract:
+        dx_extract = dx_extract.zfill(4)
+        db_filters += " AND films.dx_extract = ?"
+        params.append(int(dx_extract))
+    if dx_full:
+        # Remove the 1st digit as it the same sort of film
+        # Remove also the 6th digit as it only means the number of half frame. Sort later
+        # Sort the results after DB query
+        dx_full = dx_full.zfill(6)
+        # Keep the part "OR dx_full = ?" because some films still have mismatching dx_part and dx_full numbers.
+        db_filters += " AND (films.dx_extract = ? AND films.dx_full_extract = ? OR films.dx_full = ?)"
+        guessed_dx_extract = dx_extract or dx_full[1:5]
+        dx_full_cropped = dx_full[1:5]
+        params.extend([int(guessed_dx_extract), int(dx_full_cropped), int(dx_full)])
+
+    # Product code and range lookups apply to the DX extract, or to the middle of the DX full code if missing
+    if dx_product is not None:
+        db_filters += " AND films.dx_part_1 = ?"
+        params.append(int(dx_product))
+    if dx_extract_min is not None:
+        db_filters += " AND films.dx_code >= ?"
+        params.append(int(dx_extract_min))
+    if dx_extract_max is not None:
+        db_filters += " AND films.dx_code <= ?"
+        params.append(int(dx_extract_max))
+
+    # Facet filters, on indexed columns
+    if country:
+        db_filters += " AND films.country = ?"
+        params.append(country)
+    if availability:
+        statuses = AVAILABILITY_STATUSES[availability]
+        condition = f"films.availability IN ({', '.join('?' * len(statuses))})"
+        if AvailabilityStatus.json_format(None) == availability:
+            condition = f"({condition} OR films.availability IS NULL)"
+        db_filters += f" AND {condition}"
+        params.extend(int(status) for status in statuses)
+    if reliability is not None:
+        db_filters += " AND films.reliability = ?"
+        params.append(int(reliability))
+    if decade is not None:
+        db_filters += " AND films.begin_year_int BETWEEN ? AND ?"
+        params.extend([int(decade), int(decade) + 9])
+
+    # Other filters, on indexed columns
+    if distributor:
+        db_filters += " AND films.distributor = ?"
+        params.append(distributor)
+    if begin_year_min is not None:
+        db_filters += " AND films.begin_year_int >= ?"
+        params.append(int(begin_year_min))
+    if begin_year_max is not None:
+        db_filters += " AND films.begin_year_int <= ?"
+        params.append(int(begin_year_max))
+    if end_year_min is not None:
+        db_filters += " AND films.end_year_int >= ?"
+        params.append(int(end_year_min))
+    if end_year_max is not None:
+        db_filters += " AND films.end_year_int <= ?"
+        params.append(int(end_year_max))
+
+    # Both fulltext conditions are resolved by a single query on the fulltext index
+    fulltext_conditions = []
+    if name:
+        fulltext_conditions.append("name MATCH ?")
+        params.append(fulltext_search_param(name))
+    if manufacturer:
+        fulltext_conditions.append("manufacturer MATCH ?")
+        params.append(fulltext_search_param(manufacturer))
+    if fulltext_conditions:
+        db_filters += f" AND films.id IN (SELECT rowid FROM films_fts WHERE {' AND '.join(fulltext_conditions)})"
+    return db_filters, params
 
 
 def search(
-    dx_extract: str = None, dx_full: str = None, name: str = None, manufacturer: str = None, limit: int = MAX_RESULTS
+    dx_extract: str = None,
+    dx_full: str = None,
+    name: str = None,
+    manufacturer: str = None,
+    limit: int = MAX_RESULTS,
+    dx_product: int = None,
+    dx_extract_min: int = None,
+    dx_extract_max: int = None,
+    country: str = None,
+    availability: str = None,
+    reliability: int = None,
+    decade: int = None,
+    distributor: str = None,
+    begin_year_min: int = None,
+    begin_year_max: int = None,
+    end_year_min: int = None,
+    end_year_max: int = None,
 ) -> list[FilmInDB]:
     """Return the list of films in database, given the search criterias. At least one must be given.
 
@@ -244,6 +479,18 @@ def search(
         dx_full (str, optional): DX full code (6 digits, with leading zeros). Defaults to None.
         name (str, optional): Film name. Defaults to None.
         manufacturer (str, optional): Film manufacturer. Defaults to None.
+        dx_product (int, optional): DX number part 1 (product code), any generation. Defaults to None.
+        dx_extract_min (int, optional): Lower bound of the DX code extract range (inclusive). Defaults to None.
+        dx_extract_max (int, optional): Upper bound of the DX code extract range (inclusive). Defaults to None.
+        country (str, optional): Exact country (case insensitive). Defaults to None.
+        availability (str, optional): Availability, as an AVAILABILITY_STATUSES key. Defaults to None.
+        reliability (int, optional): Reliability of the film data (0 to 4). Defaults to None.
+        decade (int, optional): Decade of the production begin year (eg. 1990). Defaults to None.
+        distributor (str, optional): Exact distributor (case insensitive). Defaults to None.
+        begin_year_min (int, optional): Lower bound of the production begin year (inclusive). Defaults to None.
+        begin_year_max (int, optional): Upper bound of the production begin year (inclusive). Defaults to None.
+        end_year_min (int, optional): Lower bound of the production end year (inclusive). Defaults to None.
+        end_year_max (int, optional): Upper bound of the production end year (inclusive). Defaults to None.
 
     Raises:
         ValueError: If no search parameter is given
@@ -251,81 +498,268 @@ def search(
     Returns:
         list[FilmInDB]: The found films in database
     """
-    db_query = "SELECT * FROM films WHERE 1=1"
-    params = []
-    guessed_dx_extract = None
-
-    if dx_extract:
-        dx_extract = dx_extract.zfill(4)
-        db_query += " AND dx_extract = ?"
-        params.append(dx_extract)
+    db_filters, params = _search_filters(
+        dx_extract=dx_extract,
+        dx_full=dx_full,
+        name=name,
+        manufacturer=manufacturer,
+        dx_product=dx_product,
+        dx_extract_min=dx_extract_min,
+        dx_extract_max=dx_extract_max,
+        country=country,
+        availability=availability,
+        reliability=reliability,
+        decade=decade,
+        distributor=distributor,
+        begin_year_min=begin_year_min,
+        begin_year_max=begin_year_max,
+        end_year_min=end_year_min,
+        end_year_max=end_year_max,
+    )
     if dx_full:
-        # Remove the 1st digit as it the same sort of film
-        # Remove also the 6th digit as it only means the number of half frame. Sort later
-        # Sort the results after DB query
         dx_full = dx_full.zfill(6)
-        # Keep the part "OR dx_full = ?" because some films still have mismatching dx_part and dx_full numbers.
-        db_query += " AND (dx_extract = ? AND dx_full LIKE ? OR dx_full = ?)"
-        guessed_dx_extract = dx_extract or dx_full[1:5]
-        dx_full_cropped = dx_full[1:5]
-        params.extend([guessed_dx_extract, f"_{dx_full_cropped}_", dx_full])
+    dx_range = dx_product is not None or dx_extract_min is not None or dx_extract_max is not None
 
-    if name:
-        db_query += " AND name MATCH ?"
-        params.append(fulltext_search_param(name))
-    if manufacturer:
-        db_query += " AND manufacturer MATCH ?"
-        params.append(fulltext_search_param(manufacturer))
     if params:
+        # Only the matching IDs are selected: the films themselves are read from the film store
+        db_query = f"SELECT films.id FROM films WHERE 1=1{db_filters}"  # nosec B608
         order_by_params = []
-        if dx_extract or dx_full:
-            order_by_params.append("case when dx_full is null then 1 else 0 end, dx_full, dx_extract")
+        if dx_range:
+            order_by_params.append("films.dx_code")
+        if dx_extract or dx_full or dx_range:
+            order_by_params.append("films.dx_full IS NULL, films.dx_full, films.dx_extract")
         if manufacturer:
-            order_by_params.append("manufacturer")
-        order_by_params.append("name, rowid")
+            order_by_params.append("films.manufacturer")
+        order_by_params.append("films.name, films.id")
         db_query += " ORDER BY " + ", ".join(order_by_params) + " LIMIT ?"
         # Do not crop results too much earlier, otherwise the sort would return unrelevant results
         query_limit = min(10 * limit, MAX_RESULTS)
         params.append(query_limit)
         try:
-            cursor.execute(db_query, params)
-            rows = cursor.fetchall()
-
-            # Convert rows to dictionary
-            column_names = [description[0] for description in cursor.description]
-            films = [dict(zip(column_names, row, strict=False)) for row in rows]
+            rows, _ = _execute("search", db_query, params)
+            records = film_store.get_many([row[0] for row in rows])
         except sqlite3.OperationalError as e:
-            print(f"SQL Error detected: query will silently fail and return no result. Error detail:\n{e}")
-            films = []
+            logger.error(f"SQL Error detected: query will silently fail and return no result. Error detail:\n{e}")
+            records = []
 
     else:
         raise ValueError("No search parameters provided.")
 
-    ta = TypeAdapter(list[HTMLFilmInDB])
-    models = ta.validate_python(films)
-
-    # Intelligent sort by name if only this has been provided
-    if name and not any([dx_extract, dx_full, manufacturer]):
-        # contains the exact provided name, ignoring the special characters
-        models.sort(key=lambda x: sanitize_fulltext_string(name) in sanitize_fulltext_string(x.name), reverse=True)
-        # starts with the provided name, ignoring the special characters
-        models.sort(
-            key=lambda x: sanitize_fulltext_string(x.name).startswith(sanitize_fulltext_string(name)),
-            reverse=True,
-        )
-        # contains the exact provided name
-        models.sort(key=lambda x: name.lower() in str(x.name).lower(), reverse=True)
-        # starts with the exact provided name
-        models.sort(key=lambda x: str(x.name).startswith(name), reverse=True)
-        # is exactly the provided name
-        models.sort(key=lambda x: str(x.name).lower() == name.lower(), reverse=True)
-
-    # If a DX full number is provided and matches several films (eg: 012514 -> 012514, 012513, 912513)
-    if dx_full:
-        # is the provided DX Full number, except the last digit (number of full-frame exposures)
-        models.sort(key=lambda x: x.dx_full.startswith(dx_full[:-1]), reverse=True)
-        # is exactly the provided DX Full number
-        models.sort(key=lambda x: x.dx_full == dx_full, reverse=True)
+    models = _to_models(records)
+
+    with span("sort"):
+        # Intelligent sort by name if only this has been provided
+        if name and not any([dx_extract, dx_full, manufacturer]):
+            # contains the exact provided name, ignoring the special characters
+            models.sort(key=lambda x: sanitize_fulltext_string(name) in sanitize_fulltext_string(x.name), reverse=True)
+            # starts with the provided name, ignoring the special characters
+            models.sort(
+                key=lambda x: sanitize_fulltext_string(x.name).startswith(sanitize_fulltext_string(name)),
+                reverse=True,
+            )
+            # contains the exact provided name
+            models.sort(key=lambda x: name.lower() in str(x.name).lower(), reverse=True)
+            # starts with the exact provided name
+            models.sort(key=lambda x: str(x.name).startswith(name), reverse=True)
+            # is exactly the provided name
+            models.sort(key=lambda x: str(x.name).lower() == name.lower(), reverse=True)
+
+        # If a DX full number is provided and matches several films (eg: 012514 -> 012514, 012513, 912513)
+        if dx_full:
+            # is the provided DX Full number, except the last digit (number of full-frame exposures)
+            models.sort(key=lambda x: x.dx_full.startswith(dx_full[:-1]), reverse=True)
+            # is exactly the provided DX Full number
+            models.sort(key=lambda x: x.dx_full == dx_full, reverse=True)
 
     # Limit returned results
     return models[:limit]
+
+
+@lru_cache(maxsize=256)
+def _matching_films_bitmap(criteria: tuple[tuple[str, Any], ...]) -> int:
+    """Return the facet bitmap of the films matching the (hashable) search criterias, from the database."""
+    db_filters, params = _search_filters(**dict(criteria))
+    if not params:
+        return facet_index.all_films
+    try:
+        rows, _ = _execute("facets", f"SELECT films.id FROM films WHERE 1=1{db_filters}", params)  # nosec B608
+    except sqlite3.OperationalError as e:
+        logger.error(f"SQL Error detected: query will silently fail and return no result. Error detail:\n{e}")
+        rows = []
+    return facet_index.bitmap(row[0] for row in rows)
+
+
+def facet_counts(**criteria) -> dict:
+    """Count the films matching the search criterias, per facet value (see app.core.facets).
+
+    Unlike :func:`search`, all the matching films are counted, and no criteria means the whole database.
+    Filters on facet values (country, availability...) are resolved with the facet bitmaps; the other
+    criterias with the database, cached as they are often repeated while the facet filters change.
+
+    Args:
+        **criteria: The search criterias, see :func:`search` (without limit).
+
+    Returns:
+        dict: The number of matching films ("total"), and the counts per facet value ("facets").
+    """
+    bitmap = facet_index.all_films
+    for facet in FILTER_FACETS:
+        value = criteria.pop(facet, None)
+        if value is not None:
+            bitmap &= facet_index.filter_bitmap(facet, value)
+    other_criteria = tuple(sorted((key, value) for key, value in criteria.items() if value is not None))
+    if other_criteria:
+        bitmap &= _matching_films_bitmap(other_criteria)
+    return {"total": bitmap.bit_count(), "facets": facet_index.counts(bitmap)}
+
+
+def _fts_phrase(text: str) -> str:
+    """Quote a text as a FTS5 phrase, so any special character is matched literally."""
+    escaped = text.replace('"', '""')
+    return f'"{escaped}"'
+
+
+def _fulltext_word_exists(column: str, word: str, prefix: bool) -> bool:
+    """Return True if any film contains this word (or a word starting with it) in the given FTS column."""
+    match_param = _fts_phrase(word) + ("*" if prefix else "")
+    rows, _ = _execute("fuzzy_word_exists", _FUZZY_WORD_QUERIES[column], [match_param])
+    return bool(rows)
+
+
+def _closest_word(column: str, word: str, prefix: bool) -> str | None:
+    """Return the vocabulary word of the given FTS column closest to ``word``, None if none is close enough."""
+    trigrams = {word[i : i + 3] for i in range(len(word) - 2)}
+    match_param = " OR ".join(_fts_phrase(trigram) for trigram in trigrams)
+    rows, _ = _execute(
+        "fuzzy_candidates",
+        "SELECT word, films FROM film_words WHERE film_words MATCH ? AND column_name = ? ORDER BY rank LIMIT ?",
+        [match_param, column, FUZZY_MAX_CANDIDATES],
+    )
+    best_word, best_score = None, (FUZZY_MIN_SIMILARITY, 0)
+    for candidate, films in rows:
+        similarity = SequenceMatcher(None, word, candidate).ratio()
+        if prefix:
+            # The word may still be being typed: also compare it to the beginning of the candidate
+            similarity = max(similarity, SequenceMatcher(None, word, candidate[: len(word)]).ratio())
+        # On equal similarity, prefer the most common word
+        if (similarity, films) >= best_score:
+            best_word, best_score = candidate, (similarity, films)
+    return best_word
+
+
+@lru_cache(maxsize=1024)
+def _correct_fulltext_text(column: str, sanitized: str) -> str | None:
+    """Cached core of :func:`did_you_mean`, for a single column. Operates on already-sanitized text."""
+    words = sanitized.split()
+    corrected_words = []
+    for index, word in enumerate(words):
+        # Like fulltext_search_param, the last word is searched as a prefix
+        prefix = index == len(words) - 1 and len(word) >= 3
+        if len(word) < FUZZY_MIN_WORD_LENGTH or _fulltext_word_exists(column, word, prefix):
+            corrected_words.append(word)
+            continue
+        corrected_words.append(_closest_word(column, word, prefix) or word)
+    return " ".join(corrected_words) if corrected_words != words else None
+
+
+def did_you_mean(name: str = None, manufacturer: str = None) -> dict[str, str]:
+    """Suggest corrected search texts, for the misspelled words of a name and/or manufacturer search.
+
+    Each word that no film contains is replaced by the closest word of the same FTS column (trigram
+    candidates, ranked by similarity then frequency). Correct words are kept as is.
+
+    Args:
+        name (str, optional): Film name search text. Defaults to None.
+        manufacturer (str, optional): Film manufacturer search text. Defaults to None.
+
+    Returns:
+        dict[str, str]: The corrected texts, by search parameter. Only contains the corrected parameters.
+    """
+    corrections = {}
+    for column, text in zip(_FUZZY_COLUMNS, (name, manufacturer), strict=True):
+        sanitized = sanitize_fulltext_string(text).strip()
+        if not sanitized:
+            continue
+        hot_queries.record(hot_queries.CORRECTION, column, sanitized)
+        try:
+            corrected = _correct_fulltext_text(column, sanitized)
+        except sqlite3.OperationalError as e:
+            logger.error(f"SQL Error detected in did_you_mean: no correction will be suggested. Error detail:\n{e}")
+            corrected = None
+        if corrected:
+            corrections[column] = corrected
+    return corrections
+
+
+def fuzzy_search(**criteria) -> tuple[list[FilmInDB], dict[str, str] | None]:
+    """Search films like :func:`search`, with a typo-tolerant fallback on the name and manufacturer.
+
+    The fallback only runs when the exact search returns nothing: misspelled words are corrected with
+    :func:`did_you_mean`, then the search is run again with the corrected texts.
+
+    Args:
+        **criteria: The search criterias, see :func:`search`.
+
+    Raises:
+        ValueError: If no search parameter is given
+
+    Returns:
+        tuple[list[FilmInDB], dict[str, str] | None]: The found films, and the corrected search texts if
+            the films were found thanks to them (else None).
+    """
+    films = search(**criteria)
+    if films or not (criteria.get("name") or criteria.get("manufacturer")):
+        return films, None
+    corrections = did_you_mean(name=criteria.get("name"), manufacturer=criteria.get("manufacturer"))
+    if not corrections:
+        return films, None
+    corrected_films = search(**{**criteria, **corrections})
+    return (corrected_films, corrections) if corrected_films else (films, None)
+
+
+# Identical concurrent queries (eg. a burst of requests when a popular CDN cache entry expires) are run once,
+# in a worker thread, and their result is shared (see app.core.singleflight). Keys are normalized like the
+# queries themselves, so callers only share results that are identical anyway.
+_search_flight = SingleFlight("search", settings.SINGLE_FLIGHT_TIMEOUT)
+_film_flight = SingleFlight("film", settings.SINGLE_FLIGHT_TIMEOUT)
+_autocomplete_flight = SingleFlight("autocomplete", settings.SINGLE_FLIGHT_TIMEOUT)
+
+
+async def coalesced_fuzzy_search(**criteria) -> tuple[list[FilmInDB], dict[str, str] | None]:
+    """Like :func:`fuzzy_search`, shared with identical concurrent searches.
+
+    Only identical criteria are shared: the name ranking depends on the case of the provided name.
+    """
+    return await _search_flight.do(tuple(sorted(criteria.items())), fuzzy_search, **criteria)
+
+
+async def coalesced_get_by_url(url: str) -> FilmInDB | None:
+    """Like :func:`get_by_url`, shared with identical concurrent lookups."""
+    return await _film_flight.do(url, get_by_url, url)
+
+
+async def coalesced_autocomplete(column: str, text: str, limit: int = MAX_AUTOCOMPLETE_RESULTS) -> list[str]:
+    """Like :func:`autocomplete`, shared with identical concurrent queries."""
+    key = (column, sanitize_fulltext_string(text), limit)
+    hot_queries.record(hot_queries.AUTOCOMPLETE, *key)
+    # Most keystrokes are already cached: no need for a worker thread (unknown columns are never cached)
+    cached = _autocomplete_cached.peek(*key)
+    if cached is not MISSING:
+        return list(cached)
+    return await _autocomplete_flight.do(key, autocomplete, column, text, limit)
+
+
+def _warm_up_correction(column: str, sanitized: str) -> None:
+    """Fill the cache of a recorded search correction (see did_you_mean)."""
+    try:
+        _correct_fulltext_text(column, sanitized)
+    except sqlite3.OperationalError as e:
+        logger.error(f"SQL Error detected in the warm-up of did_you_mean. Error detail:\n{e}")
+
+
+# Replay of the recorded hot queries at startup, by kind (see app.core.hot_queries). Only the queries whose
+# answer is cached are recorded: the others would warm nothing.
+HOT_QUERY_HANDLERS = {
+    hot_queries.CORRECTION: _warm_up_correction,
+    hot_queries.AUTOCOMPLETE: autocomplete,
+}
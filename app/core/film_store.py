@@ -0,0 +1,134 @@
+"""Compact, immutable in-memory store of the whole film catalogue.
+
+Films are loaded once from the database into slotted records holding the raw column values only: DX
+codes are kept as integers, repeated strings (manufacturers, countries, years...) are interned, so they
+are shared by all the records using them. Derived data (DX strings, manufacturer lists, HTML labels...)
+is computed when a record is turned into a Pydantic model, at the API boundary (see `FilmRecord.to_model`).
+
+The store is empty at import time, and loaded once at startup (see `app.core.film.load_films`). It is
+read-only afterwards, so it is safe to share between threads.
+"""
+
+import random
+import sqlite3
+import sys
+from collections.abc import Iterable, Iterator
+from typing import Any
+
+from app.core import metrics
+from app.core.schemas.film import FilmInDB
+from app.core.tables import FILM_RECORD_COLUMNS, SELECT_FILM_RECORDS
+
+# Columns whose values are repeated across films, interned when loading
+_INTERNED_COLUMNS = frozenset(
+    ("og_film_or_information", "manufacturer", "country", "begin_year", "end_year", "distributor")
+)
+
+
+class FilmRecord:
+    """Raw values of a film, as stored in the films table. Immutable."""
+
+    __slots__ = FILM_RECORD_COLUMNS
+
+    def __init__(self, *values: Any):
+        for column, value in zip(FILM_RECORD_COLUMNS, values, strict=True):
+            object.__setattr__(self, column, value)
+
+    def __setattr__(self, name: str, value: Any):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={self.id!r}, url_name={self.url_name!r})"
+
+    def as_row(self) -> dict[str, Any]:
+        """Return the film as a row selected by `SELECT_FILMS` (DX codes as zero-padded strings)."""
+        return {
+            "dx_extract": None if self.dx_extract is None else f"{self.dx_extract:04d}",
+            "dx_full": None if self.dx_full is None else f"{self.dx_full:06d}",
+            "name": self.name,
+            "url_name": self.url_name,
+            "og_film_or_information": self.og_film_or_information,
+            "reliability": self.reliability,
+            "manufacturer": self.manufacturer,
+            "country": self.country,
+            "begin_year": self.begin_year,
+            "end_year": self.end_year,
+            "distributor": self.distributor,
+            "availability": self.availability,
+            "picture": self.picture,
+        }
+
+    def to_model(self, model: type[FilmInDB] = FilmInDB) -> FilmInDB:
+        """Build the Pydantic model of this film (FilmInDB or a subclass)."""
+        return model.from_db_row(self.as_row())
+
+
+class FilmStore:
+    """All the films, ordered by ID, with lookups by ID and by URL name."""
+
+    def __init__(self, records: Iterable[FilmRecord] = ()):
+        self.replace(records)
+
+    def replace(self, records: Iterable[FilmRecord]) -> None:
+        """Replace all the films of the store. Only called at startup, before the store is shared."""
+        self._records = tuple(records)
+        self._by_id = {record.id: record for record in self._records}
+        self._by_url_name = {record.url_name: record for record in self._records}
+        self.size_bytes = self._size_bytes()
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __iter__(self) -> Iterator[FilmRecord]:
+        return iter(self._records)
+
+    def get(self, film_id: int) -> FilmRecord | None:
+        return self._by_id.get(film_id)
+
+    def get_by_url(self, url_name: str) -> FilmRecord | None:
+        return self._by_url_name.get(url_name)
+
+    def get_many(self, film_ids: list[int]) -> list[FilmRecord]:
+        """Return the records of the given IDs, in the same order. Unknown IDs are skipped."""
+        return [record for film_id in film_ids if (record := self._by_id.get(film_id)) is not None]
+
+    def sample(self, count: int) -> list[FilmRecord]:
+        """Return ``count`` distinct random films (or all of them, shuffled, if there are less)."""
+        return random.sample(self._records, min(count, len(self._records)))  # nosec B311
+
+    def _size_bytes(self) -> int:
+        """Approximate memory footprint of the store: containers, records and every distinct value."""
+        size = sum(sys.getsizeof(container) for container in (self._records, self._by_id, self._by_url_name))
+        seen = set()
+        for record in self._records:
+            size += sys.getsizeof(record)
+            for column in FILM_RECORD_COLUMNS:
+                value = getattr(record, column)
+                # Shared objects (interned strings, small integers, None) are only counted once
+                if id(value) not in seen:
+                    seen.add(id(value))
+                    size += sys.getsizeof(value)
+        return size
+
+
+def load_film_records(connection: sqlite3.Connection) -> list[FilmRecord]:
+    """Load all the films of the database, ordered by ID."""
+    interned_indexes = [index for index, column in enumerate(FILM_RECORD_COLUMNS) if column in _INTERNED_COLUMNS]
+    records = []
+    for row in connection.execute(SELECT_FILM_RECORDS):
+        values = list(row)
+        for index in interned_indexes:
+            if values[index] is not None:
+                values[index] = sys.intern(values[index])
+        records.append(FilmRecord(*values))
+    return records
+
+
+film_store = FilmStore()
+
+metrics.Gauge(
+    "film_store_size_bytes",
+    "Approximate memory footprint of the in-memory film store.",
+    function=lambda: film_store.size_bytes,
+)
+metrics.Gauge("film_store_films", "Number of films in the in-memory film store.", function=lambda: len(film_store))
@@ -0,0 +1,152 @@
+"""Hot queries: the most frequent cached queries, replayed at startup to warm their caches up.
+
+The in-process caches of the autocomplete suggestions and of the search corrections (did you mean) are empty
+after a restart, so the first requests after a deploy are the slowest. Their normalized queries are counted
+in a bounded heavy-hitters sketch (see `app.utils.heavy_hitters`), persisted to HOT_QUERIES_FILEPATH every
+HOT_QUERIES_PERSIST_INTERVAL seconds and at shutdown. At startup, the persisted queries are replayed in a
+worker thread, most frequent first, for at most HOT_QUERIES_WARMUP_TIMEOUT seconds: `/api/health` reports
+the application as starting until then. Searches and film pages are not recorded: they are read from the
+database and the film store, without cache to warm up.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from app.config import settings
+from app.core import metrics
+from app.utils.heavy_hitters import SpaceSaving
+
+logger = logging.getLogger(__name__)
+
+# Kinds of recorded queries. Arguments are JSON-compatible tuples (see `record`).
+AUTOCOMPLETE = "autocomplete"
+CORRECTION = "correction"
+KINDS = (AUTOCOMPLETE, CORRECTION)
+# Persisted counts are halved at each restart, so queries that are no longer popular fade out
+_RESTORED_COUNT_FACTOR = 0.5
+
+_lock = threading.Lock()
+_sketch = SpaceSaving(settings.HOT_QUERIES_CAPACITY)
+# Set when the warm-up is over (or skipped): the application is ready
+_warmed_up = False
+
+metrics.Gauge("hot_queries_tracked", "Queries tracked by the hot query sketch.", function=lambda: len(_sketch))
+warmup_replayed = metrics.Counter("hot_queries_warmup_replayed_total", "Hot queries replayed at startup.")
+warmup_duration = metrics.Gauge("hot_queries_warmup_duration_seconds", "Duration of the startup warm-up.")
+
+
+def record(kind: str, *args: Hashable) -> None:
+    """Count a query. Its arguments must be normalized, and made of strings, numbers, None and tuples."""
+    if settings.HOT_QUERIES_ENABLE:
+        with _lock:
+            _sketch.add((kind, args))
+
+
+def _to_json(value: Any) -> Any:
+    return [_to_json(item) for item in value] if isinstance(value, tuple) else value
+
+
+def _from_json(value: Any) -> Hashable:
+    return tuple(_from_json(item) for item in value) if isinstance(value, list) else value
+
+
+def save(filepath: str = settings.HOT_QUERIES_FILEPATH) -> None:
+    """Persist the tracked queries, most frequent first. The file is replaced atomically."""
+    with _lock:
+        queries = [
+            {"kind": kind, "args": _to_json(args), "count": count} for (kind, args), count, _ in _sketch.most_common()
+        ]
+    # Temporary file of this process: the worker processes of a server may save at the same time
+    with tempfile.NamedTemporaryFile(
+        "w", dir=os.path.dirname(filepath) or ".", prefix=f"{os.path.basename(filepath)}.", suffix=".tmp", delete=False
+    ) as file:
+        json.dump({"queries": queries}, file, separators=(",", ":"))
+    try:
+        os.replace(file.name, filepath)
+    except OSError:
+        os.unlink(file.name)
+        raise
+
+
+def load(filepath: str = settings.HOT_QUERIES_FILEPATH) -> list[tuple[str, tuple]]:
+    """Restore the persisted queries in the sketch, with decayed counts. Return them, most frequent first."""
+    try:
+        with open(filepath) as file:
+            queries = [
+                (query["kind"], _from_json(query["args"]), query["count"]) for query in json.load(file)["queries"]
+            ]
+    except FileNotFoundError:
+        return []
+    except (OSError, ValueError, KeyError, TypeError) as e:
+        logger.error(f"Unable to load the hot queries from {filepath}, starting without them. Error detail:\n{e}")
+        return []
+    # Kinds no longer recorded (eg. by a previous version) are dropped
+    queries = [query for query in queries if query[0] in KINDS][: settings.HOT_QUERIES_CAPACITY]
+    with _lock:
+        _sketch.update(((kind, args), int(count * _RESTORED_COUNT_FACTOR)) for kind, args, count in queries)
+    return [(kind, args) for kind, args, _ in queries]
+
+
+def replay(queries: list[tuple[str, tuple]], handlers: dict[str, Callable[..., Any]], deadline: float) -> int:
+    """Run the queries until the deadline (`time.monotonic`). Return the number of replayed queries."""
+    replayed = 0
+    for index, (kind, args) in enumerate(queries):
+        if time.monotonic() >= deadline:
+            logger.warning(f"Warm-up timeout: {len(queries) - index} hot queries not replayed")
+            break
+        handler = handlers.get(kind)
+        if handler is None:
+            continue
+        try:
+            handler(*args)
+        except (ValueError, TypeError) as e:
+            # Outdated query (eg. the search parameters changed since it was recorded)
+            logger.debug(f"Unable to replay the hot query {kind}{args}: {e}")
+            continue
+        replayed += 1
+        warmup_replayed.inc()
+    return replayed
+
+
+def is_warmed_up() -> bool:
+    return _warmed_up
+
+
+async def warm_up(handlers: dict[str, Callable[..., Any]]) -> None:
+    """Replay the persisted queries in a worker thread, then mark the application as warmed up. Runs once."""
+    global _warmed_up
+    try:
+        if settings.HOT_QUERIES_ENABLE and not _warmed_up:
+            start = time.monotonic()
+            queries = load()
+            replayed = await asyncio.to_thread(replay, queries, handlers, start + settings.HOT_QUERIES_WARMUP_TIMEOUT)
+            warmup_duration.set(time.monotonic() - start)
+            logger.info(f"Warm-up: {replayed} hot queries replayed in {time.monotonic() - start:.2f}s")
+    finally:
+        _warmed_up = True
+
+
+async def persist_periodically() -> None:
+    """Persist the tracked queries every HOT_QUERIES_PERSIST_INTERVAL seconds, and when cancelled (shutdown)."""
+    if not settings.HOT_QUERIES_ENABLE:
+        return
+    try:
+        while True:
+            await asyncio.sleep(settings.HOT_QUERIES_PERSIST_INTERVAL)
+            await asyncio.to_thread(_save_or_log)
+    finally:
+        _save_or_log()
+
+
+def _save_or_log() -> None:
+    try:
+        save()
+    except OSError as e:
+        logger.error(f"Unable to persist the hot queries to {settings.HOT_QUERIES_FILEPATH}. Error detail:\n{e}")
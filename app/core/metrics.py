@@ -0,0 +1,224 @@
+"""Lightweight in-process metrics, exposed in the Prometheus text exposition format.
+
+Recording a value is a dict lookup plus a few additions under an uncontended lock, so metrics can be
+collected on every request without measurable overhead. Values that are expensive or already
+tracked elsewhere (cache statistics, memory usage...) are read through a callback at scrape time only.
+
+Metrics are per process: with several workers, each one exposes its own values.
+"""
+
+import os
+import resource
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+
+# Default latency buckets (seconds): from sub-millisecond SQL lookups to slow HTML renders.
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names: tuple[str, ...], label_values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(label_names, label_values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class of all metrics. Registers itself in the default registry."""
+
+    TYPE = "untyped"
+
+    def __init__(self, name: str, documentation: str, label_names: tuple[str, ...] = (), registry=None):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        (registry if registry is not None else REGISTRY).register(self)
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    """A monotonically increasing value, optionally split by labels.
+
+    If ``function`` is given, the value is read from it at scrape time instead (eg. a cache hit count
+    already maintained by another component).
+    """
+
+    TYPE = "counter"
+
+    def __init__(self, *args, function: Callable[[], float] | None = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._function = function
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        if self._function is not None:
+            yield f"{self.name} {_format_value(self._function())}"
+            return
+        with self._lock:
+            values = list(self._values.items())
+        for label_values, value in values:
+            yield f"{self.name}{_format_labels(self.label_names, label_values)} {_format_value(value)}"
+
+
+class Gauge(Counter):
+    """A value that can go up and down. Either set explicitly, or read from ``function`` at scrape time."""
+
+    TYPE = "gauge"
+
+    def set(self, value: float, *label_values: str) -> None:
+        with self._lock:
+            self._values[label_values] = value
+
+
+class Histogram(_Metric):
+    """Distribution of observed values (eg. latencies, in seconds) over fixed cumulative buckets."""
+
+    TYPE = "histogram"
+
+    def __init__(self, *args, buckets: tuple[float, ...] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [count per bucket (non cumulative, last one is +Inf)..., sum]
+        self._values: dict[tuple[str, ...], list[float]] = {}
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(label_values)
+            if data is None:
+                data = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            data[index] += 1
+            data[-1] += value
+
+    @contextmanager
+    def time(self, *label_values: str):
+        """Observe the duration of the enclosed block, in seconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = [(label_values, list(data)) for label_values, data in self._values.items()]
+        for label_values, data in values:
+            cumulative = 0
+            for upper_bound, count in zip((*self.buckets, float("inf")), data[:-1], strict=True):
+                cumulative += count
+                labels = _format_labels(self.label_names, label_values, f'le="{_format_value(upper_bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.label_names, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(data[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Registry:
+    """A collection of metrics, rendered together."""
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> None:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name!r}")
+        self._metrics[metric.name] = metric
+
+    def render(self) -> str:
+        """Return all the metrics in the Prometheus text exposition format."""
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def _process_resident_memory_bytes() -> float:
+    """Current resident memory of this process. Falls back to the peak value outside Linux."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is in kilobytes on Linux, but this branch is mostly reached on macOS (bytes)
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Metrics shared across the application. Component-specific metrics are declared next to their component.
+http_request_duration = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, in seconds.",
+    ("method", "route", "status"),
+)
+db_query_duration = Histogram(
+    "db_query_duration_seconds",
+    "Database query latency (execution and fetch), in seconds.",
+    ("query",),
+)
+rate_limiter_rejections = Counter("rate_limiter_rejections_total", "Requests rejected by the rate limiter.")
+process_resident_memory = Gauge(
+    "process_resident_memory_bytes", "Resident memory size of the process.", function=_process_resident_memory_bytes
+)
+
+
+# Routes matched by `route_label` for the requests answered before the routing (see `register_routes`)
+_registered_routes: list = []
+
+
+def register_routes(routes: Iterable) -> None:
+    """Register routes matched by `route_label` for the requests answered before the routing (eg. rejected by
+    the admission control). The routes of an included router are registered from the router (eg. `api.routes`).
+    """
+    _registered_routes.extend(routes)
+
+
+def route_label(scope: dict) -> str:
+    """Return the route label of an HTTP request: its route template (eg. "/film/{url_name}"), not its raw path,
+    to keep the cardinality bounded. Mounted apps (static files) are labelled by their mount path (eg. "/static").
+
+    Requests answered before the routing (eg. by a middleware) are matched against the registered routes.
+    """
+    route = scope.get("route")
+    if route is not None:
+        return route.path
+    if scope.get("root_path"):
+        return scope["root_path"]
+    if _registered_routes:
+        from starlette.routing import Match
+
+        for route in _registered_routes:
+            if route.matches(scope)[0] is Match.FULL:
+                return route.path
+    return "unmatched"
+
+
+def observe_http_request(scope: dict, status: int, duration: float, route: str | None = None) -> None:
+    """Record the latency of an HTTP request, by method, route (see `route_label`) and status."""
+    http_request_duration.observe(duration, scope["method"], route or route_label(scope), str(status))
@@ -0,0 +1,89 @@
+"""Opt-in slow query log.
+
+Any database query slower than SLOW_QUERY_THRESHOLD_MS (or failing) is kept in a bounded in-memory ring,
+along with its parameters, row count and `EXPLAIN QUERY PLAN` output. The plan is only computed for
+recorded queries, so fast queries pay nothing more than a comparison.
+"""
+
+import logging
+import sqlite3
+import threading
+from collections import deque
+from collections.abc import Sequence
+from datetime import UTC, datetime
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+def explain_query_plan(connection: sqlite3.Connection, db_query: str, params: Sequence = ()) -> list[str]:
+    """Return the query plan of a statement, one indented line per step (like the sqlite3 shell)."""
+    try:
+        rows = connection.execute("EXPLAIN QUERY PLAN " + db_query, params).fetchall()  # nosec B608
+    except sqlite3.Error as e:
+        return [f"Unable to explain the query: {e}"]
+    depths = {0: -1}
+    plan = []
+    for step_id, parent_id, _, detail in rows:
+        depths[step_id] = depths.get(parent_id, -1) + 1
+        plan.append("  " * depths[step_id] + detail)
+    return plan
+
+
+class SlowQueryLog:
+    """Bounded ring of the most recent slow (or failed) queries."""
+
+    def __init__(self, threshold_ms: float, size: int):
+        self.threshold = threshold_ms / 1000
+        self._entries: deque[dict] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def is_slow(self, duration: float) -> bool:
+        return duration >= self.threshold
+
+    def record(
+        self,
+        connection: sqlite3.Connection,
+        query_name: str,
+        db_query: str,
+        params: Sequence,
+        duration: float,
+        row_count: int | None,
+        error: Exception | None = None,
+    ) -> dict:
+        """Add a query to the log, with its query plan, and return the recorded entry."""
+        entry = {
+            "date": datetime.now(UTC).isoformat(timespec="milliseconds"),
+            "query_name": query_name,
+            "duration_ms": round(duration * 1000, 3),
+            "row_count": row_count,
+            "error": str(error) if error else None,
+            "sql": db_query,
+            "params": list(params),
+            "query_plan": explain_query_plan(connection, db_query, params),
+        }
+        with self._lock:
+            self._entries.append(entry)
+        logger.warning(
+            f"{'Failed' if error else 'Slow'} query '{query_name}' ({entry['duration_ms']} ms, {row_count} rows): "
+            f"{db_query} {entry['params']}\n" + "\n".join(entry["query_plan"])
+        )
+        return entry
+
+    def entries(self) -> list[dict]:
+        """Return the recorded queries, most recent first."""
+        with self._lock:
+            return list(reversed(self._entries))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# None if the slow query log is disabled
+slow_query_log = (
+    SlowQueryLog(settings.SLOW_QUERY_THRESHOLD_MS, settings.SLOW_QUERY_LOG_SIZE)
+    if settings.SLOW_QUERY_LOG_ENABLE
+    else None
+)
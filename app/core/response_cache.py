@@ -0,0 +1,181 @@
+"""In-process HTTP response cache, for deployments without a CDN.
+
+Successful GET responses declaring a public `max-age` (see the *_CACHE_CONTROL headers of the routes) are
+kept in memory, body and headers, for that long. Identical requests (same host, path, query parameters in
+any order, and Accept-Encoding) are then answered from memory, without reaching the application: like
+with a CDN, cache hits skip the admission control and the rate limiter. They are still recorded in the
+HTTP request metrics, under the route of the cached response. HEAD requests are left to the application,
+which only answers them on some routes (see /api/health).
+
+The cache is bounded by RESPONSE_CACHE_MAX_BYTES (least recently used responses are evicted first). The
+database is loaded once per process, so cached responses can't outlive its build. Conditional requests
+(If-None-Match...) and the uncached pages (RESPONSE_CACHE_EXCLUDED_PATHS, eg. the home page and its random
+film) always reach the application.
+"""
+
+import re
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.core import metrics
+
+# Request headers making the response specific to the client
+_BYPASS_REQUEST_HEADERS = ("authorization", "cookie", "if-none-match", "if-modified-since", "range")
+_MAX_AGE_RE = re.compile(r"(?:^|,)\s*max-age=(\d+)")
+_UNCACHEABLE_DIRECTIVES = ("private", "no-store", "no-cache")
+
+response_cache_requests = metrics.Counter(
+    "response_cache_requests_total", "Requests seen by the response cache, by result (hit, miss, bypass).", ("result",)
+)
+
+
+class CachedResponse:
+    """A complete response, cached until its expiry time (`time.monotonic`), with the label of its route."""
+
+    __slots__ = ("status", "headers", "body", "route", "created", "expires", "size")
+
+    def __init__(self, status: int, headers: list[tuple[bytes, bytes]], body: bytes, route: str, max_age: int):
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.route = route
+        self.created = time.monotonic()
+        self.expires = self.created + max_age
+        self.size = len(body) + sum(len(name) + len(value) for name, value in headers)
+
+
+def _max_age(headers: Headers) -> int | None:
+    """Return the max-age of a response that may be shared, None if it must not be cached."""
+    cache_control = headers.get("cache-control", "").lower()
+    if "public" not in cache_control or any(directive in cache_control for directive in _UNCACHEABLE_DIRECTIVES):
+        return None
+    if "set-cookie" in headers:
+        return None
+    # The cache key only varies on Accept-Encoding
+    vary = {value.strip() for value in headers.get("vary", "").lower().split(",") if value.strip()}
+    if vary - {"accept-encoding"}:
+        return None
+    match = _MAX_AGE_RE.search(cache_control)
+    max_age = int(match.group(1)) if match else 0
+    return max_age or None
+
+
+class ResponseCache:
+    """Cached responses by request key, bounded in bytes, least recently used first. Single event loop only."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict[tuple, CachedResponse] = OrderedDict()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: tuple) -> CachedResponse | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= time.monotonic():
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, entry: CachedResponse) -> None:
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = entry
+        self.size += entry.size
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: tuple) -> None:
+        self.size -= self._entries.pop(key).size
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.size = 0
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_BYTES)
+metrics.Gauge("response_cache_size_bytes", "Size of the cached responses.", function=lambda: response_cache.size)
+metrics.Gauge("response_cache_entries", "Number of cached responses.", function=lambda: len(response_cache))
+
+
+def _cache_key(scope: Scope, headers: Headers) -> tuple:
+    """Return the cache key of a request: host, path, sorted query parameters and accepted encodings."""
+    query = sorted(parse_qsl(scope["query_string"].decode("latin-1"), keep_blank_values=True))
+    accept_encoding = ",".join(
+        sorted(encoding.strip() for encoding in headers.get("accept-encoding", "").lower().split(","))
+    )
+    return (scope["scheme"], headers.get("host"), scope["path"], urlencode(query), accept_encoding)
+
+
+class ResponseCacheMiddleware:
+    """ASGI middleware answering the requests from the response cache, and filling it."""
+
+    def __init__(self, app: ASGIApp, cache: ResponseCache = response_cache):
+        self.app = app
+        self.cache = cache
+        self.max_entry_bytes = settings.RESPONSE_CACHE_MAX_ENTRY_BYTES
+        self.excluded_paths = frozenset(settings.RESPONSE_CACHE_EXCLUDED_PATHS)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET" or scope["path"] in self.excluded_paths:
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if any(name in headers for name in _BYPASS_REQUEST_HEADERS):
+            response_cache_requests.inc("bypass")
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        key = _cache_key(scope, headers)
+        entry = self.cache.get(key)
+        if entry is not None:
+            response_cache_requests.inc("hit")
+            await self._send_cached(entry, send)
+            metrics.observe_http_request(scope, entry.status, time.perf_counter() - start, entry.route)
+            return
+        response_cache_requests.inc("miss")
+
+        # Forward the response as it comes, and keep a copy if it can be cached
+        start_message: Message | None = None
+        max_age = None
+        body = []
+        body_size = 0
+
+        async def send_and_cache(message: Message) -> None:
+            nonlocal start_message, max_age, body_size
+            if message["type"] == "http.response.start":
+                start_message = message
+                if message["status"] == 200:
+                    max_age = _max_age(Headers(raw=message["headers"]))
+            elif message["type"] == "http.response.body" and max_age is not None:
+                body.append(message.get("body", b""))
+                body_size += len(body[-1])
+                if body_size > self.max_entry_bytes:
+                    max_age = None
+                    body.clear()
+                elif not message.get("more_body", False):
+                    self.cache.put(
+                        key,
+                        CachedResponse(
+                            200, list(start_message["headers"]), b"".join(body), metrics.route_label(scope), max_age
+                        ),
+                    )
+            await send(message)
+
+        await self.app(scope, receive, send_and_cache)
+
+    async def _send_cached(self, entry: CachedResponse, send: Send) -> None:
+        headers = MutableHeaders(raw=list(entry.headers))
+        headers["age"] = str(int(time.monotonic() - entry.created))
+        await send({"type": "http.response.start", "status": entry.status, "headers": headers.raw})
+        await send({"type": "http.response.body", "body": entry.body})
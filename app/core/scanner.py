@@ -0,0 +1,59 @@
+"""Server-side DX barcode decoding, in a bounded pool of worker threads.
+
+Decoding an image takes tens of milliseconds of CPU, so it runs out of the event loop, with at most
+SCAN_WORKERS images decoded at once. At most SCAN_MAX_PENDING_IMAGES images can be waiting or decoding:
+beyond, new scans are rejected instead of piling up (see `reserve`).
+"""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from app.config import settings
+from app.core import metrics
+from app.utils.barcode_reader import read_dx_barcodes
+
+_executor = ThreadPoolExecutor(max_workers=settings.SCAN_WORKERS, thread_name_prefix="scanner")
+_pending_images = 0
+
+scan_duration = metrics.Histogram("scan_image_duration_seconds", "Decoding time of a scanned image, in seconds.")
+metrics.Gauge(
+    "scan_pending_images", "Scanned images waiting to be decoded or being decoded.", function=lambda: _pending_images
+)
+scan_rejections = metrics.Counter("scan_rejections_total", "Scans rejected because too many images were pending.")
+
+
+class ScannerOverloadedError(Exception):
+    """Too many images are already waiting to be decoded."""
+
+
+@contextmanager
+def reserve(image_count: int):
+    """Reserve room for ``image_count`` images in the decoding queue, for the duration of the block.
+
+    Raises:
+        ScannerOverloadedError: If the queue can't take that many more images.
+    """
+    global _pending_images
+    if _pending_images + image_count > settings.SCAN_MAX_PENDING_IMAGES:
+        scan_rejections.inc()
+        raise ScannerOverloadedError()
+    _pending_images += image_count
+    try:
+        yield
+    finally:
+        _pending_images -= image_count
+
+
+def _timed_read_dx_barcodes(image: bytes) -> list[tuple[str, str]]:
+    start = time.perf_counter()
+    try:
+        return read_dx_barcodes(image, settings.SCAN_MAX_IMAGE_PIXELS)
+    finally:
+        scan_duration.observe(time.perf_counter() - start)
+
+
+async def scan_image(image: bytes) -> list[tuple[str, str]]:
+    """Decode the DX barcodes of an image file in the worker pool. See `read_dx_barcodes`."""
+    return await asyncio.get_running_loop().run_in_executor(_executor, _timed_read_dx_barcodes, image)
@@ -1,21 +1,25 @@
 """Pydantic validation schemas"""
 
 from enum import IntEnum
-from typing import Any, Union
+from typing import Any, Self, Union
 
 from pydantic import (
     BaseModel,
     Field,
     GetCoreSchemaHandler,
     NonNegativeInt,
+    TypeAdapter,
     field_validator,
     model_validator,
 )
 from pydantic_core import CoreSchema, core_schema
 
+from app.config import settings
 from app.core.cdn import get_film_image_url
+from app.core.server_timing import span
 from app.utils.barcode_writer import generate_dx_film_edge_barcode
 from app.utils.dx import dx_extract_to_two_part_dx_number
+from app.utils.manufacturers import split_manufacturers
 
 
 class DxCode(str):
@@ -81,6 +85,12 @@ class AvailabilityStatus(IntEnum):
         return html_formats.get(status, "unknown") if status is not None else "unknown"
 
 
+# Availability filter and facet values (see AvailabilityStatus.json_format), with their statuses
+AVAILABILITY_STATUSES: dict[str, list[AvailabilityStatus]] = {}
+for _status in AvailabilityStatus:
+    AVAILABILITY_STATUSES.setdefault(AvailabilityStatus.json_format(_status), []).append(_status)
+
+
 class FilmInDB(BaseModel):
     dx_extract: str | None = None
     dx_full: str | None = None
@@ -97,6 +107,47 @@ class FilmInDB(BaseModel):
     availability: AvailabilityStatus | None = None
     picture: str | None = None
 
+    @classmethod
+    def from_db_row(cls, row: dict[str, Any], *, strict=settings.FILM_STRICT_VALIDATION) -> Self:
+        """Build a film from a row of the films table, as selected by `SELECT_FILMS`.
+
+        Rows are trusted: `app.install` already normalized them (blank strings stored as NULL, typed
+        columns) and checked that they validate. So the model is built without per-field validation,
+        and only the derived fields are computed. Set `strict` (default: FILM_STRICT_VALIDATION setting)
+        to validate them anyway.
+        """
+        if strict:
+            return cls.model_validate(row)
+        return cls._construct_trusted(row)
+
+    @classmethod
+    def from_db_rows(cls, rows: list[dict[str, Any]], *, strict=settings.FILM_STRICT_VALIDATION) -> list[Self]:
+        """Build films from rows of the films table. See `from_db_row`."""
+        if strict:
+            return TypeAdapter(list[cls]).validate_python(rows)
+        return [cls._construct_trusted(row) for row in rows]
+
+    @classmethod
+    def _construct_trusted(cls, row: dict[str, Any]) -> Self:
+        """Build a film from a trusted row with `model_construct`: no validation, only the derived fields."""
+        return cls.model_construct(**(row | cls._derived_fields(row)))
+
+    @classmethod
+    def _derived_fields(cls, row: dict[str, Any]) -> dict[str, Any]:
+        """Return the fields set by the validators, for a trusted row.
+
+        Must stay consistent with the validators below: only fields they would set are returned,
+        so the set fields (`model_fields_set`, used by `exclude_unset`) are the same too.
+        """
+        fields = {}
+        if row["availability"] is not None:
+            fields["availability"] = AvailabilityStatus(row["availability"])
+        if row["picture"]:
+            fields["picture"] = get_film_image_url(row["picture"])
+        if row["manufacturer"]:
+            fields["manufacturers"] = split_manufacturers(row["manufacturer"])
+        return fields
+
     @field_validator("*", mode="before")
     def empty_str_as_none(cls, value):
         if isinstance(value, str) and value == "":
@@ -138,16 +189,16 @@ class FilmInDB(BaseModel):
             the DX film edge barcode, as SVG
         """
         scale = -50
-        if self.dx_extract and frame_number is not None:
-            # With the zxing-cpp library, the width can be modified.
-            # We want the two formats to have the same height.
-            # The short format length is 23, the long format length is 32.
-            # So this is a dubious computation to generate both image with the same height.
-            return generate_dx_film_edge_barcode(f"{self.dx_extract}/{frame_number}", scale * 32 // 23)
-        elif self.dx_extract:
-            return generate_dx_film_edge_barcode(self.dx_extract, scale)
-        else:
+        if not self.dx_extract:
             return None
+        with span("barcode"):
+            if frame_number is not None:
+                # With the zxing-cpp library, the width can be modified.
+                # We want the two formats to have the same height.
+                # The short format length is 23, the long format length is 32.
+                # So this is a dubious computation to generate both image with the same height.
+                return generate_dx_film_edge_barcode(f"{self.dx_extract}/{frame_number}", scale * 32 // 23)
+            return generate_dx_film_edge_barcode(self.dx_extract, scale)
 
     @field_validator("picture", mode="after")
     def absolute_picture_url(cls, value):
@@ -158,7 +209,7 @@ class FilmInDB(BaseModel):
     @model_validator(mode="after")
     def fill_manufacturer_list(self):
         if self.manufacturer:
-            self.manufacturers = self.manufacturer.split(", ")
+            self.manufacturers = split_manufacturers(self.manufacturer)
         return self
 
 
@@ -166,6 +217,14 @@ class HTMLFilmInDB(FilmInDB):
     availability_label: str | None = None
     reliability_img: str | None = None
 
+    @classmethod
+    def _derived_fields(cls, row: dict[str, Any]) -> dict[str, Any]:
+        fields = super()._derived_fields(row)
+        fields["availability_label"] = AvailabilityStatus.html_format(fields.get("availability"))
+        if row["reliability"] is not None:
+            fields["reliability_img"] = f"/static/images/{row['reliability']}.gif"
+        return fields
+
     @model_validator(mode="after")
     def set_availability_label(self):
         self.availability_label = AvailabilityStatus.html_format(self.availability)
@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+
+from app.core.schemas.film import FilmInDB
+
+
+class Manufacturer(BaseModel):
+    # Unique URL-safe name, see app.utils.manufacturers
+    slug: str
+    name: str
+    # Number of films of the manufacturer
+    film_count: int
+
+
+class ManufacturerFilms(BaseModel):
+    manufacturer: Manufacturer
+    # Films of the page, sorted by name
+    films: list[FilmInDB] = []
+    page: int
+    page_count: int
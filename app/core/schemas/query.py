@@ -1,10 +1,11 @@
 from collections.abc import Sequence
-from typing import Any
+from typing import Any, Literal
 
 from fastapi.exceptions import RequestErrorModel, RequestValidationError
-from pydantic import BaseModel, Field, PositiveInt, ValidationError, field_validator, model_validator
+from pydantic import BaseModel, Field, NonNegativeInt, PositiveInt, ValidationError, field_validator, model_validator
 
-from app.core.film import MAX_RESULTS
+from app.core.film import AUTOCOMPLETE_COLUMNS, MAX_AUTOCOMPLETE_RESULTS, MAX_RESULTS
+from app.core.schemas.film import FilmInDB
 from app.utils.dx import parse_dx_code, two_parts_dx_number_to_dx_extract
 
 
@@ -52,8 +53,39 @@ class SearchFilmQuery(QueryModel):
 
     dx_extract: str | None = Field(max_length=4, default=None)  # Eg: "2594"
     dx_full: str | None = Field(max_length=6, default=None)  # Eg: "025943"
+    dx_product: NonNegativeInt | None = Field(
+        le=9999 // 16, default=None, description="DX number part 1 (product code), any generation", example=162
+    )
+    dx_extract_min: NonNegativeInt | None = Field(
+        le=9999, default=None, description="Lower bound of the DX extract range (inclusive)", example=2592
+    )
+    dx_extract_max: NonNegativeInt | None = Field(
+        le=9999, default=None, description="Upper bound of the DX extract range (inclusive)", example=2607
+    )
     name: str | None = Field(max_length=255, default=None)
     manufacturer: str | None = Field(max_length=255, default=None)
+    country: str | None = Field(max_length=255, default=None, description="Country (exact, case insensitive)")
+    # Values of AVAILABILITY_STATUSES
+    availability: Literal["discontinued", "unknown", "on_the_market"] | None = Field(
+        default=None, description="Availability status"
+    )
+    reliability: NonNegativeInt | None = Field(le=4, default=None, description="Reliability of the film data")
+    decade: NonNegativeInt | None = Field(
+        le=9990, multiple_of=10, default=None, description="Decade of the production begin year", example=1990
+    )
+    distributor: str | None = Field(max_length=255, default=None, description="Distributor (exact, case insensitive)")
+    begin_year_min: NonNegativeInt | None = Field(
+        le=9999, default=None, description="Produced since this year (inclusive)", example=2000
+    )
+    begin_year_max: NonNegativeInt | None = Field(
+        le=9999, default=None, description="Production started up to this year (inclusive)", example=2010
+    )
+    end_year_min: NonNegativeInt | None = Field(
+        le=9999, default=None, description="Production ended from this year (inclusive)", example=2000
+    )
+    end_year_max: NonNegativeInt | None = Field(
+        le=9999, default=None, description="Production ended up to this year (inclusive)", example=2010
+    )
     limit: PositiveInt = Field(le=MAX_RESULTS, default=100)
 
     @model_validator(mode="before")
@@ -85,8 +117,86 @@ class SearchFilmQuery(QueryModel):
             raise ValueError('Either provide the DX extract (4 digits) or provide the DX number ("XXX-XX"). Not both.')
         return self
 
+    @model_validator(mode="after")
+    def dx_extract_range_order(self):
+        range_given = self.dx_extract_min is not None and self.dx_extract_max is not None
+        if range_given and self.dx_extract_min > self.dx_extract_max:
+            raise ValueError("dx_extract_min should be lower or equal than dx_extract_max.")
+        return self
+
+    @model_validator(mode="after")
+    def year_ranges_order(self):
+        for bound in ("begin_year", "end_year"):
+            year_min, year_max = getattr(self, f"{bound}_min"), getattr(self, f"{bound}_max")
+            if year_min is not None and year_max is not None and year_min > year_max:
+                raise ValueError(f"{bound}_min should be lower or equal than {bound}_max.")
+        return self
+
     @model_validator(mode="after")
     def set_dx_extract_from_dx_parts(self):
         if not self.dx_extract and self.dx_number:
             self.dx_extract = two_parts_dx_number_to_dx_extract(self.dx_number)
         return self
+
+    def filter_criteria(self) -> dict[str, Any]:
+        """Return the search criterias without the result limit, as keyword arguments of film.facet_counts."""
+        return {
+            "dx_extract": self.dx_extract,
+            "dx_full": self.dx_full,
+            "name": self.name,
+            "manufacturer": self.manufacturer,
+            "dx_product": self.dx_product,
+            "dx_extract_min": self.dx_extract_min,
+            "dx_extract_max": self.dx_extract_max,
+            "country": self.country,
+            "availability": self.availability,
+            "reliability": self.reliability,
+            "decade": self.decade,
+            "distributor": self.distributor,
+            "begin_year_min": self.begin_year_min,
+            "begin_year_max": self.begin_year_max,
+            "end_year_min": self.end_year_min,
+            "end_year_max": self.end_year_max,
+        }
+
+    def search_criteria(self) -> dict[str, Any]:
+        """Return the search criterias, as keyword arguments of film.search."""
+        return {**self.filter_criteria(), "limit": self.limit}
+
+
+class ExportFilmQuery(QueryModel):
+    format: Literal["ndjson", "csv"] = Field(default="ndjson", description="Export format")
+    columns: str | None = Field(
+        max_length=1024,
+        default=None,
+        description="Comma-separated film fields to export (default: all)",
+        example="name,url_name,dx_extract,dx_full",
+    )
+
+    @field_validator("columns")
+    @classmethod
+    def known_columns(cls, value: str | None):
+        if not value:
+            return None
+        columns = [column.strip() for column in value.split(",") if column.strip()]
+        unknown_columns = [column for column in columns if column not in FilmInDB.model_fields]
+        if unknown_columns:
+            raise ValueError(
+                f"Unknown columns: {', '.join(unknown_columns)}. Allowed: {', '.join(FilmInDB.model_fields)}"
+            )
+        return ",".join(dict.fromkeys(columns))
+
+    @property
+    def column_list(self) -> list[str]:
+        """The exported fields, in order."""
+        return self.columns.split(",") if self.columns else list(FilmInDB.model_fields)
+
+
+class AutocompleteMessage(BaseModel):
+    """An autocomplete query sent over WebSocket (see /api/autocomplete/ws)."""
+
+    # Chosen by the client, sent back with the suggestions
+    id: int
+    column: Literal[AUTOCOMPLETE_COLUMNS]
+    q: str = Field(max_length=255)
+    limit: int = Field(ge=1, le=MAX_AUTOCOMPLETE_RESULTS, default=MAX_AUTOCOMPLETE_RESULTS)
@@ -0,0 +1,105 @@
+"""Opt-in per-request Server-Timing breakdown.
+
+The stages of a request (SQL queries, Pydantic model building, Python re-sorting of the search results,
+barcode generation and template rendering) are wrapped in `span(stage)`. With SERVER_TIMING_ENABLE, their
+durations add up per request, and are sent as a `Server-Timing` header, shown by the browser devtools
+(Network tab, Timing). A fraction of the requests (SERVER_TIMING_LOG_SAMPLE_RATE) is also logged, as
+key=value pairs. Stages may overlap: rendering a film page includes generating its barcodes.
+
+Outside of a timed request (disabled setting, install, warm-up), a span costs a context variable lookup.
+Identical queries coalesced with another request's (see `app.core.singleflight`) are only timed for the
+request that ran them.
+"""
+
+import logging
+import random
+import time
+from contextlib import AbstractContextManager, nullcontext
+from contextvars import ContextVar
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.config import settings
+from app.core import metrics
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("sql", "validation", "sort", "barcode", "render")
+
+# Total duration (seconds) of each stage of the current request, None outside of a timed request
+_timings: ContextVar[dict[str, float] | None] = ContextVar("server_timings", default=None)
+
+
+class _Span:
+    __slots__ = ("timings", "stage", "start")
+
+    def __init__(self, timings: dict[str, float], stage: str):
+        self.timings = timings
+        self.stage = stage
+
+    def __enter__(self) -> None:
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info) -> None:
+        self.timings[self.stage] = self.timings.get(self.stage, 0.0) + time.perf_counter() - self.start
+
+
+_NO_SPAN = nullcontext()
+
+
+def span(stage: str) -> AbstractContextManager[None]:
+    """Add the duration of the block to a stage of the current request, if it is timed."""
+    timings = _timings.get()
+    return _NO_SPAN if timings is None else _Span(timings, stage)
+
+
+def server_timing_header(timings: dict[str, float], total: float) -> str:
+    """Format the stage durations as a Server-Timing header value (durations in milliseconds)."""
+    metrics = [f"{stage};dur={timings[stage] * 1000:.2f}" for stage in STAGES if stage in timings]
+    metrics.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(metrics)
+
+
+class ServerTimingMiddleware:
+    """ASGI middleware timing the stages of each HTTP request, and sending them as a Server-Timing header."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.log_sample_rate = settings.SERVER_TIMING_LOG_SAMPLE_RATE
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        timings: dict[str, float] = {}
+        token = _timings.set(timings)
+        start = time.perf_counter()
+        status = None
+
+        async def send_with_timing(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                # New message and headers: inner middlewares may keep the original ones (eg. response cache)
+                header = server_timing_header(timings, time.perf_counter() - start)
+                message = {**message, "headers": [*message["headers"], (b"server-timing", header.encode("latin-1"))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _timings.reset(token)
+            if self.log_sample_rate and random.random() < self.log_sample_rate:  # nosec B311
+                self._log(scope, status, timings, time.perf_counter() - start)
+
+    @staticmethod
+    def _log(scope: Scope, status: int | None, timings: dict[str, float], total: float) -> None:
+        fields = {
+            "method": scope["method"],
+            # Label by route template, like the HTTP metrics
+            "route": metrics.route_label(scope),
+            "status": status,
+            "total_ms": f"{total * 1000:.2f}",
+        }
+        fields.update({f"{stage}_ms": f"{timings[stage] * 1000:.2f}" for stage in STAGES if stage in timings})
+        logger.info("server_timing " + " ".join(f"{key}={value}" for key, value in fields.items()))
@@ -0,0 +1,70 @@
+"""Single-flight coalescing of identical concurrent calls.
+
+When a popular cache entry expires at the CDN, many identical requests reach the origin at once. Instead of
+running the same query once per request, the first caller (the leader) runs it in a worker thread, and the
+concurrent callers with the same key await that same computation and share its result (or its exception).
+The key is forgotten as soon as the computation completes: this is not a cache, later callers run it again.
+"""
+
+import asyncio
+from collections.abc import Callable, Hashable
+from typing import Any
+
+from app.core import metrics
+
+singleflight_calls = metrics.Counter(
+    "singleflight_calls_total",
+    "Coalesced calls, by group and role (leader: ran the computation, follower: shared its result).",
+    ("group", "role"),
+)
+singleflight_timeouts = metrics.Counter(
+    "singleflight_timeouts_total", "Callers that stopped waiting for an in-flight computation.", ("group",)
+)
+
+
+class SingleFlight:
+    """A group of coalesced calls. Must be used from a single event loop.
+
+    Args:
+        name (str): Name of the group, used as metric label.
+        timeout (float): Max time (seconds) a caller waits for the computation of its key. On timeout, the
+            caller gets a TimeoutError, but the computation goes on for the other callers.
+    """
+
+    def __init__(self, name: str, timeout: float):
+        self.name = name
+        self.timeout = timeout
+        self._in_flight: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        """Number of computations in flight."""
+        return len(self._in_flight)
+
+    async def do(self, key: Hashable, func: Callable[..., Any], *args, **kwargs) -> Any:
+        """Return ``func(*args, **kwargs)``, computed in a worker thread, shared with concurrent calls of the same key.
+
+        Raises:
+            TimeoutError: If the computation did not complete within the timeout.
+            Exception: Any exception raised by ``func``, to every caller sharing the computation.
+        """
+        future = self._in_flight.get(key)
+        if future is None:
+            singleflight_calls.inc(self.name, "leader")
+            future = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done_future: self._forget(key, done_future))
+        else:
+            singleflight_calls.inc(self.name, "follower")
+        try:
+            # Shielded: a caller giving up (timeout, client disconnection) must not cancel the shared computation
+            return await asyncio.wait_for(asyncio.shield(future), self.timeout)
+        except TimeoutError:
+            singleflight_timeouts.inc(self.name)
+            raise
+
+    def _forget(self, key: Hashable, future: asyncio.Future):
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
+        # Mark the exception as retrieved, even if every caller gave up waiting for it
+        if not future.cancelled():
+            future.exception()
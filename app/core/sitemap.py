@@ -0,0 +1,105 @@
+"""Sitemaps of the website, for search engine crawlers.
+
+Crawlers find every film page and manufacturer page in the sitemap, instead of rendering pages and
+following search links to discover them. The sitemaps are built once at startup from the film store and
+the manufacturers table (see `load_sitemaps`), gzip-compressed once, and served from memory with an ETag.
+Beyond SITEMAP_MAX_URLS pages (the limit of the sitemap protocol), the pages are split into several sitemaps,
+listed by a sitemap index.
+"""
+
+import gzip
+import hashlib
+from collections.abc import Iterable
+from xml.sax.saxutils import escape
+
+from app.config import settings
+from app.core import database, metrics
+from app.core.film_store import film_store
+from app.core.tables import MANUFACTURERS_TABLE, SELECT_MANUFACTURER_SLUGS
+
+# Max URLs per sitemap file, as defined by the sitemap protocol (sitemaps.org)
+SITEMAP_MAX_URLS = 50_000
+# Entry point of the crawlers (see robots.txt): the only sitemap, or the sitemap index if the pages are split
+SITEMAP_FILENAME = "sitemap.xml"
+# Pages listed before the film pages
+STATIC_PAGES = ("/", "/help")
+
+_XML_DECLARATION = '<?xml version="1.0" encoding="UTF-8"?>\n'
+_SITEMAP_NAMESPACE = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+class SitemapFile:
+    """A gzip-compressed sitemap (or sitemap index), and its ETag. Immutable."""
+
+    __slots__ = ("content", "etag")
+
+    def __init__(self, xml: str):
+        # mtime=0: the same sitemap is always compressed to the same bytes, so its ETag survives restarts.
+        # The ETag is weak: it is shared by the compressed and uncompressed representations.
+        self.content = gzip.compress(xml.encode(), compresslevel=9, mtime=0)
+        self.etag = f'W/"{hashlib.sha256(self.content).hexdigest()[:16]}"'
+
+    def xml(self) -> bytes:
+        """Return the uncompressed sitemap, for the rare clients not accepting gzip."""
+        return gzip.decompress(self.content)
+
+
+def _xml_document(root_tag: str, entry_tag: str, locations: Iterable[str], lastmod: str | None) -> str:
+    lastmod_element = f"<lastmod>{escape(lastmod)}</lastmod>" if lastmod else ""
+    entries = "".join(
+        f"<{entry_tag}><loc>{escape(location)}</loc>{lastmod_element}</{entry_tag}>\n" for location in locations
+    )
+    return f'{_XML_DECLARATION}<{root_tag} xmlns="{_SITEMAP_NAMESPACE}">\n{entries}</{root_tag}>\n'
+
+
+def build_sitemaps(
+    paths: list[str], base_url: str, lastmod: str | None, max_urls: int = SITEMAP_MAX_URLS
+) -> dict[str, SitemapFile]:
+    """Build the sitemaps of the given pages.
+
+    Args:
+        paths (list[str]): Absolute paths of the pages (eg. "/film/kodak-portra-400").
+        base_url (str): Public URL of the website, prepended to the paths.
+        lastmod (str | None): Last modification date of every page (W3C datetime), if known.
+        max_urls (int, optional): Max URLs per sitemap. Defaults to SITEMAP_MAX_URLS.
+
+    Returns:
+        dict[str, SitemapFile]: The sitemaps by file name. SITEMAP_FILENAME lists all the pages if they fit in
+        a single sitemap, otherwise it is a sitemap index of "sitemap-1.xml", "sitemap-2.xml"...
+    """
+    base_url = base_url.rstrip("/")
+    locations = [base_url + path for path in paths]
+    if len(locations) <= max_urls:
+        return {SITEMAP_FILENAME: SitemapFile(_xml_document("urlset", "url", locations, lastmod))}
+    sitemaps = {
+        f"sitemap-{number}.xml": SitemapFile(
+            _xml_document("urlset", "url", locations[start : start + max_urls], lastmod)
+        )
+        for number, start in enumerate(range(0, len(locations), max_urls), start=1)
+    }
+    index_locations = [f"{base_url}/{file_name}" for file_name in sitemaps]
+    sitemaps[SITEMAP_FILENAME] = SitemapFile(_xml_document("sitemapindex", "sitemap", index_locations, lastmod))
+    return sitemaps
+
+
+# Sitemaps of the current database by file name, empty until loaded
+sitemaps: dict[str, SitemapFile] = {}
+
+
+def load_sitemaps() -> None:
+    """Build the sitemaps of all the films of the store, and of the manufacturer pages. Called at startup, once
+    the film store is loaded."""
+    paths = [*STATIC_PAGES, *(f"/film/{record.url_name}" for record in film_store)]
+    if database.table_exists(MANUFACTURERS_TABLE):
+        paths.extend(
+            f"/manufacturer/{slug}" for (slug,) in database.db_ram_connection.execute(SELECT_MANUFACTURER_SLUGS)
+        )
+    sitemaps.clear()
+    sitemaps.update(build_sitemaps(paths, str(settings.SITE_BASE_URL), database.db_build_date))
+
+
+metrics.Gauge(
+    "sitemap_size_bytes",
+    "Size of the gzip-compressed sitemaps.",
+    function=lambda: sum(len(sitemap_file.content) for sitemap_file in sitemaps.values()),
+)
@@ -0,0 +1,216 @@
+"""
+SQL schema of the film database.
+
+Shared by `app.install`, which creates the tables, and `app.core`, which queries them. This module must
+not import the database connection, so the install script can use it before the database exists.
+"""
+
+FILMS_TABLE = "films"
+FILMS_FTS_TABLE = "films_fts"
+
+# Regular table holding the whole dataset, with typed columns. DX codes, reliability and availability
+# are integers, so equality lookups and sorts can use B-tree indexes.
+CREATE_FILMS_TABLE = """
+CREATE TABLE films (
+    id INTEGER PRIMARY KEY,
+    dx_extract INTEGER,
+    dx_full INTEGER,
+    name TEXT,
+    url_name TEXT NOT NULL UNIQUE,
+    og_film_or_information TEXT,
+    manufacturer TEXT,
+    reliability INTEGER,
+    country TEXT COLLATE NOCASE,
+    begin_year TEXT,
+    end_year TEXT,
+    distributor TEXT COLLATE NOCASE,
+    availability INTEGER,
+    picture TEXT,
+    -- Derived at install: effective 4-digit DX code (the DX extract, or the middle of the DX full code)...
+    dx_code INTEGER,
+    -- ...split into the DX number part 1 (product code) and part 2 (generation code)...
+    dx_part_1 INTEGER,
+    dx_part_2 INTEGER,
+    -- ...and the DX full code split into its middle 4 digits and its last (half frame) digit
+    dx_full_extract INTEGER,
+    dx_half_frame INTEGER,
+    -- ...and the production begin and end years, as integers (NULL if the text has no year)
+    begin_year_int INTEGER,
+    end_year_int INTEGER
+)
+"""
+
+CREATE_FILMS_INDEXES = [
+    # url_name is already indexed by its UNIQUE constraint
+    "CREATE INDEX films_dx_extract_IDX ON films(dx_extract)",
+    "CREATE INDEX films_dx_full_IDX ON films(dx_full)",
+    "CREATE INDEX films_dx_code_IDX ON films(dx_code)",
+    "CREATE INDEX films_dx_parts_IDX ON films(dx_part_1, dx_part_2)",
+    "CREATE INDEX films_dx_full_extract_IDX ON films(dx_full_extract, dx_half_frame)",
+    "CREATE INDEX films_name_IDX ON films(name)",
+    "CREATE INDEX films_picture_IDX ON films(picture) WHERE picture IS NOT NULL",
+    # Filters. Availability is mostly combined with a production period ("on the market, since 2000").
+    "CREATE INDEX films_country_IDX ON films(country)",
+    "CREATE INDEX films_distributor_IDX ON films(distributor)",
+    "CREATE INDEX films_availability_IDX ON films(availability, begin_year_int)",
+    "CREATE INDEX films_reliability_IDX ON films(reliability)",
+    "CREATE INDEX films_begin_year_int_IDX ON films(begin_year_int)",
+    "CREATE INDEX films_end_year_int_IDX ON films(end_year_int)",
+]
+
+# Full-text index of the film names and manufacturers only. External content: the text is not duplicated,
+# FTS5 reads it back from the films table by rowid. The triggers keep the index in sync with the table.
+CREATE_FILMS_FTS_TABLE = """
+CREATE VIRTUAL TABLE films_fts USING fts5(name, manufacturer, content='films', content_rowid='id')
+"""
+
+CREATE_FILMS_FTS_TRIGGERS = [
+    """
+    CREATE TRIGGER films_fts_after_insert AFTER INSERT ON films BEGIN
+        INSERT INTO films_fts(rowid, name, manufacturer) VALUES (new.id, new.name, new.manufacturer);
+    END
+    """,
+    """
+    CREATE TRIGGER films_fts_after_delete AFTER DELETE ON films BEGIN
+        INSERT INTO films_fts(films_fts, rowid, name, manufacturer)
+        VALUES ('delete', old.id, old.name, old.manufacturer);
+    END
+    """,
+    """
+    CREATE TRIGGER films_fts_after_update AFTER UPDATE ON films BEGIN
+        INSERT INTO films_fts(films_fts, rowid, name, manufacturer)
+        VALUES ('delete', old.id, old.name, old.manufacturer);
+        INSERT INTO films_fts(rowid, name, manufacturer) VALUES (new.id, new.name, new.manufacturer);
+    END
+    """,
+]
+
+# Vocabulary of the fulltext index (distinct words per column, with the number of films using them),
+# indexed by trigrams. Used to correct misspelled search words: a typo still shares most of its
+# trigrams with the intended word. Built at install from the fulltext index, read-only afterwards.
+FILM_WORDS_TABLE = "film_words"
+CREATE_FILM_WORDS_TABLE = """
+CREATE VIRTUAL TABLE film_words USING fts5(word, column_name UNINDEXED, films UNINDEXED, tokenize='trigram')
+"""
+FILL_FILM_WORDS_TABLE = [
+    "CREATE VIRTUAL TABLE temp.films_fts_vocab USING fts5vocab(main, films_fts, 'col')",
+    "INSERT INTO film_words(word, column_name, films) SELECT term, col, doc FROM temp.films_fts_vocab",
+    "DROP TABLE temp.films_fts_vocab",
+]
+
+# Ranked first-word autocomplete suggestions of the shortest prefixes, per column (see app.utils.autocomplete).
+# Built at install from the column values, read-only afterwards.
+AUTOCOMPLETE_PREFIXES_TABLE = "autocomplete_prefixes"
+CREATE_AUTOCOMPLETE_PREFIXES_TABLE = """
+CREATE TABLE autocomplete_prefixes (
+    column_name TEXT NOT NULL,
+    prefix TEXT NOT NULL,
+    rank INTEGER NOT NULL,
+    word TEXT NOT NULL,
+    PRIMARY KEY (column_name, prefix, rank)
+) WITHOUT ROWID
+"""
+# Column values to build the suggestions from, per autocomplete column
+SELECT_AUTOCOMPLETE_VALUES = {
+    "name": "SELECT name FROM films",
+    "manufacturer": "SELECT manufacturer FROM films",
+}
+
+# Related films of every film, most related first (see app.utils.related). Built at install, read-only afterwards.
+RELATED_FILMS_TABLE = "related_films"
+CREATE_RELATED_FILMS_TABLE = """
+CREATE TABLE related_films (
+    film_id INTEGER NOT NULL,
+    rank INTEGER NOT NULL,
+    related_film_id INTEGER NOT NULL,
+    PRIMARY KEY (film_id, rank)
+) WITHOUT ROWID
+"""
+# Properties of every film the related films are ranked on
+SELECT_RELATED_FILM_VALUES = "SELECT id, dx_code, dx_part_1, og_film_or_information, manufacturer FROM films"
+
+# Manufacturers of the films (see app.utils.manufacturers), and the films of each manufacturer, sorted by
+# name: manufacturer pages are exact, indexed lookups, paginated by position. Built at install, read-only
+# afterwards.
+MANUFACTURERS_TABLE = "manufacturers"
+CREATE_MANUFACTURERS_TABLE = """
+CREATE TABLE manufacturers (
+    id INTEGER PRIMARY KEY,
+    slug TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    film_count INTEGER NOT NULL
+)
+"""
+FILM_MANUFACTURERS_TABLE = "film_manufacturers"
+CREATE_FILM_MANUFACTURERS_TABLE = """
+CREATE TABLE film_manufacturers (
+    manufacturer_id INTEGER NOT NULL,
+    position INTEGER NOT NULL,
+    film_id INTEGER NOT NULL,
+    PRIMARY KEY (manufacturer_id, position)
+) WITHOUT ROWID
+"""
+# Values the manufacturers are built from
+SELECT_MANUFACTURER_VALUES = "SELECT id, name, manufacturer FROM films"
+SELECT_MANUFACTURER_SLUGS = "SELECT slug FROM manufacturers ORDER BY slug"
+
+# Key/value information about the database build (see DB_METADATA_KEYS)
+DB_METADATA_TABLE = "db_metadata"
+CREATE_DB_METADATA_TABLE = "CREATE TABLE db_metadata (key TEXT PRIMARY KEY, value TEXT)"
+# build_id: hash of the source CSV file, identifies the data (for ETags, versioned files...)
+# build_date: date of the build (ISO 8601, UTC)
+# dx_bundle: file name of the DX code bundle of the barcode scanner (see app.utils.dx_bundle)
+DB_METADATA_KEYS = ("build_id", "build_date", "dx_bundle")
+
+# Values the DX code bundle is built from: the films with a DX code, in search result order, and the film types
+SELECT_DX_BUNDLE_FILMS = """
+SELECT name, url_name, dx_extract, dx_full FROM films
+WHERE dx_extract IS NOT NULL OR dx_full IS NOT NULL
+ORDER BY dx_full IS NULL, dx_full, dx_extract, name, id
+"""
+SELECT_DX_BUNDLE_FILM_TYPES = "SELECT dx_min, dx_max, label FROM film_types ORDER BY rowid"
+
+# Columns of a film, as expected by FilmInDB. DX codes are exposed as zero-padded strings.
+# Filters and sorts must use the qualified table columns (eg. "films.dx_full"), not these aliases.
+FILM_COLUMNS = """
+    iif(films.dx_extract IS NULL, NULL, printf('%04d', films.dx_extract)) AS dx_extract,
+    iif(films.dx_full IS NULL, NULL, printf('%06d', films.dx_full)) AS dx_full,
+    films.name AS name,
+    films.url_name AS url_name,
+    films.og_film_or_information AS og_film_or_information,
+    films.reliability AS reliability,
+    films.manufacturer AS manufacturer,
+    films.country AS country,
+    films.begin_year AS begin_year,
+    films.end_year AS end_year,
+    films.distributor AS distributor,
+    films.availability AS availability,
+    films.picture AS picture
+"""
+SELECT_FILMS = f"SELECT {FILM_COLUMNS} FROM films"  # nosec B608
+
+# Raw columns of every film, as loaded by the in-memory film store (app.core.film_store)
+FILM_RECORD_COLUMNS = (
+    "id",
+    "dx_extract",
+    "dx_full",
+    "name",
+    "url_name",
+    "og_film_or_information",
+    "reliability",
+    "manufacturer",
+    "country",
+    "begin_year",
+    "end_year",
+    "distributor",
+    "availability",
+    "picture",
+)
+SELECT_FILM_RECORDS = f"SELECT {', '.join(FILM_RECORD_COLUMNS)} FROM films ORDER BY id"  # nosec B608
+
+# Facet values of every film, loaded by the facet index (app.core.facets). Films with several manufacturers
+# ("Lomography, Kodak") are split later, like FilmInDB.manufacturers.
+SELECT_FACET_VALUES = """
+SELECT id, manufacturer, country, availability, reliability, begin_year_int / 10 * 10 AS decade
+FROM films ORDER BY id
+"""
@@ -1,17 +1,100 @@
+import gzip
+import hashlib
 import os
 import pathlib
 import sqlite3
 from copy import deepcopy
+from datetime import UTC, datetime
 
-import numpy as np
 import pandas as pd
+import pyarrow as pa
 from pydantic import TypeAdapter
 
 from app.config import settings
+from app.constants import SNAPSHOT_FORMATS, dx_bundle_filename, snapshot_filename
 from app.core.schemas.film import HTMLFilmInDB
+from app.core.tables import (
+    AUTOCOMPLETE_PREFIXES_TABLE,
+    CREATE_AUTOCOMPLETE_PREFIXES_TABLE,
+    CREATE_DB_METADATA_TABLE,
+    CREATE_FILM_MANUFACTURERS_TABLE,
+    CREATE_FILM_WORDS_TABLE,
+    CREATE_FILMS_FTS_TABLE,
+    CREATE_FILMS_FTS_TRIGGERS,
+    CREATE_FILMS_INDEXES,
+    CREATE_FILMS_TABLE,
+    CREATE_MANUFACTURERS_TABLE,
+    CREATE_RELATED_FILMS_TABLE,
+    DB_METADATA_TABLE,
+    FILL_FILM_WORDS_TABLE,
+    FILM_MANUFACTURERS_TABLE,
+    FILM_WORDS_TABLE,
+    FILMS_FTS_TABLE,
+    FILMS_TABLE,
+    MANUFACTURERS_TABLE,
+    RELATED_FILMS_TABLE,
+    SELECT_AUTOCOMPLETE_VALUES,
+    SELECT_DX_BUNDLE_FILM_TYPES,
+    SELECT_DX_BUNDLE_FILMS,
+    SELECT_FILMS,
+    SELECT_MANUFACTURER_VALUES,
+    SELECT_RELATED_FILM_VALUES,
+)
+from app.utils.autocomplete import prefix_completions
+from app.utils.dx_bundle import dx_bundle
+from app.utils.manufacturers import manufacturer_index
+from app.utils.related import related_films
 from app.utils.url import generate_unique_url
 
 
+def write_snapshots(df: pd.DataFrame, build_id: str):
+    """Write the cleaned dataset as columnar files, served as versioned downloads.
+
+    - Parquet (compressed): compact download for analytics tools.
+    - Arrow IPC file (uncompressed): can be memory-mapped for zero-copy loading (pyarrow.memory_map).
+
+    Files of previous builds are removed.
+    """
+    snapshot_dir = pathlib.Path(settings.SNAPSHOT_DIR)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    for previous_snapshot in snapshot_dir.glob("films-*.*"):
+        previous_snapshot.unlink()
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for snapshot_format in SNAPSHOT_FORMATS:
+        snapshot_path = snapshot_dir / snapshot_filename(build_id, snapshot_format)
+        if snapshot_format == "parquet":
+            df.to_parquet(snapshot_path, index=False, compression="zstd")
+        else:
+            with pa.OSFile(str(snapshot_path), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        print(f"Snapshot written: {snapshot_path}")
+
+
+def write_dx_bundle(connection: sqlite3.Connection) -> str:
+    """Write the DX code bundle of the barcode scanner (see app.utils.dx_bundle), named after its content hash.
+
+    A gzip-compressed copy is written alongside, served to the clients accepting it. Bundles of previous
+    builds are removed.
+
+    Returns:
+        str: The file name of the bundle.
+    """
+    snapshot_dir = pathlib.Path(settings.SNAPSHOT_DIR)
+    snapshot_dir.mkdir(parents=True, exist_ok=True)
+    for previous_bundle in snapshot_dir.glob("dx-*.json*"):
+        previous_bundle.unlink()
+
+    content, content_hash = dx_bundle(
+        connection.execute(SELECT_DX_BUNDLE_FILMS), connection.execute(SELECT_DX_BUNDLE_FILM_TYPES)
+    )
+    bundle_path = snapshot_dir / dx_bundle_filename(content_hash)
+    bundle_path.write_bytes(content)
+    pathlib.Path(f"{bundle_path}.gz").write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+    print(f"DX code bundle written: {bundle_path} ({len(content)} bytes)")
+    return bundle_path.name
+
+
 def update_db():
     """Create a SQLite database from the film CSV file."""
     # Define the column names explicitly
@@ -30,14 +113,28 @@ def update_db():
         "picture",
     ]
 
-    DB_TABLE_NAME = "films"
     db_column_names = deepcopy(df_column_names)
-    db_column_names.append("url_name")
+    db_column_names.extend(
+        [
+            "url_name",
+            "dx_code",
+            "dx_part_1",
+            "dx_part_2",
+            "dx_full_extract",
+            "dx_half_frame",
+            "begin_year_int",
+            "end_year_int",
+        ]
+    )
 
     print(f"db_column_names: {db_column_names}")
+    csv_filepath = os.path.join(settings.FILM_DATABASE_REPO_DIR, "film_database.csv")
+    with open(csv_filepath, "rb") as csv_file:
+        build_id = hashlib.sha256(csv_file.read()).hexdigest()[:16]
+
     # Load the CSV file
     df: pd.DataFrame = pd.read_csv(
-        os.path.join(settings.FILM_DATABASE_REPO_DIR, "film_database.csv"),
+        csv_filepath,
         sep=";",
         names=df_column_names,
         skiprows=1,  # Skip the first row if it's a header
@@ -49,35 +146,32 @@ def update_db():
     # If null values, fill with native python None instead of Numpy "NaN" values
     df = df.where(df.notnull(), None)
 
-    # Availability in integer
-    for column_name in ["availability"]:
-        # df[column_name] = pd.to_numeric(df[column_name], errors='coerce', downcast="unsigned")
-        df[column_name] = df[column_name].fillna(-1)
-        df[column_name] = df[column_name].astype(int)
-        df[column_name] = df[column_name].astype(str)
-        df[column_name] = df[column_name].replace("-1", np.nan)
+    # Strip leading and trailing spaces from string columns, blank strings are missing values.
+    # Done before the integer conversions, which would otherwise be lost (map() returns object columns).
+    df = df.map(lambda x: (x.strip() or None) if isinstance(x, str) else x)
 
-    # Reliability in float (might be useful later)
-    for column_name in ["reliability"]:
-        df[column_name] = df[column_name].astype(float)
-        df[column_name] = df[column_name].fillna("")
+    # Availability and reliability in (nullable) integer
+    for column_name in ["availability", "reliability"]:
+        df[column_name] = df[column_name].astype(float).astype("Int64")
 
+    # DX codes in (nullable) integer. The leading zeros are added back when querying the database.
     for column_name in ["dx_extract", "dx_full"]:
-        df[column_name] = df[column_name].fillna(0)
-        df[column_name] = df[column_name].astype(int)
-        df[column_name] = df[column_name].fillna("").astype(int)
-        df[column_name] = df[column_name].replace(0, "")
-        df[column_name] = df[column_name].astype(str)
-
-    # Add leading zeros to DX codes
-    df["dx_full"] = df["dx_full"].str.zfill(6)
-    df["dx_extract"] = df["dx_extract"].str.zfill(4)
-    # Remplacer les valeurs composées uniquement de zéros par None
-    df["dx_full"] = df["dx_full"].apply(lambda x: None if x == "000000" else x)
-    df["dx_extract"] = df["dx_extract"].apply(lambda x: None if x == "0000" else x)
-
-    # Strip leading and trailing spaces from string columns
-    df = df.map(lambda x: x.strip() if isinstance(x, str) else x)
+        df[column_name] = df[column_name].fillna(0).astype(int).astype("Int64")
+        # Codes made of zeros only are missing codes
+        df[column_name] = df[column_name].mask(df[column_name] == 0)
+
+    # Numeric DX fields, for indexed product code, generation and range lookups
+    df["dx_full_extract"] = df["dx_full"] // 10 % 10000
+    df["dx_half_frame"] = df["dx_full"] % 10
+    df["dx_code"] = df["dx_extract"].fillna(df["dx_full_extract"])
+    df["dx_part_1"] = df["dx_code"] // 16
+    df["dx_part_2"] = df["dx_code"] % 16
+
+    # Production years as integers (first 4-digit number of the text, eg. "circa 1995" -> 1995), for
+    # indexed year range filters and decade facets
+    for column_name in ["begin_year", "end_year"]:
+        years = df[column_name].astype("string").str.extract(r"(\d{4})", expand=False)
+        df[f"{column_name}_int"] = years.astype("Int64")
 
     # Encode film name
     df["url_name"] = df["name"].apply(generate_unique_url)
@@ -91,20 +185,77 @@ def update_db():
     print(df[2700:2710])
     print(df.iloc[66]["reliability"])
 
-    # Prepare database table with fulltext index
+    # Prepare the films table, its indexes, and its fulltext index (kept in sync by triggers)
     cursor = db_file_connection.cursor()
-    cursor.execute(f"DROP TABLE IF EXISTS {DB_TABLE_NAME}")
-    create_table_query = f"CREATE VIRTUAL TABLE IF NOT EXISTS {DB_TABLE_NAME} USING FTS5({', '.join(db_column_names)});"
-    print(create_table_query)
-    cursor.execute(create_table_query)
+    cursor.execute(f"DROP TABLE IF EXISTS {FILMS_FTS_TABLE}")
+    cursor.execute(f"DROP TABLE IF EXISTS {FILMS_TABLE}")
+    cursor.execute(CREATE_FILMS_TABLE)
+    cursor.execute(CREATE_FILMS_FTS_TABLE)
+    for create_trigger_query in CREATE_FILMS_FTS_TRIGGERS:
+        cursor.execute(create_trigger_query)
 
     # Charger le DataFrame dans SQLite
-    df.to_sql(name=DB_TABLE_NAME, con=db_file_connection, if_exists="append", index=False)
+    df[db_column_names].to_sql(name=FILMS_TABLE, con=db_file_connection, if_exists="append", index=False)
+    for create_index_query in CREATE_FILMS_INDEXES:
+        cursor.execute(create_index_query)
+    cursor.execute(f"INSERT INTO {FILMS_FTS_TABLE}({FILMS_FTS_TABLE}) VALUES ('optimize')")
+
+    # Trigram index of the fulltext vocabulary, to correct misspelled search words
+    cursor.execute(f"DROP TABLE IF EXISTS {FILM_WORDS_TABLE}")
+    cursor.execute(CREATE_FILM_WORDS_TABLE)
+    for fill_query in FILL_FILM_WORDS_TABLE:
+        cursor.execute(fill_query)
+    # First-word autocomplete suggestions of the shortest prefixes
+    cursor.execute(f"DROP TABLE IF EXISTS {AUTOCOMPLETE_PREFIXES_TABLE}")
+    cursor.execute(CREATE_AUTOCOMPLETE_PREFIXES_TABLE)
+    for column_name, select_values_query in SELECT_AUTOCOMPLETE_VALUES.items():
+        values = (value for (value,) in db_file_connection.execute(select_values_query))
+        cursor.executemany(
+            f"INSERT INTO {AUTOCOMPLETE_PREFIXES_TABLE} (column_name, prefix, rank, word) VALUES (?, ?, ?, ?)",
+            (
+                (column_name, prefix, rank, word)
+                for prefix, words in prefix_completions(values).items()
+                for rank, word in enumerate(words)
+            ),
+        )
+    # Related films of every film, shown on the film pages
+    cursor.execute(f"DROP TABLE IF EXISTS {RELATED_FILMS_TABLE}")
+    cursor.execute(CREATE_RELATED_FILMS_TABLE)
+    cursor.executemany(
+        f"INSERT INTO {RELATED_FILMS_TABLE} (film_id, rank, related_film_id) VALUES (?, ?, ?)",
+        (
+            (film_id, rank, related_film_id)
+            for film_id, related_film_ids in related_films(db_file_connection.execute(SELECT_RELATED_FILM_VALUES))
+            for rank, related_film_id in enumerate(related_film_ids)
+        ),
+    )
+    # Manufacturer dictionary, and the films of each manufacturer sorted by name
+    cursor.execute(f"DROP TABLE IF EXISTS {FILM_MANUFACTURERS_TABLE}")
+    cursor.execute(f"DROP TABLE IF EXISTS {MANUFACTURERS_TABLE}")
+    cursor.execute(CREATE_MANUFACTURERS_TABLE)
+    cursor.execute(CREATE_FILM_MANUFACTURERS_TABLE)
+    manufacturers = manufacturer_index(db_file_connection.execute(SELECT_MANUFACTURER_VALUES))
+    cursor.executemany(
+        f"INSERT INTO {MANUFACTURERS_TABLE} (id, slug, name, film_count) VALUES (?, ?, ?, ?)",
+        (
+            (manufacturer_id, slug, name, len(film_ids))
+            for manufacturer_id, (slug, name, film_ids) in enumerate(manufacturers, start=1)
+        ),
+    )
+    cursor.executemany(
+        f"INSERT INTO {FILM_MANUFACTURERS_TABLE} (manufacturer_id, position, film_id) VALUES (?, ?, ?)",
+        (
+            (manufacturer_id, position, film_id)
+            for manufacturer_id, (_, _, film_ids) in enumerate(manufacturers, start=1)
+            for position, film_id in enumerate(film_ids)
+        ),
+    )
+    cursor.execute("ANALYZE")
 
     db_file_connection.commit()
 
     # Check database integrity and film column format
-    rows = cursor.execute("SELECT * from films").fetchall()
+    rows = cursor.execute(SELECT_FILMS).fetchall()
     column_names = [description[0] for description in cursor.description]
     films = [dict(zip(column_names, row, strict=False)) for row in rows]
     print(len(films))
@@ -115,6 +266,7 @@ def update_db():
     film_list = ta.validate_python(films)
     for film in film_list[47:49]:
         print(film)
+
     # print("Database integrity OK!")
 
     # Create the manufacturer table index
@@ -200,8 +352,27 @@ def update_db():
     cursor.execute("CREATE INDEX dx_min_max_IDX ON film_types(dx_min, dx_max);")
     db_file_connection.commit()
 
+    # DX codes of the films, resolved by the barcode scanner in the browser
+    dx_bundle_file_name = write_dx_bundle(db_file_connection)
+
+    # Identify this build of the database
+    cursor.execute(f"DROP TABLE IF EXISTS {DB_METADATA_TABLE}")
+    cursor.execute(CREATE_DB_METADATA_TABLE)
+    cursor.executemany(
+        f"INSERT INTO {DB_METADATA_TABLE} (key, value) VALUES (?, ?)",
+        [
+            ("build_id", build_id),
+            ("build_date", datetime.now(UTC).isoformat(timespec="seconds")),
+            ("dx_bundle", dx_bundle_file_name),
+        ],
+    )
+    db_file_connection.commit()
+
     cursor.execute("VACUUM;")
 
+    # Columnar snapshots of the same data, including the derived DX fields and URL names
+    write_snapshots(df[db_column_names], build_id)
+
     # Don't need the dataframe anymore
     del df
 
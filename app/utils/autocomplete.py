@@ -0,0 +1,129 @@
+"""
+Autocomplete suggestion ranking.
+
+Shared by `app.core.film`, which suggests words at runtime, and `app.install`, which precomputes the
+first-word suggestions of the shortest prefixes. This module must not import the database connection.
+"""
+
+import re
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+
+# Max suggestions returned by an autocomplete request
+MAX_AUTOCOMPLETE_RESULTS = 11
+# Minimum length of the word being completed before we start suggesting
+MIN_AUTOCOMPLETE_PREFIX = 2
+# First-word suggestions are precomputed by app.install for the prefixes up to this length: they are the
+# most requested (first keystrokes), and the slowest to compute since they match the most films.
+MAX_PRECOMPUTED_AUTOCOMPLETE_PREFIX = 3
+# Match word tokens roughly like the FTS5 unicode61 tokenizer. \w is Unicode-aware in Python 3, so
+# this keeps Cyrillic, CJK, accented letters, etc. (a plain [^a-z0-9] split would drop them all).
+AUTOCOMPLETE_WORD_RE = re.compile(r"\w+")
+# Generic words that carry little distinguishing value. They are still suggested, but their ranking
+# score is multiplied by AUTOCOMPLETE_STOPWORD_PENALTY so they fall below distinctive words (brands,
+# model names, ISO speeds...). Tweak this set freely; it is intentionally lowercase (any language).
+AUTOCOMPLETE_STOPWORDS = frozenset(
+    {
+        "and",
+        "asa",
+        "base",
+        "box",
+        "camera",
+        "code",
+        "color",
+        "colour",
+        "contrast",
+        "couleur",
+        "definition",
+        "din",
+        "direct",
+        "emulsion",
+        "film",
+        "films",
+        "for",
+        "foto",
+        "high",
+        "improved",
+        "iso",
+        "lab",
+        "line",
+        "motion",
+        "negative",
+        "new",
+        "no",
+        "photo",
+        "photography",
+        "picture",
+        "positive",
+        "print",
+        "prints",
+        "process",
+        "professional",
+        "roll",
+        "safety",
+        "sound",
+        "special",
+        "speed",
+        "super",
+        "type",
+        "ultra",
+        "version",
+        "тип",
+    }
+)
+# Multiplier applied to a stopword's score so it ranks low without being removed entirely.
+AUTOCOMPLETE_STOPWORD_PENALTY = 0.05
+
+
+def completing_words(value: str | None, prefix: str, typed_words: set[str] = frozenset()) -> set[str]:
+    """Return the distinct words of a column value that complete the prefix, except already-typed words."""
+    if not value:
+        return set()
+    return {
+        word
+        for word in AUTOCOMPLETE_WORD_RE.findall(value.lower())
+        if word.startswith(prefix) and word not in typed_words
+    }
+
+
+def rank_completions(counts: Counter[str], limit: int) -> list[str]:
+    """Return the most relevant words, given the number of matching films containing each of them.
+
+    Words are ranked by frequency, but generic stopwords are demoted so distinctive words surface first.
+    Ties are broken alphabetically, so the ranking is deterministic.
+    """
+
+    def _score(item: tuple[str, int]) -> float:
+        word, count = item
+        return count * (AUTOCOMPLETE_STOPWORD_PENALTY if word in AUTOCOMPLETE_STOPWORDS else 1.0)
+
+    ranked = sorted(counts.items(), key=lambda item: (-_score(item), item[0]))
+    return [word for word, _ in ranked[:limit]]
+
+
+def prefix_completions(
+    values: Iterable[str | None],
+    min_length: int = MIN_AUTOCOMPLETE_PREFIX,
+    max_length: int = MAX_PRECOMPUTED_AUTOCOMPLETE_PREFIX,
+    limit: int = MAX_AUTOCOMPLETE_RESULTS,
+) -> dict[str, list[str]]:
+    """Rank the first-word suggestions of every prefix between ``min_length`` and ``max_length`` characters.
+
+    Single pass over the column values: every word of a film is counted once for each of its prefixes. This
+    gives the same ranking as completing each prefix alone (see app.core.film.autocomplete).
+
+    Args:
+        values (Iterable[str | None]): The column values of all the films.
+        min_length (int, optional): Shortest prefix. Defaults to MIN_AUTOCOMPLETE_PREFIX.
+        max_length (int, optional): Longest prefix. Defaults to MAX_PRECOMPUTED_AUTOCOMPLETE_PREFIX.
+        limit (int, optional): Max suggestions per prefix. Defaults to MAX_AUTOCOMPLETE_RESULTS.
+
+    Returns:
+        dict[str, list[str]]: The ranked suggestions, per prefix.
+    """
+    counts: defaultdict[str, Counter[str]] = defaultdict(Counter)
+    for value in values:
+        for word in completing_words(value, ""):
+            for length in range(min_length, min(max_length, len(word)) + 1):
+                counts[word[:length]][word] += 1
+    return {prefix: rank_completions(prefix_counts, limit) for prefix, prefix_counts in counts.items()}
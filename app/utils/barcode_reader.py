@@ -0,0 +1,31 @@
+import io
+
+
+def read_dx_barcodes(image: bytes, max_pixels: int) -> list[tuple[str, str]]:
+    """Decode the DX barcodes of an image file (JPEG, PNG...).
+
+    Args:
+        image (bytes): The image file content.
+        max_pixels (int): Max image resolution, checked before decoding the image (decompression bombs).
+
+    Raises:
+        ValueError: If the file is not a supported image, or if its resolution is too high.
+
+    Returns:
+        list[tuple[str, str]]: The barcode format ("DX Film Edge" or "ITF") and text of each found barcode.
+    """
+    # Imported on first scan, to keep the application startup fast
+    import zxingcpp
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(image)) as picture:
+            if picture.width * picture.height > max_pixels:
+                raise ValueError(f"Image resolution too high (max: {max_pixels} pixels)")
+            grayscale_picture = picture.convert("L")
+    except (OSError, Image.DecompressionBombError) as e:
+        raise ValueError("Unsupported or corrupted image") from e
+    # Film-edge barcodes (DX number, optional frame number) and cassette barcodes (DX full code, ITF)
+    dx_barcode_formats = (zxingcpp.BarcodeFormat.DXFilmEdge, zxingcpp.BarcodeFormat.ITF)
+    barcodes = zxingcpp.read_barcodes(grayscale_picture, formats=dx_barcode_formats)
+    return [(str(barcode.format), barcode.text) for barcode in barcodes]
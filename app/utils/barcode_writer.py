@@ -1,6 +1,3 @@
-import zxingcpp
-
-
 def _remove_background(svg_barcode: str):
     return svg_barcode.replace('fill="#FFFFFF"', 'fill="#FFFFFF00"', 1)
 
@@ -15,6 +12,9 @@ def generate_dx_film_edge_barcode(input: str, scale: int = None, add_quiet_zones
     Returns:
         the DX film edge barcode, as SVG
     """
+    # Imported on first use, to keep the application startup fast
+    import zxingcpp
+
     try:
         barcode = zxingcpp.create_barcode(input, zxingcpp.BarcodeFormat.DXFilmEdge)
     except ValueError:
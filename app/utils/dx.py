@@ -65,3 +65,26 @@ def dx_extract_to_two_part_dx_number(dx_extract: str) -> str | None:
     except Exception:
         # Silently fail
         return None
+
+
+def dx_barcode_to_search_criteria(barcode_format: str, text: str) -> dict[str, str] | None:
+    """Convert a decoded DX barcode to film search criterias.
+
+    - DX film edge barcode: "162-2" or "162-2/10A" (with frame number) -> {"dx_extract": "2594"}
+    - Cassette barcode (ITF, 6 digits): "025943" -> {"dx_full": "025943"}
+
+    Args:
+        barcode_format (str): Barcode format, as named by zxing-cpp ("DX Film Edge", "ITF").
+        text (str): Decoded barcode text.
+
+    Returns:
+        dict[str, str] | None: The search criterias, None if the barcode isn't a DX code.
+    """
+    try:
+        if barcode_format == "DX Film Edge":
+            return {"dx_extract": two_parts_dx_number_to_dx_extract(text.split("/")[0])}
+        if barcode_format == "ITF" and len(text) == 6 and text.isdigit():
+            return {"dx_full": parse_dx_code(text, 6)}
+    except ValueError:
+        pass
+    return None
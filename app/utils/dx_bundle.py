@@ -0,0 +1,47 @@
+"""DX code bundle: what the barcode scanner needs to resolve a scanned code in the browser.
+
+Written by app.install next to the snapshots, and named after its content hash: it is served with an
+immutable cache, so browsers download it once per database build. The scanner (static/scripts/barcode_scanner.js)
+then finds the films of a scanned DX code locally, and only requests the film pages the user opens.
+
+Minified JSON, by column (smaller once compressed):
+    {
+        "version": 1,
+        "films": {"name": [...], "url_name": [...], "dx_extract": [...], "dx_full": [...]},
+        "film_types": [[dx_min, dx_max, label], ...]
+    }
+DX codes are integers (null if missing). Films are in search result order, films without DX code are left
+out. Film types are in table order: the last range containing a DX extract gives its label.
+"""
+
+import hashlib
+import json
+from collections.abc import Iterable
+
+DX_BUNDLE_VERSION = 1
+
+
+def dx_bundle(
+    films: Iterable[tuple[str, str, int | None, int | None]], film_types: Iterable[tuple[int, int, str]]
+) -> tuple[bytes, str]:
+    """Build the DX code bundle.
+
+    Args:
+        films (Iterable[tuple]): The films with a DX code, as (name, url_name, dx_extract, dx_full) rows.
+        film_types (Iterable[tuple]): The film types, as (dx_min, dx_max, label) rows.
+
+    Returns:
+        tuple[bytes, str]: The bundle (UTF-8 JSON), and its content hash (16 hexadecimal digits).
+    """
+    columns = ("name", "url_name", "dx_extract", "dx_full")
+    films_by_column: dict[str, list] = {column: [] for column in columns}
+    for row in films:
+        for column, value in zip(columns, row, strict=True):
+            films_by_column[column].append(value)
+    bundle = {
+        "version": DX_BUNDLE_VERSION,
+        "films": films_by_column,
+        "film_types": [list(film_type) for film_type in film_types],
+    }
+    content = json.dumps(bundle, ensure_ascii=False, separators=(",", ":")).encode()
+    return content, hashlib.sha256(content).hexdigest()[:16]
@@ -0,0 +1,67 @@
+"""Space-Saving sketch: approximate most frequent items of a stream, in bounded memory.
+
+At most ``capacity`` items are tracked. When a new item arrives and the sketch is full, it replaces the
+least frequent tracked item and inherits its count (plus one): that count is an upper bound of the real
+count, overestimated by at most the inherited part (the item's ``error``). Any item seen more than
+``total / capacity`` times is guaranteed to be tracked (Metwally et al., 2005).
+"""
+
+import heapq
+from collections.abc import Hashable, Iterable
+
+
+class SpaceSaving:
+    """Approximate counts of the most frequent items. Not thread-safe: callers must lock."""
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.total = 0
+        # Tracked item -> [count, error]
+        self._counters: dict[Hashable, list[int]] = {}
+        # Min-heap of (count, insertion order, item), to find the least frequent item. Entries are not
+        # updated in place: stale entries (count lower than the current one) are skipped when popped.
+        self._heap: list[tuple[int, int, Hashable]] = []
+        self._pushes = 0
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    def _push(self, item: Hashable, count: int) -> None:
+        self._pushes += 1
+        heapq.heappush(self._heap, (count, self._pushes, item))
+        # Keep the heap proportional to the tracked items
+        if len(self._heap) > 4 * self.capacity + 64:
+            self._heap = [(counter[0], order, key) for order, (key, counter) in enumerate(self._counters.items())]
+            heapq.heapify(self._heap)
+
+    def _pop_min(self) -> tuple[Hashable, int]:
+        while True:
+            count, _, item = heapq.heappop(self._heap)
+            counter = self._counters.get(item)
+            if counter is not None and counter[0] == count:
+                return item, count
+
+    def add(self, item: Hashable, count: int = 1) -> None:
+        """Count an occurrence of the item (or ``count`` occurrences)."""
+        self.total += count
+        counter = self._counters.get(item)
+        if counter is not None:
+            counter[0] += count
+        elif len(self._counters) < self.capacity:
+            counter = self._counters[item] = [count, 0]
+        else:
+            evicted, min_count = self._pop_min()
+            del self._counters[evicted]
+            counter = self._counters[item] = [min_count + count, min_count]
+        self._push(item, counter[0])
+
+    def most_common(self, limit: int | None = None) -> list[tuple[Hashable, int, int]]:
+        """Return the tracked items with their estimated count and max error, most frequent first."""
+        items = sorted(self._counters.items(), key=lambda item_counter: -item_counter[1][0])
+        return [(item, count, error) for item, (count, error) in items[:limit]]
+
+    def update(self, counts: Iterable[tuple[Hashable, int]]) -> None:
+        """Count several items at once (eg. to restore a previous sketch)."""
+        for item, count in counts:
+            if count > 0:
+                self.add(item, count)
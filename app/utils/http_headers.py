@@ -0,0 +1,38 @@
+"""Parsing of the HTTP request headers used for conditional and compressed responses."""
+
+
+def _strip_weak(etag: str) -> str:
+    etag = etag.strip()
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Return True if an If-None-Match header matches the ETag: one of its entity tags is the ETag, or `*`.
+
+    Entity tags are compared like RFC 9110 asks for If-None-Match: weakly, ignoring their W/ prefix.
+    """
+    etag = _strip_weak(etag)
+    return any(candidate in ("*", etag) for candidate in map(_strip_weak, (if_none_match or "").split(",")))
+
+
+def accepts_encoding(accept_encoding: str | None, encoding: str) -> bool:
+    """Return True if an Accept-Encoding header accepts the content coding (eg. "gzip").
+
+    The coding is accepted if listed with a non-zero q-value (`gzip`, `gzip;q=0.5`), or if it is not listed
+    and `*` is, with a non-zero q-value. Codings are compared exactly, case aside.
+    """
+    qvalues = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *parameters = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        qvalue = 1.0
+        for parameter in parameters:
+            name, _, value = parameter.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        qvalues[coding.lower()] = qvalue
+    return qvalues.get(encoding, qvalues.get("*", 0.0)) > 0
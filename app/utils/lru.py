@@ -0,0 +1,75 @@
+"""Least recently used cache decorator, like `functools.lru_cache`, whose entries can be looked up without
+computing them (see `peek`).
+
+Used where a caller must know whether an answer is already cached, eg. to answer it at once instead of
+dispatching its computation to a worker thread.
+"""
+
+import threading
+from collections import OrderedDict, namedtuple
+from collections.abc import Callable, Hashable
+from functools import update_wrapper
+from typing import Any
+
+# Same fields as the cache information of `functools.lru_cache`
+CacheInfo = namedtuple("CacheInfo", ["hits", "misses", "maxsize", "currsize"])
+# Returned by `peek` for the arguments without cached result
+MISSING = object()
+
+
+class PeekableLRUCache:
+    """A function wrapped with a LRU cache of its results, keyed by its positional arguments. Thread-safe.
+
+    Like with `functools.lru_cache`, the function may run several times concurrently for the same
+    arguments: its result is then cached once.
+
+    Args:
+        func (Callable): The function to cache. Its arguments must be hashable.
+        maxsize (int): Max number of cached results. Least recently used results are evicted first.
+    """
+
+    def __init__(self, func: Callable[..., Any], maxsize: int):
+        self.__wrapped__ = func
+        self.maxsize = maxsize
+        self._results: OrderedDict[Hashable, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        update_wrapper(self, func)
+
+    def __call__(self, *args: Hashable) -> Any:
+        result = self.peek(*args)
+        if result is not MISSING:
+            return result
+        with self._lock:
+            self._misses += 1
+        result = self.__wrapped__(*args)
+        with self._lock:
+            self._results[args] = result
+            self._results.move_to_end(args)
+            if len(self._results) > self.maxsize:
+                self._results.popitem(last=False)
+        return result
+
+    def peek(self, *args: Hashable) -> Any:
+        """Return the cached result of these arguments (counted as a hit), else `MISSING`. Never computes it."""
+        with self._lock:
+            result = self._results.get(args, MISSING)
+            if result is not MISSING:
+                self._hits += 1
+                self._results.move_to_end(args)
+        return result
+
+    def cache_info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self.maxsize, len(self._results))
+
+    def cache_clear(self) -> None:
+        with self._lock:
+            self._results.clear()
+            self._hits = self._misses = 0
+
+
+def peekable_lru_cache(maxsize: int) -> Callable[[Callable[..., Any]], PeekableLRUCache]:
+    """Decorator caching the results of a function, by positional arguments (see PeekableLRUCache)."""
+    return lambda func: PeekableLRUCache(func, maxsize)
@@ -0,0 +1,48 @@
+"""Manufacturer dictionary: the distinct manufacturers of the films, with a stable URL slug and their films.
+
+A film can have several manufacturers, separated by ", " in the films table (eg. "Lomography, Kodak").
+Spellings differing only by case or punctuation ("Kodak", "KODAK") share the same slug, so they are
+the same manufacturer, named after its most frequent spelling.
+"""
+
+import hashlib
+from collections import Counter, defaultdict
+from collections.abc import Iterable
+
+from app.utils.url import url_safe_str
+
+MANUFACTURER_SEPARATOR = ", "
+
+
+def split_manufacturers(manufacturer: str | None) -> list[str]:
+    """Return the manufacturers of a film, from its manufacturer column."""
+    return manufacturer.split(MANUFACTURER_SEPARATOR) if manufacturer else []
+
+
+def manufacturer_slug(name: str) -> str:
+    """Return the URL slug of a manufacturer. Names without any URL-safe character get a hash instead."""
+    slug = url_safe_str(name).strip("-_")
+    return slug or f"m-{hashlib.sha256(name.lower().encode()).hexdigest()[:8]}"
+
+
+def manufacturer_index(films: Iterable[tuple[int, str | None, str | None]]) -> list[tuple[str, str, list[int]]]:
+    """Group the films by manufacturer.
+
+    Args:
+        films (Iterable[tuple]): The films, as (id, name, manufacturer) rows.
+
+    Returns:
+        list[tuple[str, str, list[int]]]: The slug, name and film IDs of every manufacturer, by slug. Films
+            are sorted by name (case insensitive), then ID.
+    """
+    spellings: dict[str, Counter] = defaultdict(Counter)
+    film_keys: dict[str, list[tuple[str, int]]] = defaultdict(list)
+    for film_id, name, manufacturer in films:
+        for manufacturer_name in split_manufacturers(manufacturer):
+            slug = manufacturer_slug(manufacturer_name)
+            spellings[slug][manufacturer_name] += 1
+            film_keys[slug].append(((name or "").casefold(), film_id))
+    return [
+        (slug, spellings[slug].most_common(1)[0][0], [film_id for _, film_id in sorted(set(film_keys[slug]))])
+        for slug in sorted(spellings)
+    ]
@@ -0,0 +1,102 @@
+"""Related films: the films a visitor of a film page is the most likely to look up next.
+
+Computed at install for every film (see `related_films`), and stored in the related films table. Candidates
+are the films sharing an emulsion information, a DX product code or a manufacturer with the film. Within
+each of these groups, only the closest films by DX code are considered, so the cost stays linear in the
+number of films, whatever the size of the groups (eg. every Kodak film).
+"""
+
+import bisect
+from collections import defaultdict
+from collections.abc import Iterable
+
+from app.utils.manufacturers import split_manufacturers
+
+# Max related films per film
+MAX_RELATED_FILMS = 10
+# Films considered on each side of a film, by DX code, within each group it belongs to
+_GROUP_WINDOW = 2 * MAX_RELATED_FILMS
+# Relevance of each shared property
+_SAME_EMULSION_SCORE = 4
+_SAME_DX_PRODUCT_SCORE = 3
+_SAME_DX_CODE_SCORE = 1
+_SAME_MANUFACTURER_SCORE = 2
+
+
+class _Film:
+    __slots__ = ("id", "dx_code", "dx_part_1", "emulsion", "manufacturers", "sort_key")
+
+    def __init__(self, film_id: int, dx_code: int | None, dx_part_1: int | None, emulsion: str | None, manufacturer):
+        self.id = film_id
+        self.dx_code = dx_code
+        self.dx_part_1 = dx_part_1
+        self.emulsion = emulsion.lower() if emulsion else None
+        self.manufacturers = frozenset(split_manufacturers(manufacturer))
+        # Films without DX code come last
+        self.sort_key = (dx_code is None, dx_code or 0, film_id)
+
+
+def _score(film: _Film, other: _Film) -> int:
+    score = 0
+    if film.emulsion and film.emulsion == other.emulsion:
+        score += _SAME_EMULSION_SCORE
+    if film.dx_part_1 is not None and film.dx_part_1 == other.dx_part_1:
+        score += _SAME_DX_PRODUCT_SCORE
+        if film.dx_code == other.dx_code:
+            score += _SAME_DX_CODE_SCORE
+    if film.manufacturers & other.manufacturers:
+        score += _SAME_MANUFACTURER_SCORE
+    return score
+
+
+def _dx_distance(film: _Film, other: _Film) -> float:
+    if film.dx_code is None or other.dx_code is None:
+        return float("inf")
+    return abs(film.dx_code - other.dx_code)
+
+
+def related_films(
+    films: Iterable[tuple[int, int | None, int | None, str | None, str | None]], limit: int = MAX_RELATED_FILMS
+) -> Iterable[tuple[int, list[int]]]:
+    """Rank the related films of every film.
+
+    Related films share the most properties with the film (same emulsion information first, then same DX
+    product code, then same manufacturer), then have the closest DX code.
+
+    Args:
+        films (Iterable[tuple]): The films, as (id, dx_code, dx_part_1, og_film_or_information, manufacturer)
+            rows.
+        limit (int, optional): Max related films per film. Defaults to MAX_RELATED_FILMS.
+
+    Yields:
+        tuple[int, list[int]]: The ID of a film, and the IDs of its related films, most related first.
+    """
+    films = [_Film(*row) for row in films]
+    groups: dict[tuple, list[_Film]] = defaultdict(list)
+    for film in films:
+        if film.emulsion:
+            groups[("emulsion", film.emulsion)].append(film)
+        if film.dx_part_1 is not None:
+            groups[("dx_product", film.dx_part_1)].append(film)
+        for manufacturer in film.manufacturers:
+            groups[("manufacturer", manufacturer)].append(film)
+    for group in groups.values():
+        group.sort(key=lambda film: film.sort_key)
+    group_keys = {key: [film.sort_key for film in group] for key, group in groups.items()}
+
+    for film in films:
+        candidates: dict[int, _Film] = {}
+        film_groups = [("emulsion", film.emulsion)] if film.emulsion else []
+        if film.dx_part_1 is not None:
+            film_groups.append(("dx_product", film.dx_part_1))
+        film_groups.extend(("manufacturer", manufacturer) for manufacturer in film.manufacturers)
+        for group_key in film_groups:
+            group = groups[group_key]
+            position = bisect.bisect_left(group_keys[group_key], film.sort_key)
+            for other in group[max(0, position - _GROUP_WINDOW) : position + _GROUP_WINDOW + 1]:
+                if other.id != film.id:
+                    candidates[other.id] = other
+        ranked = sorted(
+            candidates.values(), key=lambda other: (-_score(film, other), _dx_distance(film, other), other.id)
+        )
+        yield film.id, [other.id for other in ranked[:limit]]
@@ -1,27 +1,53 @@
 import os
 from collections.abc import Callable
-from typing import Annotated
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, Depends, Path, Request
-from fastapi.responses import FileResponse, HTMLResponse, RedirectResponse
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Request
+from fastapi.responses import FileResponse, HTMLResponse, PlainTextResponse, RedirectResponse, Response
 from fastapi.routing import APIRoute
 from fastapi.templating import Jinja2Templates
 
-from app.constants import STATIC_DIR, TEMPLATE_DIR
-from app.core import film
-from app.core.database import total_count
+from app.config import settings
+from app.constants import SNAPSHOT_DIR_URL, STATIC_DIR, TEMPLATE_DIR, dx_bundle_filename, snapshot_filename
+from app.core import database, film, sitemap
 from app.core.film import MAX_RESULTS, get_film_type
 from app.core.schemas.query import SearchFilmQuery
+from app.core.server_timing import span
+from app.utils.http_headers import accepts_encoding, etag_matches
+from app.utils.manufacturers import manufacturer_slug
 from app.utils.url import url_safe_str
 
+
+class TimedJinja2Templates(Jinja2Templates):
+    """Jinja2 templates, with the rendering time reported in the Server-Timing header (see app.core.server_timing)."""
+
+    def TemplateResponse(self, *args, **kwargs):  # noqa: N802
+        with span("render"):
+            return super().TemplateResponse(*args, **kwargs)
+
+
 # Configure the Jinja2 environment to render HTMl templates
-templates = Jinja2Templates(directory=TEMPLATE_DIR)
+templates = TimedJinja2Templates(directory=TEMPLATE_DIR)
 
 # Short freshness on HTML pages to absorb traffic spikes via the CDN, with a long stale window for
 # instant serving. Kept short (vs the data) because HTML embeds the front-end (asset refs, layout),
 # so a short TTL lets front deploys propagate quickly. The "/" home page is left uncached on purpose:
 # it shows a random film, so caching it would freeze the draw.
 HTML_CACHE_CONTROL = "public, max-age=600, stale-while-revalidate=2592000"
+# Snapshot files are versioned by build ID: their content never changes. The unversioned aliases
+# redirect to the current build, so they must be revalidated when the database is rebuilt.
+SNAPSHOT_CACHE_CONTROL = "public, max-age=31536000, immutable"
+SNAPSHOT_ALIAS_CACHE_CONTROL = "public, max-age=600"
+# Sitemaps only change with the database build: crawlers revalidate them with their ETag
+SITEMAP_CACHE_CONTROL = "public, max-age=86400"
+
+# Crawlers find the film pages in the sitemap: keep them off the (unbounded) search pages and the API
+ROBOTS_TXT = f"""User-agent: *
+Disallow: /search
+Disallow: /api/
+Disallow: /admin/
+Sitemap: {str(settings.SITE_BASE_URL).rstrip("/")}/{sitemap.SITEMAP_FILENAME}
+"""
 
 
 class NoDocumentationRoute(APIRoute):
@@ -51,6 +77,41 @@ async def favicon():
     return FileResponse(path=file_path, headers={"Content-Disposition": "attachment; filename=" + file_name})
 
 
+@website.get("/robots.txt", response_class=PlainTextResponse)
+async def robots_txt():
+    return PlainTextResponse(ROBOTS_TXT, headers={"Cache-Control": HTML_CACHE_CONTROL})
+
+
+def _sitemap_response(request: Request, file_name: str) -> Response:
+    """Serve a precomputed sitemap: compressed if the client accepts gzip, uncompressed otherwise."""
+    sitemap_file = sitemap.sitemaps.get(file_name)
+    if sitemap_file is None:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    headers = {"Cache-Control": SITEMAP_CACHE_CONTROL, "ETag": sitemap_file.etag, "Vary": "Accept-Encoding"}
+    if etag_matches(request.headers.get("if-none-match"), sitemap_file.etag):
+        return Response(status_code=304, headers=headers)
+    if accepts_encoding(request.headers.get("accept-encoding"), "gzip"):
+        headers["Content-Encoding"] = "gzip"
+        return Response(sitemap_file.content, media_type="application/xml", headers=headers)
+    return Response(sitemap_file.xml(), media_type="application/xml", headers=headers)
+
+
+@website.get("/" + sitemap.SITEMAP_FILENAME)
+async def sitemap_index(request: Request):
+    return _sitemap_response(request, sitemap.SITEMAP_FILENAME)
+
+
+@website.get("/sitemap-{number}.xml")
+async def sitemap_part(request: Request, number: Annotated[int, Path(ge=1)]):
+    return _sitemap_response(request, f"sitemap-{number}.xml")
+
+
+def _dx_bundle_url() -> str | None:
+    """Return the URL of the DX code bundle of the barcode scanner, None if the database predates it."""
+    file_name = database.db_metadata.get("dx_bundle")
+    return SNAPSHOT_DIR_URL + file_name if file_name else None
+
+
 @website.get("/", response_class=HTMLResponse)
 async def index_page(request: Request):
     # Get a random film to populate the home page
@@ -59,7 +120,13 @@ async def index_page(request: Request):
     return templates.TemplateResponse(
         request=request,
         name="index.html",
-        context={"request": request, "film": result, "url_safe_str": url_safe_str, "total_count": total_count},
+        context={
+            "request": request,
+            "film": result,
+            "url_safe_str": url_safe_str,
+            "total_count": database.total_count,
+            "dx_bundle_url": _dx_bundle_url(),
+        },
     )
 
 
@@ -78,15 +145,10 @@ async def search(request: Request, query: Annotated[SearchFilmQuery, Depends(Sea
         dx_extract = query.dx_extract or query.dx_full[1:5]
         film_type = get_film_type(dx_extract)
     try:
-        films = film.search(
-            dx_extract=query.dx_extract,
-            dx_full=query.dx_full,
-            name=query.name,
-            manufacturer=query.manufacturer,
-            limit=query.limit,
-        )
+        films, did_you_mean = await film.coalesced_fuzzy_search(**query.search_criteria())
     except ValueError:
         return RedirectResponse(url="/")
+    did_you_mean_url = request.url.include_query_params(**did_you_mean) if did_you_mean else None
     count = len(films)
     too_many_results = False
     if count >= MAX_RESULTS:
@@ -100,8 +162,11 @@ async def search(request: Request, query: Annotated[SearchFilmQuery, Depends(Sea
             "count": count,
             "films": films,
             "url_safe_str": url_safe_str,
+            "manufacturer_slug": manufacturer_slug,
             "film_type": film_type,
             "too_many_results": too_many_results,
+            "did_you_mean": did_you_mean,
+            "did_you_mean_url": did_you_mean_url,
         },
         headers={"Cache-Control": HTML_CACHE_CONTROL},
     )
@@ -111,12 +176,86 @@ async def search(request: Request, query: Annotated[SearchFilmQuery, Depends(Sea
 async def read_film(
     request: Request, url_name: Annotated[str, Path(description="Unique URL-safe name of the film", max_length=255)]
 ):
-    result = film.get_by_url(url_name)
+    result = await film.coalesced_get_by_url(url_name)
     film_type = get_film_type(result.dx_extract) if result and result.dx_extract else None
+    related_films = film.get_related(url_name) if result else None
 
     return templates.TemplateResponse(
         request=request,
         name="film.html",
-        context={"request": request, "film": result, "film_type": film_type},
+        context={
+            "request": request,
+            "film": result,
+            "film_type": film_type,
+            "related_films": related_films,
+            "manufacturer_slug": manufacturer_slug,
+        },
         headers={"Cache-Control": HTML_CACHE_CONTROL},
     )
+
+
+@website.get("/manufacturer/{slug}", response_class=HTMLResponse)
+async def read_manufacturer(
+    request: Request,
+    slug: Annotated[str, Path(description="Unique URL-safe name of the manufacturer", max_length=255)],
+    page: Annotated[int, Query(ge=1)] = 1,
+):
+    result = film.get_manufacturer_films(slug, page=page)
+    if result is None or page > result.page_count:
+        raise HTTPException(status_code=404, detail="Manufacturer not found")
+
+    return templates.TemplateResponse(
+        request=request,
+        name="manufacturer.html",
+        context={
+            "request": request,
+            "manufacturer": result.manufacturer,
+            "films": result.films,
+            "page": result.page,
+            "page_count": result.page_count,
+        },
+        headers={"Cache-Control": HTML_CACHE_CONTROL},
+    )
+
+
+@website.get(SNAPSHOT_DIR_URL + "films.{snapshot_format}")
+async def snapshot_alias(snapshot_format: Literal["parquet", "arrow"]):
+    """Redirect to the snapshot of the current database build."""
+    if database.db_build_id is None:
+        raise HTTPException(status_code=404, detail="No snapshot available for this database build")
+    return RedirectResponse(
+        url=SNAPSHOT_DIR_URL + snapshot_filename(database.db_build_id, snapshot_format),
+        headers={"Cache-Control": SNAPSHOT_ALIAS_CACHE_CONTROL},
+    )
+
+
+@website.get(SNAPSHOT_DIR_URL + "dx-{content_hash}.json")
+async def dx_bundle_download(request: Request, content_hash: Annotated[str, Path(pattern=r"^[0-9a-f]{16}$")]):
+    """Serve a DX code bundle of the barcode scanner, generated by app.install: compressed if the client
+    accepts gzip, uncompressed otherwise."""
+    file_path = os.path.join(settings.SNAPSHOT_DIR, dx_bundle_filename(content_hash))
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="DX code bundle not found")
+    headers = {"Cache-Control": SNAPSHOT_CACHE_CONTROL, "Vary": "Accept-Encoding"}
+    if accepts_encoding(request.headers.get("accept-encoding"), "gzip") and os.path.isfile(file_path + ".gz"):
+        headers["Content-Encoding"] = "gzip"
+        file_path += ".gz"
+    return FileResponse(path=file_path, media_type="application/json", headers=headers)
+
+
+@website.get(SNAPSHOT_DIR_URL + "{file_name}")
+async def snapshot_download(
+    file_name: Annotated[str, Path(pattern=r"^films-[0-9a-f]{16}\.(parquet|arrow)$")],
+):
+    """Serve a columnar snapshot of the database (Parquet or Arrow IPC file), generated by app.install."""
+    file_path = os.path.join(settings.SNAPSHOT_DIR, file_name)
+    if not os.path.isfile(file_path):
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return FileResponse(
+        path=file_path,
+        media_type="application/vnd.apache.parquet"
+        if file_name.endswith(".parquet")
+        else "application/vnd.apache.arrow.file",
+        filename=file_name,
+        headers={"Cache-Control": SNAPSHOT_CACHE_CONTROL},
+    )
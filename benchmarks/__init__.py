@@ -0,0 +1 @@
+"""Benchmark and load-test suite, run against synthetic film databases of configurable size."""
@@ -0,0 +1,66 @@
+"""
+Compare two benchmark result files, and report the cases whose median latency changed.
+
+Exits with a non-zero status if any case regressed by more than the threshold.
+
+Usage:
+    python -m benchmarks.compare benchmarks/results/<base>.json benchmarks/results/<new>.json --threshold 0.2
+"""
+
+import argparse
+import json
+import sys
+
+
+def _cases(results: dict):
+    """Yield (case name, median latency in ms) for every case of a scale's results."""
+    for group in ("core", "http"):
+        for case, stats in results.get(group, {}).items():
+            if "median_ms" in stats:
+                yield f"{group}:{case}", stats["median_ms"]
+
+
+def compare(base: dict, new: dict, threshold: float) -> list[str]:
+    """Print the comparison table and return the regressed cases."""
+    regressions = []
+    for scale, new_results in new["scales"].items():
+        base_results = base["scales"].get(scale)
+        if base_results is None:
+            print(f"\n{scale}: not in the base results, skipped")
+            continue
+        print(f"\n{scale} ({base_results.get('films')} -> {new_results.get('films')} films)")
+        print(f"{'case':<60} {'base (ms)':>10} {'new (ms)':>10} {'change':>8}")
+        base_cases = dict(_cases(base_results))
+        for case, new_median in _cases(new_results):
+            base_median = base_cases.get(case)
+            if base_median is None:
+                print(f"{case:<60} {'-':>10} {new_median:>10.3f} {'new':>8}")
+                continue
+            change = (new_median - base_median) / base_median if base_median else 0.0
+            flag = ""
+            if change > threshold:
+                flag = "  <- regression"
+                regressions.append(f"{scale} {case}")
+            print(f"{case:<60} {base_median:>10.3f} {new_median:>10.3f} {change:>+8.0%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base", help="Reference results JSON file")
+    parser.add_argument("new", help="New results JSON file")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Relative slowdown to report (default: 0.2)")
+    args = parser.parse_args()
+
+    with open(args.base) as base_file, open(args.new) as new_file:
+        base, new = json.load(base_file), json.load(new_file)
+    print(f"Base: {base['meta'].get('commit')} ({base['meta'].get('date')})")
+    print(f"New:  {new['meta'].get('commit')} ({new['meta'].get('date')})")
+    regressions = compare(base, new, args.threshold)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Generate a synthetic `film_database.csv`, in the same format as the open source film database.
+
+The dataset is either scaled up from a real CSV file (every row is duplicated with a variation of its
+name and DX codes, so the word and code distributions stay realistic), or fully synthetic if no source
+file is available. The output directory can be used as FILM_DATABASE_REPO_DIR by `app.install`.
+
+Usage:
+    python -m benchmarks.generate_dataset --scale 10 --output /tmp/film-db-x10
+    python -m benchmarks.generate_dataset --scale 100 --source Open-source-film-database/film_database.csv
+"""
+
+import argparse
+import os
+import random
+
+# Column order of the upstream CSV file (see app.install)
+CSV_HEADER = [
+    "dx_extract",
+    "dx_full",
+    "name",
+    "og_film_or_information",
+    "manufacturer",
+    "reliability",
+    "country",
+    "begin_year",
+    "end_year",
+    "distributor",
+    "availability",
+    "picture",
+]
+CSV_DELIMITER = ";"
+
+# Same order of magnitude as the upstream database. Scale factors are applied to this size when the
+# dataset is fully synthetic.
+BASE_ROWS = 5000
+
+_MANUFACTURERS = [
+    "Kodak",
+    "Fujifilm",
+    "Agfa Gevaert",
+    "Ilford",
+    "Konica",
+    "Ferrania",
+    "Foma",
+    "Orwo",
+    "Lucky",
+    "Svema",
+    "Lomography, Kodak",
+    "Rollei, Agfa Gevaert",
+    "Cinestill, Kodak",
+    "Polaroid, Agfa Gevaert",
+]
+_MODELS = [
+    "Ektachrome",
+    "Portra",
+    "Gold",
+    "Tri-X",
+    "T-Max",
+    "Superia",
+    "Velvia",
+    "Provia",
+    "Vista",
+    "HP5 Plus",
+    "Delta",
+    "Centuria",
+    "Color",
+    "Pan",
+    "Chrome",
+    "Ultramax",
+    "ColorPlus",
+    "Pro Image",
+]
+_QUALIFIERS = ["", "", "Professional", "Color Negative Film", "Slide Film", "Type 2", "Super", "Xtra"]
+_SPEEDS = [25, 50, 64, 100, 125, 160, 200, 400, 800, 1600, 3200]
+_COUNTRIES = ["USA", "Japan", "Germany", "United Kingdom", "Italy", "Czech Republic", "China", "Russia", ""]
+_DISTRIBUTORS = ["", "", "", "Walmart", "Boots", "Jean Coutu", "Aldi"]
+
+
+def _year(rng: random.Random) -> str:
+    """Return a production year, sometimes approximate or unknown like in the real dataset."""
+    year = rng.randint(1950, 2025)
+    return rng.choice([str(year), str(year), str(year), f"ca. {year}", f"{year // 10}0s", ""])
+
+
+def _dx_codes(rng: random.Random) -> tuple[str, str]:
+    """Return a random (DX extract, DX full) pair, either of them possibly missing."""
+    if rng.random() < 0.2:
+        return "", ""
+    dx_extract = rng.randint(16, 2047)
+    dx_full = f"{rng.randint(0, 9)}{dx_extract:04d}{rng.randint(0, 9)}" if rng.random() < 0.7 else ""
+    return str(dx_extract), dx_full
+
+
+def synthetic_row(rng: random.Random) -> list[str]:
+    """Return a fully synthetic CSV row."""
+    manufacturer = rng.choice(_MANUFACTURERS)
+    brand = manufacturer.split(", ")[0]
+    name = " ".join(
+        part for part in [brand, rng.choice(_MODELS), rng.choice(_QUALIFIERS), str(rng.choice(_SPEEDS))] if part
+    )
+    dx_extract, dx_full = _dx_codes(rng)
+    og_film = rng.choice(["", "", f"{rng.choice(_MANUFACTURERS).split(', ')[-1]} {rng.choice(_MODELS)}"])
+    picture = f"{brand.lower()}/{name.lower().replace(' ', '_')}.jpg" if rng.random() < 0.4 else ""
+    return [
+        dx_extract,
+        dx_full,
+        name,
+        og_film,
+        manufacturer,
+        str(rng.choice(["", 1, 2, 3, 4])) if og_film else "",
+        rng.choice(_COUNTRIES),
+        _year(rng),
+        _year(rng) if rng.random() < 0.5 else "",
+        rng.choice(_DISTRIBUTORS),
+        str(rng.choice(["", 0, 1, 2, 3])),
+        picture,
+    ]
+
+
+def variant_row(row: list[str], copy_index: int, rng: random.Random) -> list[str]:
+    """Return a copy of a real CSV row, with a distinct name and (sometimes) different DX codes."""
+    row = list(row) + [""] * (len(CSV_HEADER) - len(row))
+    row[CSV_HEADER.index("name")] = f"{row[CSV_HEADER.index('name')]} Variant {copy_index}"
+    if rng.random() < 0.5:
+        row[0], row[1] = _dx_codes(rng)
+    return row
+
+
+def generate(output_dir: str, scale: float = 10, source: str | None = None, seed: int = 42) -> str:
+    """Write a synthetic film_database.csv file into ``output_dir``.
+
+    Args:
+        output_dir (str): Directory to create the CSV file in. Created if missing.
+        scale (float, optional): Size factor, relative to the source file (or BASE_ROWS). Defaults to 10.
+        source (str | None, optional): Real film_database.csv file to scale up. Defaults to None (synthetic).
+        seed (int, optional): Random seed, so a given scale always produces the same dataset. Defaults to 42.
+
+    Returns:
+        str: The path of the generated CSV file.
+    """
+    rng = random.Random(seed)
+    os.makedirs(output_dir, exist_ok=True)
+    output_path = os.path.join(output_dir, "film_database.csv")
+
+    # Rows are split and joined on the raw delimiter (no CSV quoting), so real rows are copied verbatim.
+    source_rows = []
+    if source:
+        with open(source, encoding="utf-8") as source_file:
+            lines = source_file.read().splitlines()[1:]  # Skip the header
+            source_rows = [line.split(CSV_DELIMITER) for line in lines if line.strip()]
+    target_rows = int((len(source_rows) or BASE_ROWS) * scale)
+
+    with open(output_path, "w", encoding="utf-8") as output_file:
+        output_file.write(CSV_DELIMITER.join(CSV_HEADER) + "\n")
+        for index in range(target_rows):
+            if source_rows:
+                copy_index, source_index = divmod(index, len(source_rows))
+                row = source_rows[source_index]
+                row = row if copy_index == 0 else variant_row(row, copy_index, rng)
+            else:
+                row = synthetic_row(rng)
+            output_file.write(CSV_DELIMITER.join(row) + "\n")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", required=True, help="Output directory (usable as FILM_DATABASE_REPO_DIR)")
+    parser.add_argument("--scale", type=float, default=10, help="Size factor (default: 10)")
+    parser.add_argument("--source", default=None, help="Real film_database.csv file to scale up")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed (default: 42)")
+    args = parser.parse_args()
+    path = generate(args.output, scale=args.scale, source=args.source, seed=args.seed)
+    print(f"Generated {path}")
+
+
+if __name__ == "__main__":
+    main()
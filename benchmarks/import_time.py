@@ -0,0 +1,104 @@
+"""
+Check the import time of the application against a budget, with `python -X importtime`.
+
+Importing `app.app` must stay cheap: the database is loaded by the application lifespan, and heavy
+modules (data frames, barcode decoding, HTTP client) are imported on first use only. The import is run in
+fresh subprocesses, with a database path that doesn't exist: it fails if the import touches the
+database, imports one of the lazy modules, or takes longer than the budget (median of the runs).
+
+Usage:
+    python -m benchmarks.import_time --budget-ms 800 --runs 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess  # nosec B404
+import sys
+import tempfile
+
+IMPORTED_MODULE = "app.app"
+# Top-level modules that must not be imported with the application (see tests/test_import_time.py)
+LAZY_MODULES = ("pandas", "pyarrow", "zxingcpp", "PIL", "httpx")
+
+
+def _parse_importtime(stderr: str) -> dict[str, tuple[int, int]]:
+    """Return the self and cumulative import times (µs) per module, from the `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, module = (field.strip() for field in line.removeprefix("import time:").split("|"))
+        if self_us.isdigit():
+            modules[module] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def measure(workdir: str) -> dict[str, tuple[int, int]]:
+    """Import the application in a fresh interpreter, and return its module import times."""
+    env = {
+        **os.environ,
+        "DATA_DIR": workdir,
+        "DB_SQLITE_FILEPATH": os.path.join(workdir, "film_database.db"),
+        # Film images are served by the CDN: no local image directory needed
+        "FILM_IMAGE_CDN_ENABLE": "true",
+    }
+    process = subprocess.run(  # nosec B603
+        [sys.executable, "-X", "importtime", "-c", f"import {IMPORTED_MODULE}"],
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        # The traceback follows the import times of the modules imported so far
+        traceback = [line for line in process.stderr.splitlines() if not line.startswith("import time:")]
+        sys.exit(f"Unable to import {IMPORTED_MODULE}:\n" + "\n".join(traceback))
+    return _parse_importtime(process.stderr)
+
+
+def check(budget_ms: float, runs: int) -> tuple[float, dict[str, tuple[int, int]], list[str]]:
+    """Import the application `runs` times, and check its import time and side effects.
+
+    Returns:
+        tuple: The median import time (ms), the module import times of the last run, and the errors found.
+    """
+    errors = []
+    totals = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(runs):
+            modules = measure(workdir)
+            totals.append(modules[IMPORTED_MODULE][1] / 1000)
+        if os.listdir(workdir):
+            errors.append(f"Importing {IMPORTED_MODULE} created files: {', '.join(os.listdir(workdir))}")
+
+    median = statistics.median(totals)
+    if median > budget_ms:
+        errors.append(f"Import time over budget: {median:.1f} ms > {budget_ms:g} ms")
+    lazy_imported = [module for module in LAZY_MODULES if module in modules]
+    if lazy_imported:
+        errors.append(f"Lazy modules imported at startup: {', '.join(lazy_imported)}")
+    return median, modules, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=800, help="Max median import time (default: 800)")
+    parser.add_argument("--runs", type=int, default=5, help="Number of imports to measure (default: 5)")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to report (default: 15)")
+    args = parser.parse_args()
+
+    median, modules, errors = check(args.budget_ms, args.runs)
+
+    print(f"Slowest modules (self time, last run of {args.runs}):")
+    for module, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: -item[1][0])[: args.top]:
+        print(f"  {module:<50} {self_us / 1000:>8.1f} ms {cumulative_us / 1000:>8.1f} ms cumulative")
+
+    print(f"\nimport {IMPORTED_MODULE}: {median:.1f} ms (median, budget: {args.budget_ms:g} ms)")
+    for error in errors:
+        print(error)
+    if errors:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,342 @@
+"""
+Benchmark the core film queries and the HTTP routes against synthetic film databases.
+
+For each scale factor, a synthetic CSV file is generated, installed into a fresh SQLite database with
+`app.install`, then benchmarked in a dedicated process (the database is loaded once per process).
+Results of all scales are written to a single JSON file, to be compared between commits with
+`python -m benchmarks.compare`.
+
+Usage:
+    python -m benchmarks.run --scale 1 --scale 10 --scale 100
+    python -m benchmarks.run --scale 10 --source Open-source-film-database/film_database.csv --output base.json
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess  # nosec B404
+import sys
+import tempfile
+import time
+from collections.abc import Awaitable, Callable
+from datetime import UTC, datetime
+
+from benchmarks.generate_dataset import generate
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+# Stop measuring a case after this duration (seconds) or this number of iterations, whichever comes first.
+MIN_CASE_DURATION = 0.3
+MAX_CASE_ITERATIONS = 2000
+MIN_CASE_ITERATIONS = 5
+
+
+def _summary(timings: list[float]) -> dict:
+    """Return latency statistics (in milliseconds) for the given timings (in seconds)."""
+    timings = sorted(timings)
+    return {
+        "iterations": len(timings),
+        "mean_ms": statistics.fmean(timings) * 1000,
+        "median_ms": statistics.median(timings) * 1000,
+        "p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        "min_ms": timings[0] * 1000,
+        "ops_per_sec": len(timings) / sum(timings) if sum(timings) else None,
+    }
+
+
+def measure(func: Callable[[], object]) -> dict:
+    """Call ``func`` repeatedly (after one warm-up call) and return its latency statistics."""
+    func()
+    timings = []
+    deadline = time.perf_counter() + MIN_CASE_DURATION
+    while len(timings) < MAX_CASE_ITERATIONS and (len(timings) < MIN_CASE_ITERATIONS or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return _summary(timings)
+
+
+async def measure_async(func: Callable[[], Awaitable[object]]) -> dict:
+    """Async version of :func:`measure`."""
+    await func()
+    timings = []
+    deadline = time.perf_counter() + MIN_CASE_DURATION
+    while len(timings) < MAX_CASE_ITERATIONS and (len(timings) < MIN_CASE_ITERATIONS or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        await func()
+        timings.append(time.perf_counter() - start)
+    return _summary(timings)
+
+
+def _sample_film():
+    """Return a film having all the searchable fields set, to build realistic queries from."""
+    from app.core import database, film
+
+    fallback = None
+    for rowid in range(max(1, database.total_count // 2), database.total_count + 1):
+        candidate = film.get_by_id(rowid)
+        if candidate is None:
+            continue
+        fallback = fallback or candidate
+        if candidate.dx_extract and candidate.dx_full and candidate.manufacturer and len(candidate.name.split()) > 1:
+            return candidate
+    return fallback
+
+
+def core_benchmarks(sample) -> dict:
+    """Benchmark the functions of app.core.film."""
+    from app.core import film
+    from app.utils.manufacturers import manufacturer_slug
+    from app.utils.sql import sanitize_fulltext_string
+
+    name_words = sample.name.split()
+    search_values = {
+        "dx_extract": sample.dx_extract,
+        "dx_full": sample.dx_full,
+        "name": name_words[1] if len(name_words) > 1 else name_words[0],
+        "manufacturer": sample.manufacturers[0],
+    }
+    results = {}
+
+    # Every combination of search parameters
+    for size in range(1, len(search_values) + 1):
+        for combination in itertools.combinations(search_values, size):
+            params = {key: search_values[key] for key in combination}
+            results[f"search[{'+'.join(combination)}]"] = measure(lambda params=params: film.search(**params))
+
+    # Autocomplete: first word, context ("kodak p") and next word ("kodak "), cold (uncached) and warm
+    first_word = name_words[0].lower()
+    autocomplete_cases = {
+        "name:first_word": ("name", first_word[:3]),
+        "name:context": ("name", f"{first_word} {name_words[1][:1].lower()}" if len(name_words) > 1 else first_word),
+        "name:next_word": ("name", f"{first_word} "),
+        "manufacturer:first_word": ("manufacturer", sample.manufacturers[0].lower()[:3]),
+        "manufacturer:next_word": ("manufacturer", f"{sample.manufacturers[0].lower().split()[0]} "),
+    }
+    for case, (column, text) in autocomplete_cases.items():
+        sanitized = sanitize_fulltext_string(text)
+        results[f"autocomplete[{case}]:cold"] = measure(
+            lambda column=column, sanitized=sanitized: film._autocomplete_cached.__wrapped__(
+                column, sanitized, film.MAX_AUTOCOMPLETE_RESULTS
+            )
+        )
+        results[f"autocomplete[{case}]:warm"] = measure(
+            lambda column=column, text=text: film.autocomplete(column, text)
+        )
+
+    results["facet_counts"] = measure(lambda: film.facet_counts())
+    results["facet_counts[manufacturer]:cold"] = measure(
+        lambda: film._matching_films_bitmap.__wrapped__((("manufacturer", search_values["manufacturer"]),))
+    )
+    results["facet_counts[manufacturer+availability]"] = measure(
+        lambda: film.facet_counts(manufacturer=search_values["manufacturer"], availability="on_the_market")
+    )
+    results["get_by_url"] = measure(lambda: film.get_by_url(sample.url_name))
+    results["get_by_url:missing"] = measure(lambda: film.get_by_url("no-such-film-url-name"))
+    results["get_manufacturer_films"] = measure(
+        lambda: film.get_manufacturer_films(manufacturer_slug(sample.manufacturers[0]))
+    )
+    results["get_related"] = measure(lambda: film.get_related(sample.url_name))
+    results["get_random"] = measure(lambda: film.get_random(limit=1))
+    results["get_random:max"] = measure(lambda: film.get_random(limit=film.MAX_RESULTS))
+    if sample.dx_extract:
+        results["get_film_type"] = measure(lambda: film.get_film_type(sample.dx_extract))
+    return results
+
+
+def _route_urls(sample) -> dict[str, str]:
+    from app.utils.manufacturers import manufacturer_slug
+
+    name_word = sample.name.split()[-1]
+    return {
+        "GET /": "/",
+        "GET /help": "/help",
+        "GET /search?name": f"/search?name={name_word}",
+        "GET /search?dx_full": f"/search?dx_full={sample.dx_full}",
+        "GET /film/{url_name}": f"/film/{sample.url_name}",
+        "GET /api/search?name": f"/api/search?name={name_word}",
+        "GET /api/search?manufacturer": f"/api/search?manufacturer={sample.manufacturers[0]}",
+        "GET /api/search?dx_extract": f"/api/search?dx_extract={sample.dx_extract}",
+        "GET /api/film/{url_name}": f"/api/film/{sample.url_name}",
+        "GET /api/film/{url_name}/related": f"/api/film/{sample.url_name}/related",
+        "GET /manufacturer/{slug}": f"/manufacturer/{manufacturer_slug(sample.manufacturers[0])}",
+        "GET /api/manufacturer/{slug}": f"/api/manufacturer/{manufacturer_slug(sample.manufacturers[0])}",
+        "GET /api/autocomplete/name": f"/api/autocomplete/name?q={sample.name.split()[0][:3]}",
+        "GET /api/facets": "/api/facets",
+        "GET /api/facets?manufacturer": f"/api/facets?manufacturer={sample.manufacturers[0]}",
+        "GET /api/random": "/api/random?limit=10",
+        "GET /api/health": "/api/health",
+    }
+
+
+async def http_benchmarks(sample, concurrency: int, load_duration: float) -> dict:
+    """Benchmark the HTTP routes through an in-process ASGI client, then run a concurrent load test."""
+    import httpx
+
+    from app.app import app
+
+    urls = _route_urls(sample)
+    results = {}
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+            for case, url in urls.items():
+                results[case] = await measure_async(lambda url=url: client.get(url))
+
+            # Load test: concurrent clients cycling through the route mix
+            timings: list[float] = []
+            errors = 0
+            deadline = time.perf_counter() + load_duration
+
+            async def worker(offset: int):
+                nonlocal errors
+                for url in itertools.islice(itertools.cycle(urls.values()), offset, None):
+                    if time.perf_counter() >= deadline:
+                        return
+                    start = time.perf_counter()
+                    response = await client.get(url)
+                    timings.append(time.perf_counter() - start)
+                    if response.status_code >= 500:
+                        errors += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(worker(index) for index in range(concurrency)))
+            elapsed = time.perf_counter() - start
+            results["load_test"] = {
+                **_summary(timings),
+                "concurrency": concurrency,
+                "duration_s": elapsed,
+                "requests_per_sec": len(timings) / elapsed,
+                "server_errors": errors,
+            }
+    return results
+
+
+def worker_main(output: str, concurrency: int, load_duration: float):
+    """Benchmark the database configured in the environment. Runs in a dedicated process."""
+    from app.core import database, film
+
+    # The application loads the database at startup only: load it for the core benchmarks too
+    film.load_films()
+    sample = _sample_film()
+    results = {
+        "films": database.total_count,
+        "sample_film": sample.url_name,
+        "core": core_benchmarks(sample),
+        "http": asyncio.run(http_benchmarks(sample, concurrency, load_duration)),
+    }
+    with open(output, "w") as output_file:
+        json.dump(results, output_file)
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.check_output(  # nosec B603 B607
+            ["git", "rev-parse", "--short", "HEAD"], text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_scale(scale: float, workdir: str, source: str | None, concurrency: int, load_duration: float) -> dict:
+    """Generate, install and benchmark a database of the given scale, in subprocesses."""
+    scale_dir = os.path.join(workdir, f"x{scale:g}")
+    env = {
+        **os.environ,
+        "FILM_DATABASE_REPO_DIR": scale_dir,
+        "FILM_IMAGE_DIR": scale_dir,
+        "FILM_IMAGE_CDN_ENABLE": "false",
+        "DATA_DIR": os.path.join(scale_dir, "data"),
+        "DB_SQLITE_FILEPATH": os.path.join(scale_dir, "data", "film_database.db"),
+        "SNAPSHOT_DIR": os.path.join(scale_dir, "data", "snapshots"),
+        "HOT_QUERIES_FILEPATH": os.path.join(scale_dir, "data", "hot_queries.json"),
+        # Repeated requests would otherwise be served by the response cache, instead of measuring the routes
+        "RESPONSE_CACHE_ENABLE": "false",
+        # The benchmark client would otherwise be throttled as a single IP address
+        "RATE_LIMITER_MAX_REQUESTS": str(10**9),
+    }
+    if not os.path.exists(env["DB_SQLITE_FILEPATH"]):
+        print(f"[x{scale:g}] Generating and installing the dataset in {scale_dir}...")
+        generate(scale_dir, scale=scale, source=source)
+        install_start = time.perf_counter()
+        subprocess.run(  # nosec B603
+            [sys.executable, "-m", "app.install"], env=env, check=True, stdout=subprocess.DEVNULL
+        )
+        install_duration = time.perf_counter() - install_start
+    else:
+        print(f"[x{scale:g}] Reusing the installed dataset in {scale_dir}")
+        install_duration = None
+
+    print(f"[x{scale:g}] Benchmarking...")
+    results_path = os.path.join(scale_dir, "results.json")
+    subprocess.run(  # nosec B603
+        [
+            sys.executable,
+            "-m",
+            "benchmarks.run",
+            "--worker",
+            results_path,
+            "--concurrency",
+            str(concurrency),
+            "--load-duration",
+            str(load_duration),
+        ],
+        env=env,
+        check=True,
+    )
+    with open(results_path) as results_file:
+        results = json.load(results_file)
+    results["install_duration_s"] = install_duration
+    results["db_size_bytes"] = os.path.getsize(env["DB_SQLITE_FILEPATH"])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--scale", type=float, action="append", help="Dataset size factor, can be repeated (default: 1 and 10)"
+    )
+    parser.add_argument("--source", default=None, help="Real film_database.csv file to scale up")
+    parser.add_argument("--output", default=None, help="Results JSON file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--workdir", default=None, help="Keep the generated datasets in this directory, for reuse")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent clients of the load test")
+    parser.add_argument("--load-duration", type=float, default=5, help="Duration of the load test, in seconds")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker_main(args.worker, args.concurrency, args.load_duration)
+        return
+
+    scales = args.scale or [1, 10]
+    commit = _git_commit()
+    report = {
+        "meta": {
+            "commit": commit,
+            "date": datetime.now(UTC).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "source": os.path.basename(args.source) if args.source else None,
+        },
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        workdir = args.workdir or tmpdir
+        for scale in scales:
+            report["scales"][f"x{scale:g}"] = run_scale(
+                scale, workdir, args.source, args.concurrency, args.load_duration
+            )
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+// Autocomplete of the film name and manufacturer inputs, over a single WebSocket connection.
+// Every keystroke sends a query, only the answer to the latest query of each input is shown (the server
+// drops the superseded ones). Falls back to the HTTP API if WebSockets are unavailable.
+
+const autocompleteInputs = {
+    name: document.getElementById("film_name"),
+    manufacturer: document.getElementById("film_manufacturer"),
+};
+// Id of the latest query of each column: older answers are ignored
+const latestQueryIds = {};
+let nextQueryId = 1;
+let autocompleteSocket = null;
+let webSocketFailed = false;
+
+function showSuggestions(column, words) {
+    const input = autocompleteInputs[column];
+    const datalist = document.getElementById(input.getAttribute("list"));
+    // The suggestions complete the last word of the input
+    const prefix = input.value.replace(/\S*$/, "");
+    datalist.replaceChildren(...words.map(function (word) {
+        const option = document.createElement("option");
+        option.value = prefix + word;
+        return option;
+    }));
+}
+
+function handleAnswer(answer) {
+    if (answer.column && answer.id === latestQueryIds[answer.column] && answer.data) {
+        showSuggestions(answer.column, answer.data);
+    }
+}
+
+function openSocket() {
+    const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+    const socket = new WebSocket(protocol + "//" + window.location.host + "/api/autocomplete/ws");
+    let opened = false;
+    socket.onopen = function () {
+        opened = true;
+    };
+    socket.onmessage = function (event) {
+        handleAnswer(JSON.parse(event.data));
+    };
+    socket.onclose = function () {
+        autocompleteSocket = null;
+        // Never opened (blocked by a proxy...): use the HTTP API from now on.
+        // Connections closed later (idle timeout) are reopened on the next keystroke.
+        if (!opened) {
+            webSocketFailed = true;
+        }
+    };
+    return socket;
+}
+
+function sendQuery(column, text) {
+    const query = { id: nextQueryId++, column: column, q: text };
+    latestQueryIds[column] = query.id;
+    if (webSocketFailed || !("WebSocket" in window)) {
+        fetch("/api/autocomplete/" + column + "?q=" + encodeURIComponent(text))
+            .then(function (response) { return response.ok ? response.json() : null; })
+            .then(function (answer) {
+                if (answer) {
+                    handleAnswer({ id: query.id, column: column, data: answer.data });
+                }
+            })
+            .catch(function () {});
+        return;
+    }
+    if (autocompleteSocket === null) {
+        autocompleteSocket = openSocket();
+    }
+    const socket = autocompleteSocket;
+    if (socket.readyState === WebSocket.OPEN) {
+        socket.send(JSON.stringify(query));
+    } else {
+        socket.addEventListener("open", function () {
+            // Only the latest keystroke typed while connecting is sent
+            if (latestQueryIds[column] === query.id) {
+                socket.send(JSON.stringify(query));
+            }
+        });
+    }
+}
+
+for (const [column, input] of Object.entries(autocompleteInputs)) {
+    if (input === null) {
+        continue;
+    }
+    const datalist = document.createElement("datalist");
+    datalist.id = input.id + "_suggestions";
+    input.after(datalist);
+    input.setAttribute("list", datalist.id);
+    input.addEventListener("input", function () {
+        if (input.value.trim()) {
+            sendQuery(column, input.value);
+        }
+    });
+}
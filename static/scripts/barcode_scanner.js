@@ -67,6 +67,123 @@ function temporaryDisableScanning(){
     }, 1000);
 }
 
+// DX code bundle (see app.utils.dx_bundle), loaded when the camera starts. Once loaded, scanned codes are
+// resolved locally, without any request: the film pages are only requested when opened. Until then (or if
+// it can't be loaded), a scan opens the search page.
+const maxShownFilms = 10;
+let dxBundle = null;
+let dxBundleLoading = false;
+
+function loadDxBundle() {
+    const url = resultElement.dataset.dxBundle;
+    if (!url || dxBundle !== null || dxBundleLoading) {
+        return;
+    }
+    dxBundleLoading = true;
+    // Immutable file, named after its content: downloaded once per database build
+    fetch(url)
+        .then(function (response) { return response.ok ? response.json() : null; })
+        .then(function (bundle) {
+            if (bundle && bundle.version === 1) {
+                dxBundle = indexDxBundle(bundle);
+            }
+        })
+        .catch(function (error) {
+            console.error("Error loading the DX code bundle:", error);
+        })
+        .finally(function () {
+            dxBundleLoading = false;
+        });
+}
+
+function addToIndex(index, key, filmIndex) {
+    if (key !== null) {
+        if (!index.has(key)) {
+            index.set(key, []);
+        }
+        index.get(key).push(filmIndex);
+    }
+}
+
+function indexDxBundle(bundle) {
+    const films = bundle.films;
+    const byExtract = new Map();
+    const byFull = new Map();
+    for (let i = 0; i < films.name.length; i++) {
+        addToIndex(byExtract, films.dx_extract[i], i);
+        addToIndex(byFull, films.dx_full[i], i);
+    }
+    return { films: films, filmTypes: bundle.film_types, byExtract: byExtract, byFull: byFull };
+}
+
+function filmTypeLabel(dxExtract) {
+    // Last matching range first, like app.core.film.get_film_type
+    const filmTypes = dxBundle.filmTypes;
+    for (let i = filmTypes.length - 1; i >= 0; i--) {
+        if (dxExtract >= filmTypes[i][0] && dxExtract <= filmTypes[i][1]) {
+            return filmTypes[i][2];
+        }
+    }
+    return null;
+}
+
+// Find the films of a scanned code, like the search page (see app.core.film.search). Films are in bundle order,
+// which is the search result order. Returns null if the code isn't a DX code.
+function resolveDxCode(codeFormat, text) {
+    const films = dxBundle.films;
+    if (codeFormat === "DX Film Edge") {
+        // "162-2" or "162-2/10A" (with frame number)
+        const parts = text.split(/[-\s/]+/);
+        const dxExtract = 16 * parseInt(parts[0], 10) + parseInt(parts[1], 10);
+        if (isNaN(dxExtract)) {
+            return null;
+        }
+        return { dxExtract: dxExtract, films: dxBundle.byExtract.get(dxExtract) || [] };
+    }
+    if (codeFormat === "ITF" && /^\d{6}$/.test(text)) {
+        const dxFull = parseInt(text, 10);
+        const dxExtract = Math.floor(dxFull / 10) % 10000;
+        // Some films have mismatching DX extract and DX full numbers: their DX full must match exactly
+        const matches = (dxBundle.byExtract.get(dxExtract) || []).filter(function (i) {
+            return films.dx_full[i] !== null && Math.floor(films.dx_full[i] / 10) % 10000 === dxExtract;
+        });
+        for (const i of dxBundle.byFull.get(dxFull) || []) {
+            if (!matches.includes(i)) {
+                matches.push(i);
+            }
+        }
+        // Exact DX full first, then the same DX full but the last digit (stable sort)
+        const rank = function (i) {
+            return films.dx_full[i] === dxFull ? 2 : Math.floor(films.dx_full[i] / 10) === Math.floor(dxFull / 10) ? 1 : 0;
+        };
+        matches.sort(function (a, b) { return rank(b) - rank(a) || a - b; });
+        return { dxExtract: dxExtract, films: matches };
+    }
+    return null;
+}
+
+function showResolvedCode(code, resolved, searchUrl) {
+    const films = dxBundle.films;
+    const filmType = filmTypeLabel(resolved.dxExtract);
+    const title = document.createElement("p");
+    title.textContent = code.format + ": " + code.text + (filmType ? " (" + filmType + ")" : "");
+    const list = document.createElement("ul");
+    for (const i of resolved.films.slice(0, maxShownFilms)) {
+        const item = document.createElement("li");
+        const link = document.createElement("a");
+        link.href = "film/" + films.url_name[i];
+        link.textContent = films.name[i];
+        item.appendChild(link);
+        list.appendChild(item);
+    }
+    const searchLink = document.createElement("a");
+    searchLink.href = searchUrl;
+    searchLink.textContent = resolved.films.length === 0 ? "No film found, search anyway"
+        : resolved.films.length > maxShownFilms ? "All " + resolved.films.length + " films" : "Search page";
+    resultElement.replaceChildren(title, list, searchLink);
+    resultElement.style.display = "";
+}
+
 const processFrame = function () {
     if (scanningEnabled === true){
     ctx.drawImage(video, 0, 0, canvas.width, canvas.height);
@@ -74,15 +191,24 @@ const processFrame = function () {
     const code = readBarcodeFromCanvas(canvas, format.value, tryHarder === 'true');
     if (code.format) {
             temporaryDisableScanning()
-            resultElement.innerText = code.format + ": " + escapeTags(code.text);
             drawResult(code)
-            setTimeout(function () {
+            let searchUrl = null;
             if (code.format === "ITF") {
-                window.location.href = "search?dx_full=" + encodeURIComponent(code.text);
+                searchUrl = "search?dx_full=" + encodeURIComponent(code.text);
             } else if (code.format === "DX Film Edge") {
-                window.location.href = "search?dx_number=" + encodeURIComponent(code.text);
+                searchUrl = "search?dx_number=" + encodeURIComponent(code.text);
+            }
+            const resolved = dxBundle !== null && searchUrl !== null ? resolveDxCode(code.format, code.text) : null;
+            if (resolved !== null) {
+                showResolvedCode(code, resolved, searchUrl);
+            } else {
+                resultElement.innerText = code.format + ": " + escapeTags(code.text);
+                setTimeout(function () {
+                if (searchUrl !== null) {
+                    window.location.href = searchUrl;
+                }
+                }, 500);
             }
-            }, 500);
     }
 }
     requestAnimationFrame(processFrame);
@@ -95,6 +221,7 @@ const updateVideoStream = function (deviceId) {
 
     canvas.style.display = "";
     enableimg.style.display = "none";
+    loadDxBundle();
 
     if (currentStream) {
         // Stop all tracks when switching or stopping the camera
@@ -0,0 +1,76 @@
+"""Test fixtures: the application runs on a small database, built by app.install from a synthetic CSV file.
+
+Settings are read from the environment when `app.config` is first imported: they are set here, before any
+test module imports the application.
+"""
+
+import os
+import re
+import tempfile
+
+import pytest
+
+from benchmarks.generate_dataset import CSV_DELIMITER, generate
+
+_WORKDIR = tempfile.mkdtemp(prefix="film-database-tests-")
+os.environ.update(
+    {
+        "DATA_DIR": _WORKDIR,
+        "FILM_DATABASE_REPO_DIR": _WORKDIR,
+        "DB_SQLITE_FILEPATH": os.path.join(_WORKDIR, "film_database.db"),
+        "SNAPSHOT_DIR": os.path.join(_WORKDIR, "snapshots"),
+        "HOT_QUERIES_FILEPATH": os.path.join(_WORKDIR, "hot_queries.json"),
+        "FILM_IMAGE_CDN_ENABLE": "false",
+        "FILM_IMAGE_DIR": _WORKDIR,
+        "RATE_LIMITER_MAX_REQUESTS": "100000",
+    }
+)
+
+# Films with known values, added to the synthetic ones
+# (dx_extract, dx_full, name, og_film_or_information, manufacturer, reliability, country, begin_year, end_year,
+# distributor, availability, picture)
+FIXTURE_FILMS = [
+    ["2594", "025943", "Kodak Gold 200 Fixture", "", "Kodak", "", "USA", "1988", "", "", "2", ""],
+    ["2596", "025962", "Kodak Gold 200 Fixture Generation 4", "", "Kodak", "", "USA", "1995", "", "", "2", ""],
+]
+
+
+@pytest.fixture(scope="session")
+def film_database() -> str:
+    """Build the test database, and load it. Returns its path."""
+    from app.core import film
+    from app.install import update_db
+
+    csv_path = generate(_WORKDIR, scale=0.02, seed=1)
+    with open(csv_path, "a", encoding="utf-8") as csv_file:
+        for row in FIXTURE_FILMS:
+            csv_file.write(CSV_DELIMITER.join(row) + "\n")
+    update_db()
+    film.load_films()
+    return os.environ["DB_SQLITE_FILEPATH"]
+
+
+@pytest.fixture(scope="session")
+def client(film_database):
+    """HTTP client of the application, started (lifespan) once for all the tests."""
+    from fastapi.testclient import TestClient
+
+    from app.app import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def request_count():
+    """Return a function reading the number of recorded HTTP requests of a method, route and status."""
+    from app.core import metrics
+
+    def count(method: str, route: str, status: int) -> int:
+        labels = f'method="{method}",route="{route}",status="{status}"'
+        match = re.search(
+            rf"^http_request_duration_seconds_count\{{{re.escape(labels)}\}} (\d+)$", metrics.REGISTRY.render(), re.M
+        )
+        return int(match.group(1)) if match else 0
+
+    return count
@@ -0,0 +1,35 @@
+from app.core import metrics
+from app.core.admission import AdmissionControlMiddleware, route_class
+
+
+def admission_middleware(app) -> AdmissionControlMiddleware:
+    middleware = app.middleware_stack
+    while not isinstance(middleware, AdmissionControlMiddleware):
+        middleware = middleware.app
+    return middleware
+
+
+def test_admin_routes_have_their_own_budget():
+    assert route_class("/api/health") == "health"
+    assert route_class("/admin/metrics") == "admin"
+    assert route_class("/admin/slow-queries") == "admin"
+
+
+def test_rejections_are_recorded_in_the_route_metrics(client, monkeypatch, request_count):
+    client.get("/api/health")  # Builds the middleware stack
+    budget = admission_middleware(client.app).budgets["api"]
+    monkeypatch.setattr(budget, "active", budget.max_concurrency)
+    monkeypatch.setattr(budget, "max_queue", 0)
+    before = request_count("GET", "/api/search", 503)
+    response = client.get("/api/search", params={"name": "Kodak"})
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+    assert request_count("GET", "/api/search", 503) == before + 1
+    assert client.get("/api/health").status_code == 200
+
+
+def test_requests_answered_before_the_routing_get_their_route_label(client):
+    scope = {"type": "http", "method": "GET", "path": "/api/film/kodak_gold_200/related", "root_path": ""}
+    assert metrics.route_label(scope) == "/api/film/{url_name}/related"
+    assert metrics.route_label({**scope, "path": "/static/styles/main.css"}) == "/static"
+    assert metrics.route_label({**scope, "path": "/no/such/page"}) == "unmatched"
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from starlette.websockets import WebSocketDisconnect
+
+from app.config import settings
+from app.core import film
+
+
+def test_query_is_answered_with_its_id(client):
+    with client.websocket_connect("/api/autocomplete/ws") as websocket:
+        websocket.send_json({"id": 7, "column": "name", "q": "Kodak G"})
+        assert websocket.receive_json() == {"id": 7, "column": "name", "data": film.autocomplete("name", "Kodak G")}
+
+
+@pytest.mark.parametrize("text", ['{"id": 1, "column": "country", "q": "us"}', "not json"])
+def test_invalid_query_gets_an_error(client, text):
+    with client.websocket_connect("/api/autocomplete/ws") as websocket:
+        websocket.send_text(text)
+        assert "error" in websocket.receive_json()
+        # The connection stays usable
+        websocket.send_json({"id": 2, "column": "manufacturer", "q": "kod"})
+        assert websocket.receive_json()["id"] == 2
+
+
+def test_query_superseded_while_running_is_never_answered(client, monkeypatch):
+    queries = []
+
+    async def slow_autocomplete(column, text, limit):
+        queries.append(text)
+        if text == "slow":
+            await asyncio.sleep(0.2)
+        return [text]
+
+    monkeypatch.setattr(film, "coalesced_autocomplete", slow_autocomplete)
+    with client.websocket_connect("/api/autocomplete/ws") as websocket:
+        websocket.send_json({"id": 1, "column": "name", "q": "slow"})
+        websocket.send_json({"id": 2, "column": "name", "q": "superseding"})
+        assert websocket.receive_json()["id"] == 2
+        websocket.send_json({"id": 3, "column": "name", "q": "next"})
+        assert websocket.receive_json()["id"] == 3
+    assert queries == ["slow", "superseding", "next"]
+
+
+def test_idle_connection_is_closed(client, monkeypatch):
+    monkeypatch.setattr(settings, "AUTOCOMPLETE_WEBSOCKET_IDLE_TIMEOUT", 0.1)
+    with (
+        client.websocket_connect("/api/autocomplete/ws") as websocket,
+        pytest.raises(WebSocketDisconnect) as disconnect,
+    ):
+        websocket.receive_json()
+    assert disconnect.value.code == 1001
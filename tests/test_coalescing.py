@@ -0,0 +1,99 @@
+import asyncio
+import threading
+
+from app.core import film
+
+CALLERS = 8
+
+
+class BlockingCall:
+    """Stands for a slow query: blocks its worker thread until released, and counts its calls."""
+
+    def __init__(self, result=None, error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.released = threading.Event()
+
+    def __call__(self, *args, **kwargs):
+        self.calls += 1
+        self.released.wait(timeout=5)
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def gather_released(blocking_call: BlockingCall, calls: list, return_exceptions: bool = False) -> list:
+    """Start the calls at once, and release the blocking call once they are all waiting for it."""
+    tasks = asyncio.gather(*calls, return_exceptions=return_exceptions)
+    await asyncio.sleep(0.05)
+    blocking_call.released.set()
+    return await tasks
+
+
+def test_identical_searches_share_one_computation(monkeypatch):
+    blocking_search = BlockingCall(result=(["Kodak Gold 200"], None))
+    monkeypatch.setattr(film, "fuzzy_search", blocking_search)
+    calls = [film.coalesced_fuzzy_search(name="Kodak Gold", country="USA") for _ in range(CALLERS)]
+    results = asyncio.run(gather_released(blocking_search, calls))
+    assert blocking_search.calls == 1
+    assert results == [(["Kodak Gold 200"], None)] * CALLERS
+
+
+def test_different_searches_are_not_shared(monkeypatch):
+    blocking_search = BlockingCall(result=([], None))
+    monkeypatch.setattr(film, "fuzzy_search", blocking_search)
+    # The name ranking is case sensitive: only identical criteria are shared
+    calls = [film.coalesced_fuzzy_search(name=name) for name in ("Kodak Gold", "kodak gold")]
+    asyncio.run(gather_released(blocking_search, calls))
+    assert blocking_search.calls == 2
+
+
+def test_identical_film_lookups_share_one_computation(monkeypatch):
+    blocking_lookup = BlockingCall(result="film")
+    monkeypatch.setattr(film, "get_by_url", blocking_lookup)
+    calls = [film.coalesced_get_by_url("kodak-gold-200") for _ in range(CALLERS)]
+    assert asyncio.run(gather_released(blocking_lookup, calls)) == ["film"] * CALLERS
+    assert blocking_lookup.calls == 1
+
+
+def test_exception_reaches_every_caller(monkeypatch):
+    error = ValueError("No search parameters provided.")
+    blocking_search = BlockingCall(error=error)
+    monkeypatch.setattr(film, "fuzzy_search", blocking_search)
+    calls = [film.coalesced_fuzzy_search(name="Kodak Gold") for _ in range(CALLERS)]
+    results = asyncio.run(gather_released(blocking_search, calls, return_exceptions=True))
+    assert blocking_search.calls == 1
+    assert results == [error] * CALLERS
+
+
+def test_timeout_reaches_every_caller(monkeypatch):
+    blocking_lookup = BlockingCall(result="film")
+    monkeypatch.setattr(film, "get_by_url", blocking_lookup)
+    monkeypatch.setattr(film._film_flight, "timeout", 0.05)
+
+    async def wait_then_release():
+        results = await asyncio.gather(
+            *(film.coalesced_get_by_url("kodak-gold-200") for _ in range(CALLERS)), return_exceptions=True
+        )
+        # The computation goes on without its callers, and is forgotten once done
+        assert len(film._film_flight) == 1
+        blocking_lookup.released.set()
+        while len(film._film_flight):
+            await asyncio.sleep(0.01)
+        return results
+
+    results = asyncio.run(wait_then_release())
+    assert blocking_lookup.calls == 1
+    assert all(isinstance(result, TimeoutError) for result in results)
+    assert len(results) == CALLERS
+
+
+def test_cached_autocomplete_skips_the_worker_thread(film_database, monkeypatch):
+    expected = film.autocomplete("name", "kodak g")
+
+    async def no_flight(*args, **kwargs):
+        raise AssertionError("Cached autocomplete answers must not start a flight")
+
+    monkeypatch.setattr(film._autocomplete_flight, "do", no_flight)
+    assert asyncio.run(film.coalesced_autocomplete("name", "Kodak G")) == expected
@@ -0,0 +1,42 @@
+import hashlib
+import json
+
+from app.constants import SNAPSHOT_DIR_URL
+from app.core import database
+from app.utils.dx_bundle import DX_BUNDLE_VERSION, dx_bundle
+
+FILMS = [("Kodak Gold 200", "kodak_gold_200", 2594, 25943), ("Fixture", "fixture", None, None)]
+FILM_TYPES = [(0, 99, "Negative"), (100, 199, "Slide")]
+
+
+def test_bundle_is_deterministic_and_named_by_its_hash():
+    content, content_hash = dx_bundle(iter(FILMS), iter(FILM_TYPES))
+    assert (content, content_hash) == dx_bundle(FILMS, FILM_TYPES)
+    assert content_hash == hashlib.sha256(content).hexdigest()[:16]
+    assert json.loads(content) == {
+        "version": DX_BUNDLE_VERSION,
+        "films": {
+            "name": ["Kodak Gold 200", "Fixture"],
+            "url_name": ["kodak_gold_200", "fixture"],
+            "dx_extract": [2594, None],
+            "dx_full": [25943, None],
+        },
+        "film_types": [[0, 99, "Negative"], [100, 199, "Slide"]],
+    }
+    assert dx_bundle(FILMS[:1], FILM_TYPES)[1] != content_hash
+
+
+def test_bundle_route(client):
+    file_name = database.db_metadata["dx_bundle"]
+    url = SNAPSHOT_DIR_URL + file_name
+    plain = client.get(url, headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert plain.status_code == 200
+    assert "content-encoding" not in plain.headers
+    assert file_name == f"dx-{hashlib.sha256(plain.content).hexdigest()[:16]}.json"
+    assert json.loads(plain.content)["version"] == DX_BUNDLE_VERSION
+
+    compressed = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.content == plain.content
+
+    assert client.get(SNAPSHOT_DIR_URL + f"dx-{'0' * 16}.json").status_code == 404
@@ -0,0 +1,24 @@
+from app.core.facets import FacetIndex
+
+# (film_id, manufacturer, country, availability, reliability, decade)
+ROWS = [
+    (10, "Kodak", "USA", 2, 4, 1980),
+    (11, "kodak, Lomography", "usa", None, None, 1990),
+    (12, "Fujifilm", "Japan", 0, 3, 1990),
+]
+
+
+class Connection:
+    def execute(self, query):
+        return iter(ROWS)
+
+
+def test_values_are_case_insensitive():
+    index = FacetIndex()
+    index.load(Connection())
+    counts = index.counts(index.all_films)
+    assert counts["country"] == {"USA": 2, "Japan": 1}
+    assert counts["manufacturer"] == {"Kodak": 2, "Fujifilm": 1, "Lomography": 1}
+    assert index.filter_bitmap("country", "usa") == index.filter_bitmap("country", "USA") == index.bitmap([10, 11])
+    assert index.counts(index.filter_bitmap("country", "uSa"))["manufacturer"] == {"Kodak": 2, "Lomography": 1}
+    assert index.filter_bitmap("country", "France") == 0
@@ -0,0 +1,30 @@
+import sqlite3
+
+import pytest
+
+from app.core.film_store import film_store
+from app.core.schemas.film import FilmInDB, HTMLFilmInDB
+from app.core.tables import SELECT_FILMS
+
+
+@pytest.fixture(scope="module")
+def film_rows(film_database) -> list[dict]:
+    connection = sqlite3.connect(film_database)
+    connection.row_factory = sqlite3.Row
+    rows = [dict(row) for row in connection.execute(SELECT_FILMS)]
+    connection.close()
+    return rows
+
+
+@pytest.mark.parametrize("film_model", [FilmInDB, HTMLFilmInDB])
+def test_trusted_construction_matches_validation(film_rows, film_model):
+    # Films are built from trusted rows without validation at runtime (see FilmInDB.from_db_rows)
+    validated_films = film_model.from_db_rows(film_rows, strict=True)
+    trusted_films = film_model.from_db_rows(film_rows, strict=False)
+    for validated_film, trusted_film in zip(validated_films, trusted_films, strict=True):
+        assert trusted_film.model_dump() == validated_film.model_dump()
+        assert trusted_film.model_fields_set == validated_film.model_fields_set
+
+
+def test_store_records_match_rows(film_rows):
+    assert [record.as_row() for record in film_store] == film_rows
@@ -0,0 +1,31 @@
+import json
+import os
+import threading
+
+from app.core import film, hot_queries
+
+
+def test_concurrent_saves(tmp_path):
+    filepath = str(tmp_path / "hot_queries.json")
+    hot_queries.record(hot_queries.AUTOCOMPLETE, "name", "kodak p", 10)
+    # Like the worker processes of a server, saving at the same time
+    threads = [threading.Thread(target=hot_queries.save, args=(filepath,)) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    with open(filepath) as file:
+        assert json.load(file)["queries"]
+    assert os.listdir(tmp_path) == ["hot_queries.json"]
+
+
+def test_only_cached_queries_are_replayed(film_database, tmp_path):
+    filepath = str(tmp_path / "hot_queries.json")
+    queries = [
+        {"kind": "search", "args": [["name", "kodak"]], "count": 10},
+        {"kind": "autocomplete", "args": ["name", "kodak p", 10], "count": 5},
+    ]
+    with open(filepath, "w") as file:
+        json.dump({"queries": queries}, file)
+    assert hot_queries.load(filepath) == [("autocomplete", ("name", "kodak p", 10))]
+    assert set(film.HOT_QUERY_HANDLERS) == set(hot_queries.KINDS)
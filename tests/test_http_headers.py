@@ -0,0 +1,53 @@
+import pytest
+
+from app.utils.http_headers import accepts_encoding, etag_matches
+
+ETAG = '"abc-ndjson-1234"'
+
+
+@pytest.mark.parametrize(
+    "if_none_match", ['"abc-ndjson-1234"', 'W/"abc-ndjson-1234"', '"other", "abc-ndjson-1234"', "*", ' "x" ,* ']
+)
+def test_etag_matches(if_none_match):
+    assert etag_matches(if_none_match, ETAG)
+
+
+@pytest.mark.parametrize("if_none_match", [None, "", '"abc-ndjson-1234-v2"', '"x-abc-ndjson-1234"', '"abc-ndjson"'])
+def test_etag_does_not_match(if_none_match):
+    assert not etag_matches(if_none_match, ETAG)
+
+
+def test_export_is_not_modified_for_its_exact_etag(client):
+    etag = client.get("/api/export", params={"format": "csv"}).headers.get("etag")
+    if etag is None:
+        pytest.skip("Database built without build ID")
+    assert client.get("/api/export", params={"format": "csv"}, headers={"If-None-Match": etag}).status_code == 304
+    longer_etag = etag[:-1] + '-v2"'
+    assert (
+        client.get("/api/export", params={"format": "csv"}, headers={"If-None-Match": longer_etag}).status_code == 200
+    )
+
+
+@pytest.mark.parametrize(
+    "accept_encoding", ["gzip", "br, GZIP", "gzip;q=0.5, br", "gzip ; q=1", "*", "br;q=0, *;q=0.1"]
+)
+def test_accepts_gzip(accept_encoding):
+    assert accepts_encoding(accept_encoding, "gzip")
+
+
+@pytest.mark.parametrize(
+    "accept_encoding", [None, "", "identity", "gzip;q=0", "gzip; q=0.0, br", "x-gzip-foo", "*, gzip;q=0", "gzip;q=x"]
+)
+def test_does_not_accept_gzip(accept_encoding):
+    assert not accepts_encoding(accept_encoding, "gzip")
+
+
+def test_sitemap_encoding_and_etag(client):
+    compressed = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["content-encoding"] == "gzip"
+    plain = client.get("/sitemap.xml", headers={"Accept-Encoding": "gzip;q=0, identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.content == compressed.content
+    etag = plain.headers["etag"]
+    assert client.get("/sitemap.xml", headers={"If-None-Match": f'"x", {etag}'}).status_code == 304
+    assert client.get("/sitemap.xml", headers={"If-None-Match": etag[:-1] + '-v2"'}).status_code == 200
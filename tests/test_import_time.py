@@ -0,0 +1,12 @@
+import json
+import subprocess  # nosec B404
+import sys
+
+from benchmarks.import_time import LAZY_MODULES
+
+
+def test_heavy_modules_are_not_imported_with_the_application():
+    # In a fresh interpreter: the other tests import them
+    code = f"import json, sys, app.app; print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))"
+    process = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)  # nosec B603
+    assert json.loads(process.stdout) == []
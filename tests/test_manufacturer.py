@@ -0,0 +1,6 @@
+def test_pages_beyond_the_last_one_are_not_found(client):
+    slug = client.get("/api/manufacturers").json()["data"][0]["slug"]
+    last_page = client.get(f"/api/manufacturer/{slug}", params={"limit": 1}).json()["data"]["page_count"]
+    assert client.get(f"/api/manufacturer/{slug}", params={"page": last_page, "limit": 1}).status_code == 200
+    for url in (f"/api/manufacturer/{slug}", f"/manufacturer/{slug}"):
+        assert client.get(url, params={"page": 10_000}).status_code == 404
@@ -0,0 +1,48 @@
+from app.core import film
+from app.core.response_cache import response_cache
+from app.utils.related import related_films
+
+# (id, dx_code, dx_part_1, og_film_or_information, manufacturer)
+FILM = (1, 1000, 62, "Kodak Gold", "Kodak")
+
+
+def related(rows, limit=10) -> dict[int, list[int]]:
+    return dict(related_films(rows, limit=limit))
+
+
+def test_emulsion_beats_dx_product_beats_manufacturer():
+    rows = [
+        FILM,
+        (2, 1001, 63, None, "Kodak"),  # same manufacturer, closest DX code
+        (3, 1020, 62, None, "Fujifilm"),  # same DX product
+        (4, 5000, 312, "kodak gold", "Lomography"),  # same emulsion, case aside
+        (5, 1002, 64, None, "Fujifilm"),  # nothing in common
+    ]
+    assert related(rows)[1] == [4, 3, 2]
+
+
+def test_ties_go_to_the_closest_dx_code():
+    rows = [FILM, (2, 1300, 81, None, "Kodak"), (3, 900, 56, None, "Kodak"), (4, None, None, None, "Kodak")]
+    assert related(rows)[1] == [3, 2, 4]
+
+
+def test_film_itself_is_excluded_and_limit_respected():
+    rows = [FILM, *((film_id, 1000 + film_id, 62, None, "Kodak") for film_id in range(2, 10))]
+    ranked = related(rows, limit=3)
+    assert len(ranked) == len(rows)
+    for film_id, related_ids in ranked.items():
+        assert film_id not in related_ids
+        assert len(related_ids) == 3
+    assert ranked[1] == [2, 3, 4]
+
+
+def test_related_films_endpoint(client, monkeypatch):
+    assert client.get("/api/film/unknown-film/related").status_code == 404
+    url_name = client.get("/api/search", params={"name": "Kodak Gold 200 Fixture"}).json()["data"][0]["url_name"]
+    # Databases built before the related films table
+    monkeypatch.setattr(film, "_has_related_films", False)
+    response_cache.clear()
+    response = client.get(f"/api/film/{url_name}/related")
+    assert response.status_code == 200
+    assert response.json()["data"] == []
+    response_cache.clear()
@@ -0,0 +1,10 @@
+def test_cache_hits_are_recorded_in_the_route_metrics(client, request_count):
+    route = "/api/film/{url_name}/related"
+    url_name = client.get("/api/search", params={"name": "Kodak Gold 200 Fixture"}).json()["data"][0]["url_name"]
+    before = request_count("GET", route, 200)
+    first = client.get(f"/api/film/{url_name}/related")
+    second = client.get(f"/api/film/{url_name}/related")
+    assert "age" not in first.headers
+    assert "age" in second.headers
+    assert second.content == first.content
+    assert request_count("GET", route, 200) == before + 2
@@ -0,0 +1,12 @@
+def test_search_by_dx_product(client):
+    # Product code 162 (DX extract 2594 and 2596): above the 7 bits of the DX film edge barcodes
+    response = client.get("/api/search", params={"dx_product": 162})
+    assert response.status_code == 200
+    assert [film["name"] for film in response.json()["data"]] == [
+        "Kodak Gold 200 Fixture",
+        "Kodak Gold 200 Fixture Generation 4",
+    ]
+
+
+def test_search_by_dx_product_out_of_range(client):
+    assert client.get("/api/search", params={"dx_product": 9999 // 16 + 1}).status_code == 422
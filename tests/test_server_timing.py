@@ -0,0 +1,34 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.app import app
+from app.core.response_cache import response_cache
+from app.core.server_timing import ServerTimingMiddleware
+
+
+@pytest.fixture
+def timed_client(client):
+    """Client of the application wrapped in the Server-Timing middleware (the database is loaded by `client`)."""
+    response_cache.clear()
+    yield TestClient(ServerTimingMiddleware(app))
+    response_cache.clear()
+
+
+def stages(response) -> set[str]:
+    return {metric.split(";")[0].strip() for metric in response.headers["server-timing"].split(",")}
+
+
+def test_search_stages_are_timed(timed_client):
+    response = timed_client.get("/api/search", params={"name": "Kodak Gold 200 Fixture"})
+    assert response.status_code == 200
+    assert {"sql", "validation", "total"} <= stages(response)
+
+
+def test_cache_hits_are_not_timed_as_their_cached_response(timed_client):
+    url_name = timed_client.get("/api/search", params={"name": "Kodak Gold 200 Fixture"}).json()["data"][0]["url_name"]
+    first = timed_client.get(f"/api/film/{url_name}/related")
+    second = timed_client.get(f"/api/film/{url_name}/related")
+    assert "sql" in stages(first)
+    assert "age" in second.headers
+    assert second.headers.get_list("server-timing") == [second.headers["server-timing"]]
+    assert stages(second) == {"total"}